@@ -1,16 +1,21 @@
 # Licensed under the GPLv3 - see LICENSE
 
+import hashlib
 import inspect
 import operator
+import os
 import types
 import warnings
+from collections import OrderedDict
 
 import numpy as np
 from astropy import units as u
+from astropy.utils.state import ScienceState
 
 
 __all__ = ['Base', 'BaseTaskBase', 'SetAttribute', 'TaskBase',
-           'Task', 'PaddedTaskBase']
+           'Task', 'PaddedTaskBase', 'FrameCache', 'frame_cache',
+           'ChirpCache', 'chirp_cache']
 
 
 def check_broadcast_to(value, sample_shape):
@@ -45,6 +50,385 @@ def simplify_shape(value):
     return value.reshape(value.shape[first_not_unity:]).copy()
 
 
+class FrameCache:
+    """Least-recently-used cache of frames.
+
+    Used by tasks and generators to hold on to frames that were read, so that
+    they do not have to be recalculated if they are needed again.  Counts
+    are kept of how often frames were found in the cache (``hits``) and how
+    often they had to be read or calculated (``misses``).
+
+    Parameters
+    ----------
+    max_frames : int, optional
+        Maximum number of frames to keep.  Default: 1.
+    max_bytes : int or None, optional
+        Maximum number of bytes the frames in the cache can take up.
+        The most recently added frame is always kept, even if it is larger.
+        Default: `None`, i.e., no limit.
+
+    Notes
+    -----
+    Some tasks reuse their output buffers (e.g., for FFTs done with
+    `pyfftw`).  Hence, if the cache can hold more than one frame, frames
+    that do not own their memory are copied before they are stored.
+    """
+
+    def __init__(self, max_frames=1, max_bytes=None):
+        max_frames = operator.index(max_frames)
+        if max_frames < 1:
+            raise ValueError("cache should be able to hold at least 1 frame.")
+        if max_bytes is not None:
+            max_bytes = operator.index(max_bytes)
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, index):
+        return index in self._frames
+
+    @property
+    def nbytes(self):
+        """Number of bytes taken up by the frames in the cache."""
+        return sum(getattr(frame, 'nbytes', 0)
+                   for frame in self._frames.values())
+
+    def get(self, index):
+        """Get the frame with the given index.
+
+        Returns `None` if the frame is not present.
+        """
+        frame = self._frames.get(index)
+        if frame is None:
+            self.misses += 1
+        else:
+            self._frames.move_to_end(index)
+            self.hits += 1
+        return frame
+
+    def add(self, index, frame):
+        """Add a frame with the given index to the cache.
+
+        Less recently used frames are removed if needed to stay within the
+        limits on the number of frames and their total size.
+
+        Returns
+        -------
+        frame : `~numpy.ndarray`
+            The frame as stored, i.e., possibly a copy of the input.
+        """
+        if self.max_frames > 1 and getattr(frame, 'base', None) is not None:
+            frame = frame.copy()
+        self._frames[index] = frame
+        self._frames.move_to_end(index)
+        while len(self._frames) > 1 and (
+                len(self._frames) > self.max_frames
+                or (self.max_bytes is not None
+                    and self.nbytes > self.max_bytes)):
+            self._frames.popitem(last=False)
+        return frame
+
+    def clear(self):
+        """Remove all frames from the cache (but keep the counts)."""
+        self._frames.clear()
+
+    def __repr__(self):
+        return ("<{s.__class__.__name__} max_frames={s.max_frames},"
+                " max_bytes={s.max_bytes}\n"
+                "    frames={n}, nbytes={s.nbytes},"
+                " hits={s.hits}, misses={s.misses}>"
+                .format(s=self, n=len(self)))
+
+
+class frame_cache(ScienceState):
+    """Create a frame cache, with settable default limits.
+
+    Parameters
+    ----------
+    max_frames : int, optional
+        Maximum number of frames to keep.  Default: as set (initially 1).
+    max_bytes : int or None, optional
+        Maximum number of bytes the frames in the cache can take up.
+        Default: as set (initially `None`, i.e., no limit).
+
+    Notes
+    -----
+    The `frame_cache.set` method can be used to set the default limits for
+    all new tasks.  For a given task, one can also replace its ``cache``
+    attribute with a new `~scintillometry.base.FrameCache` instance.
+
+    Examples
+    --------
+    To let tasks keep up to 4 frames, as long as these take less than 1 GB::
+
+      >>> from scintillometry.base import frame_cache
+      >>> with frame_cache.set(max_frames=4, max_bytes=2**30):
+      ...     cache = frame_cache()
+      >>> cache
+      <FrameCache max_frames=4, max_bytes=1073741824
+          frames=0, nbytes=0, hits=0, misses=0>
+      >>> frame_cache().max_frames
+      1
+
+    """
+
+    _value = {'max_frames': 1, 'max_bytes': None}
+
+    def __new__(cls, **kwargs):
+        settings = dict(cls.get(), **kwargs)
+        return FrameCache(**settings)
+
+    @classmethod
+    def validate(cls, value):
+        # Check that a cache can be made with the settings.
+        FrameCache(**value)
+        return value
+
+    @classmethod
+    def set(cls, max_frames=1, max_bytes=None):
+        """Set the default limits for caches of new tasks.
+
+        This method can be used to set the limits only temporarily, by
+        using it as a context in a ``with`` statement.
+
+        Parameters
+        ----------
+        max_frames : int, optional
+            Maximum number of frames to keep.  Default: 1.
+        max_bytes : int or None, optional
+            Maximum number of bytes the frames in the cache can take up.
+            Default: `None`, i.e., no limit.
+        """
+        return super().set({'max_frames': max_frames,
+                            'max_bytes': max_bytes})
+
+
+class ChirpCache:
+    """Least-recently-used cache of Fourier-domain factors, such as chirps.
+
+    Used by `~scintillometry.dispersion.Disperse` and
+    `~scintillometry.sampling.Resample` (and their subclasses) to share the
+    arrays with which they multiply Fourier-transformed frames between
+    instances with the same settings, so that, e.g., the chirp for a given
+    dispersion measure is calculated only once when processing many scans.
+    Counts are kept of how often arrays were found in the cache (``hits``)
+    and how often they had to be calculated (``misses``).
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of arrays to keep.  Default: 8.
+    max_bytes : int or None, optional
+        Maximum number of bytes the arrays kept in memory can take up.
+        Memory-mapped arrays are not counted.  Default: 2**28 (256 MiB).
+        Arrays larger than this are not kept.
+    directory : str or None, optional
+        If given, arrays are also stored as ``.npy`` files in this directory,
+        and used memory-mapped, so that they can be shared between processes
+        and reused in later sessions.  Files are not removed automatically.
+        Default: `None`, i.e., keep arrays in memory only.
+
+    Notes
+    -----
+    Arrays in the cache are set to read-only, since they may be used by
+    several tasks.
+
+    Arrays are kept in the cache also after the tasks that used them have
+    been closed, so that they can be reused by later tasks.  To release the
+    memory, use `discard` to remove a single array or `clear` to remove all.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=2**28, directory=None):
+        max_entries = operator.index(max_entries)
+        if max_entries < 0:
+            raise ValueError("number of entries cannot be negative.")
+        if max_bytes is not None:
+            max_bytes = operator.index(max_bytes)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        """Number of bytes taken up in memory by the arrays in the cache."""
+        return sum(array.nbytes for array in self._entries.values()
+                   if not isinstance(array, np.memmap))
+
+    @staticmethod
+    def key(*args):
+        """Create a key from the arguments, hashing any arrays.
+
+        Quantities are hashed including their units, and any other
+        arguments via their representation.
+        """
+        digest = hashlib.sha1()
+        for arg in args:
+            if isinstance(arg, u.Quantity):
+                digest.update(str(arg.unit).encode())
+                arg = arg.value
+            if isinstance(arg, np.ndarray):
+                arg = np.ascontiguousarray(arg)
+                digest.update(repr((arg.dtype.str, arg.shape)).encode())
+                digest.update(arg.data)
+            else:
+                digest.update(repr(arg).encode())
+            digest.update(b'|')
+        return digest.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, key):
+        """Get the array with the given key.
+
+        If not present in memory, but a file for it exists in ``directory``,
+        it is loaded memory-mapped.  Returns `None` if the array is not found.
+        """
+        array = self._entries.get(key)
+        if array is None and self.directory is not None:
+            filename = self._filename(key)
+            if os.path.exists(filename):
+                array = np.load(filename, mmap_mode='r')
+                self._store(key, array)
+
+        if array is None:
+            self.misses += 1
+        else:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return array
+
+    def add(self, key, array):
+        """Add an array with the given key to the cache.
+
+        Less recently used arrays are removed if needed to stay within the
+        limits on the number of arrays and their total size.
+
+        Returns
+        -------
+        array : `~numpy.ndarray`
+            The array as stored, i.e., read-only and possibly memory-mapped.
+        """
+        if self.directory is not None:
+            filename = self._filename(key)
+            # Write to a temporary file first, so that other processes
+            # never see an incomplete file.
+            temporary = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(temporary, 'wb') as fh:
+                np.save(fh, array)
+            os.replace(temporary, filename)
+            array = np.load(filename, mmap_mode='r')
+        else:
+            array.flags.writeable = False
+
+        self._store(key, array)
+        return array
+
+    def _store(self, key, array):
+        self._entries[key] = array
+        self._entries.move_to_end(key)
+        while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None
+                    and self.nbytes > self.max_bytes)):
+            self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Remove the array with the given key from memory, if present.
+
+        Any file for it in ``directory`` is kept.
+        """
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all arrays from memory (but keep any files and counts)."""
+        self._entries.clear()
+
+    def __repr__(self):
+        return ("<{s.__class__.__name__} max_entries={s.max_entries},"
+                " max_bytes={s.max_bytes}, directory={s.directory}\n"
+                "    entries={n}, nbytes={s.nbytes},"
+                " hits={s.hits}, misses={s.misses}>"
+                .format(s=self, n=len(self)))
+
+
+class chirp_cache(ScienceState):
+    """Process-wide cache of Fourier-domain factors, such as chirps.
+
+    Use ``chirp_cache.get()`` to get the `~scintillometry.base.ChirpCache`
+    currently in use.
+
+    Notes
+    -----
+    By default, up to 8 arrays taking up to 256 MiB are kept in memory.
+    These remain in memory after the tasks that used them are closed.
+    To release the memory, use ``chirp_cache.get().clear()``.
+    The `chirp_cache.set` method can be used to change the limits, to
+    store arrays on disk, or to disable caching altogether.
+
+    Examples
+    --------
+    To keep chirps on disk, so they can be reused in another session::
+
+      >>> from scintillometry.base import chirp_cache
+      >>> chirp_cache.set(directory='chirps')  # doctest: +SKIP
+
+    To temporarily disable caching::
+
+      >>> with chirp_cache.set(max_entries=0):
+      ...     chirp_cache.get().max_entries
+      0
+    """
+
+    _value = ChirpCache()
+
+    @classmethod
+    def validate(cls, value):
+        if not isinstance(value, ChirpCache):
+            raise TypeError("can only set the chirp cache to a "
+                            "ChirpCache instance.")
+        return value
+
+    @classmethod
+    def set(cls, cache=None, **kwargs):
+        """Set the cache used for new tasks.
+
+        This method can be used to set the cache only temporarily, by
+        using it as a context in a ``with`` statement.
+
+        Parameters
+        ----------
+        cache : `~scintillometry.base.ChirpCache`, optional
+            Cache to use.  If not given, a new one is created.
+        **kwargs
+            Arguments to create a new `~scintillometry.base.ChirpCache`,
+            such as ``max_entries``, ``max_bytes``, and ``directory``.  Only
+            allowed if ``cache`` is not given.
+        """
+        if cache is None:
+            cache = ChirpCache(**kwargs)
+        elif kwargs:
+            raise TypeError("cannot pass in both a cache and arguments.")
+        return super().set(cache)
+
+
 class Base:
     """Base class of all tasks and generators.
 
@@ -81,6 +465,13 @@ class Base:
         ``['X', 'Y']``, or ``[['L'], ['R']]``.  Default: unknown.
     dtype : `~numpy.dtype`, optional
         Dtype of the samples.
+
+    Notes
+    -----
+    Frames that are read are kept in a `~scintillometry.base.FrameCache`,
+    available as the ``cache`` attribute.  By default, it holds only the
+    most recent frame; use `~scintillometry.base.frame_cache` to change the
+    default for new tasks, or replace the ``cache`` attribute.
     """
 
     # Initial values for sample and frame pointers, etc.
@@ -113,6 +504,7 @@ class Base:
         self._frequency = frequency
         self._sideband = sideband
         self._polarization = polarization
+        self.cache = frame_cache()
 
     def _check_shape(self, value):
         """Check that value can be broadcast to the sample shape."""
@@ -303,16 +695,9 @@ class Base:
             # For current position, get frame plus offset in that frame.
             frame_index, sample_offset = divmod(self.offset,
                                                 self._samples_per_frame)
-
-            if frame_index != self._frame_index:
-                # Read the frame required.  Set offset at the start so
-                # that _read_frame can count on tell() being correct.
-                self.offset = frame_index * self._samples_per_frame
-                self._frame = self._read_frame(frame_index)
-                self._frame_index = frame_index
-
-            nsample = min(count, len(self._frame) - sample_offset)
-            data = self._frame[sample_offset:sample_offset + nsample]
+            frame = self._get_frame(frame_index)
+            nsample = min(count, len(frame) - sample_offset)
+            data = frame[sample_offset:sample_offset + nsample]
             # Copy to relevant part of output.
             out[sample:sample + nsample] = data
             sample += nsample
@@ -321,6 +706,64 @@ class Base:
 
         return out
 
+    def read_view(self, count=None):
+        """Read a number of complete samples, avoiding a copy if possible.
+
+        If all requested samples are within a single frame, a read-only view
+        of the cached frame is returned.  Otherwise, the samples are copied
+        to a new array, just like for `read`.
+
+        Parameters
+        ----------
+        count : int or None, optional
+            Number of complete samples to read.  If `None` (default) or
+            negative, the entire input data is processed.
+
+        Returns
+        -------
+        out : `~numpy.ndarray` of float or complex
+            The first dimension is sample-time, and the remainder given by
+            `sample_shape`.  If it is a view, the data are only guaranteed
+            to remain valid until the next read from the stream.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed task/generator.")
+
+        samples_left = max(0, self.shape[0] - self.offset)
+        if count is None or count < 0:
+            count = samples_left
+
+        frame_index, sample_offset = divmod(self.offset,
+                                            self._samples_per_frame)
+        if (count == 0 or count > samples_left
+                or sample_offset + count > self._samples_per_frame):
+            # Nothing to gain from a view; let read deal with it.
+            return self.read(count)
+
+        offset0 = self.offset
+        frame = self._get_frame(frame_index)
+        out = frame[sample_offset:sample_offset + count]
+        # Ensure the cached frame cannot be changed via the view.
+        out.flags.writeable = False
+        self.offset = offset0 + count
+        return out
+
+    def _get_frame(self, frame_index):
+        """Get the frame with the given index, from the cache if possible.
+
+        Note that the offset pointer may be left at the start of the frame.
+        """
+        frame = self.cache.get(frame_index)
+        if frame is None:
+            # Read the frame required.  Set offset at the start so
+            # that _read_frame can count on tell() being correct.
+            self.offset = frame_index * self._samples_per_frame
+            frame = self.cache.add(frame_index, self._read_frame(frame_index))
+
+        self._frame = frame
+        self._frame_index = frame_index
+        return frame
+
     def __enter__(self):
         return self
 
@@ -329,7 +772,8 @@ class Base:
 
     def close(self):
         self.closed = True
-        self._frame = None  # clear possibly cached frame
+        self._frame = None  # clear possibly cached frames
+        self.cache.clear()
 
 
 class BaseTaskBase(Base):
@@ -378,6 +822,11 @@ class BaseTaskBase(Base):
 
     """
 
+    # Whether data from the underlying stream can be passed on as read-only
+    # views of its frames (see ``_read_input``).  Subclasses whose ``task``
+    # may change the data in-place should set this to `False`.
+    _input_view = True
+
     def __init__(self, ih, *,
                  start_time=None, shape=None, sample_rate=None,
                  samples_per_frame=None, frequency=None, sideband=None,
@@ -410,6 +859,31 @@ class BaseTaskBase(Base):
                          frequency=frequency, sideband=sideband,
                          polarization=polarization, dtype=dtype)
 
+    def _read_input(self, count):
+        """Read samples from the underlying stream, avoiding copies.
+
+        Uses ``read_view`` if the underlying stream provides it (and
+        ``_input_view`` is `True`), and ``read`` otherwise.
+        """
+        if self._input_view:
+            read_view = getattr(self.ih, 'read_view', None)
+            if read_view is not None:
+                return read_view(count)
+
+        return self.ih.read(count)
+
+    def _apply_task(self, data):
+        """Apply the task to data read from the underlying stream.
+
+        If the result shares memory with a read-only view of a frame of
+        the underlying stream, it is copied, to ensure that our own frame
+        cannot change when the underlying stream reuses its frame buffer.
+        """
+        result = self.task(data)
+        if not data.flags.writeable and np.may_share_memory(result, data):
+            result = result.copy()
+        return result
+
     def close(self):
         """Close task, in particular closing its input source."""
         super().close()
@@ -466,7 +940,18 @@ class SetAttribute(BaseTaskBase):
     def read(self, *args, **kwargs):
         """Read data from the underlying stream at the current offset."""
         self.ih.seek(self.offset)
-        return self.ih.read(*args, **kwargs)
+        out = self.ih.read(*args, **kwargs)
+        self.offset += len(out)
+        return out
+
+    def read_view(self, *args, **kwargs):
+        """Read data from the underlying stream, avoiding a copy if possible.
+        """
+        self.ih.seek(self.offset)
+        read_view = getattr(self.ih, 'read_view', self.ih.read)
+        out = read_view(*args, **kwargs)
+        self.offset += len(out)
+        return out
 
 
 class TaskBase(BaseTaskBase):
@@ -550,12 +1035,12 @@ class TaskBase(BaseTaskBase):
                          polarization=polarization, dtype=dtype)
 
     def _read_frame(self, frame_index):
-        # Read data from underlying filehandle.
+        # Read data from underlying filehandle, avoiding a copy if possible.
         self.ih.seek(frame_index * self._raw_samples_per_frame)
-        data = self.ih.read(self._raw_samples_per_frame)
+        data = self._read_input(self._raw_samples_per_frame)
         # Apply function to the data.  Note that the read() function
         # in base ensures that our offset pointer is correct.
-        return self.task(data)
+        return self._apply_task(data)
 
 
 class Task(TaskBase):
@@ -620,6 +1105,9 @@ class Task(TaskBase):
         If the task has zero or more than 2 arguments.
     """
 
+    # User-supplied functions may well change the data in-place.
+    _input_view = False
+
     def __init__(self, ih, task, method=None, **kwargs):
         if method is None:
             try:
@@ -691,6 +1179,8 @@ class PaddedTaskBase(BaseTaskBase):
                 warnings.warn("task will be inefficient since of {} samples "
                               "per frame, {} will be lost due to padding."
                               .format(samples_per_frame, pad))
+        elif samples_per_frame is None:
+            samples_per_frame = ih.samples_per_frame
 
         # Subtract padding since that is what we actually produce per frame,
         samples_per_frame -= pad
@@ -699,9 +1189,34 @@ class PaddedTaskBase(BaseTaskBase):
                          **kwargs)
         self._padded_samples_per_frame = self.samples_per_frame + pad
         self._start_time += self._pad_start / ih.sample_rate
+        # Padding at the end of the last frame read, which can be reused
+        # as the start of the next frame (overlap-save).
+        self._tail = None
+        self._tail_index = None
 
     def _read_frame(self, frame_index):
-        # Read data from underlying filehandle.
-        self.ih.seek(frame_index * self.samples_per_frame)
-        data = self.ih.read(self._padded_samples_per_frame)
-        return self.task(data)
+        pad = self._pad_start + self._pad_end
+        if pad > 0 and self._tail_index == frame_index - 1:
+            # Sequential read: the padding of the previous frame forms the
+            # start of this one, so we only need to read the new samples.
+            data = np.empty((self._padded_samples_per_frame,)
+                            + self.ih.sample_shape, self.ih.dtype)
+            data[:pad] = self._tail
+            self.ih.seek(frame_index * self.samples_per_frame + pad)
+            self.ih.read(out=data[pad:])
+        else:
+            # Read data from underlying filehandle, avoiding a copy if
+            # possible.
+            self.ih.seek(frame_index * self.samples_per_frame)
+            data = self._read_input(self._padded_samples_per_frame)
+
+        if pad > 0:
+            # Store the end of the data before the task possibly changes it.
+            self._tail = data[-pad:].copy()
+            self._tail_index = frame_index
+
+        return self._apply_task(data)
+
+    def close(self):
+        super().close()
+        self._tail = self._tail_index = None
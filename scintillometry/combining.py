@@ -1,4 +1,8 @@
 # Licensed under the GPLv3 - see LICENSE
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from astropy import units as u
 
@@ -29,9 +33,21 @@ class CombineStreamsBase(TaskBase):
         If not given, by default the number from the first underlying file.
         Useful mostly in case the stream readers have time offsets, since
         the output stream will be shortened by an integer number of frames.
+    n_threads : int, optional
+        If given, read the underlying streams concurrently using a pool with
+        this number of threads.  This should only be used if the streams are
+        independent, i.e., do not share an underlying file handle or task.
+        By default, the streams are read one after the other.
+
+    Notes
+    -----
+    The total time spent reading each of the underlying streams is kept
+    in the ``read_time`` attribute, which can help to identify which
+    stream is the bottleneck.
     """
 
-    def __init__(self, ihs, atol=None, samples_per_frame=None):
+    def __init__(self, ihs, atol=None, samples_per_frame=None,
+                 n_threads=None):
         try:
             ih0 = ihs[0]
         except (TypeError, IndexError) as exc:
@@ -83,6 +99,16 @@ class CombineStreamsBase(TaskBase):
         # BaseTaskBase, which is more logical, but then cannot mixin Task
         # below.  TODO: remove TaskBase intermediary?
         self._start_time = start_time
+        self._read_time = np.zeros(len(ihs))
+        if n_threads is None:
+            self._executor = None
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=n_threads)
+
+    @property
+    def read_time(self):
+        """Total time spent reading from each of the underlying streams."""
+        return self._read_time * u.s
 
     def _combine_attr(self, attr):
         """Combine the given attribute from all streams.
@@ -128,13 +154,28 @@ class CombineStreamsBase(TaskBase):
         super().close()
         for ih in self.ihs[1:]:
             ih.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def _read_stream(self, index, frame_index):
+        """Read data from a single underlying filehandle, timing it."""
+        start = time.perf_counter()
+        ih = self.ihs[index]
+        ih.seek(self._start_offsets[index]
+                + frame_index * self._samples_per_frame)
+        data = ih.read(self._samples_per_frame)
+        self._read_time[index] += time.perf_counter() - start
+        return data
 
     def _read_frame(self, frame_index):
         """Read and combine data from the underlying filehandles."""
-        data = []
-        for ih, start_offset in zip(self.ihs, self._start_offsets):
-            ih.seek(start_offset + frame_index * self._samples_per_frame)
-            data.append(ih.read(self._samples_per_frame))
+        indices = range(len(self.ihs))
+        if self._executor is None:
+            data = [self._read_stream(index, frame_index)
+                    for index in indices]
+        else:
+            data = list(self._executor.map(self._read_stream, indices,
+                                           itertools.repeat(frame_index)))
         return self.task(data)
 
 
@@ -161,6 +202,11 @@ class CombineStreams(Task, CombineStreamsBase):
         If not given, by default the number from the first underlying file.
         Useful mostly in case the stream readers have time offsets, since
         the output stream will be shortened by an integer number of frames.
+    n_threads : int, optional
+        If given, read the underlying streams concurrently using a pool with
+        this number of threads.  This should only be used if the streams are
+        independent, i.e., do not share an underlying file handle or task.
+        By default, the streams are read one after the other.
 
     See Also
     --------
@@ -171,9 +217,10 @@ class CombineStreams(Task, CombineStreamsBase):
     # be passed on to ChangeSampleShapeBase anyway.
 
     def __init__(self, ihs, task, method=None, atol=None,
-                 samples_per_frame=None):
+                 samples_per_frame=None, n_threads=None):
         super().__init__(ihs, task, method=method, atol=atol,
-                         samples_per_frame=samples_per_frame)
+                         samples_per_frame=samples_per_frame,
+                         n_threads=n_threads)
 
 
 class Concatenate(CombineStreamsBase):
@@ -194,6 +241,11 @@ class Concatenate(CombineStreamsBase):
         If not given, by default the number from the first underlying file.
         Useful mostly in case the stream readers have time offsets, since
         the output stream will be shortened by an integer number of frames.
+    n_threads : int, optional
+        If given, read the underlying streams concurrently using a pool with
+        this number of threads.  This should only be used if the streams are
+        independent, i.e., do not share an underlying file handle or task.
+        By default, the streams are read one after the other.
 
     See Also
     --------
@@ -201,14 +253,18 @@ class Concatenate(CombineStreamsBase):
     CombineStreams : to combine streams with a user-supplied function
     """
 
-    def __init__(self, ihs, axis=1, atol=None, samples_per_frame=None):
+    def __init__(self, ihs, axis=1, atol=None, samples_per_frame=None,
+                 n_threads=None):
         self.axis = axis
-        super().__init__(ihs, atol=atol, samples_per_frame=samples_per_frame)
+        super().__init__(ihs, atol=atol, samples_per_frame=samples_per_frame,
+                         n_threads=n_threads)
 
     def task(self, data):
         """Concatenate the pieces of data together."""
-        # Reuse frame for in-place output if possible.
-        if getattr(self._frame, 'shape', [-1])[0] == data[0].shape[0]:
+        # Reuse frame for in-place output if possible, i.e., if there is
+        # one and it is not going to be kept in the cache.
+        if (getattr(self._frame, 'shape', [-1])[0] == data[0].shape[0]
+                and self.cache.max_frames == 1):
             out = self._frame
         else:
             out = None
@@ -233,6 +289,11 @@ class Stack(CombineStreamsBase):
         If not given, by default the number from the first underlying file.
         Useful mostly in case the stream readers have time offsets, since
         the output stream will be shortened by an integer number of frames.
+    n_threads : int, optional
+        If given, read the underlying streams concurrently using a pool with
+        this number of threads.  This should only be used if the streams are
+        independent, i.e., do not share an underlying file handle or task.
+        By default, the streams are read one after the other.
 
     See Also
     --------
@@ -240,14 +301,18 @@ class Stack(CombineStreamsBase):
     CombineStreams : to combine streams with a user-supplied function
     """
 
-    def __init__(self, ihs, axis=1, atol=None, samples_per_frame=None):
+    def __init__(self, ihs, axis=1, atol=None, samples_per_frame=None,
+                 n_threads=None):
         self.axis = axis
-        super().__init__(ihs, atol=atol, samples_per_frame=samples_per_frame)
+        super().__init__(ihs, atol=atol, samples_per_frame=samples_per_frame,
+                         n_threads=n_threads)
 
     def task(self, data):
         """Stack the pieces of data."""
-        # Reuse frame for in-place output if possible.
-        if getattr(self._frame, 'shape', [-1])[0] == data[0].shape[0]:
+        # Reuse frame for in-place output if possible, i.e., if there is
+        # one and it is not going to be kept in the cache.
+        if (getattr(self._frame, 'shape', [-1])[0] == data[0].shape[0]
+                and self.cache.max_frames == 1):
             out = self._frame
         else:
             out = None
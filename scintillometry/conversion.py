@@ -18,6 +18,10 @@ class Real2Complex(TaskBase):
     of 2, which results in the complex baseband representation of the input
     signal.
 
+    In practice, all three steps are done in the Fourier domain, using a
+    real-input forward transform of the input and an inverse transform
+    of half its length.
+
     Parameters
     ----------
     ih : task or `baseband` stream reader
@@ -54,11 +58,14 @@ class Real2Complex(TaskBase):
 
         dtype = np.dtype('c{}'.format(ih.dtype.itemsize * 2))
         self._fft = fft_maker((samples_per_frame * 2, ) + ih.sample_shape,
-                              dtype,
+                              ih.dtype,
                               sample_rate=ih.sample_rate,
                               axis=0)
-
-        self._ifft = self._fft.inverse()
+        self._ifft = fft_maker((samples_per_frame, ) + ih.sample_shape,
+                               dtype,
+                               direction='backward',
+                               sample_rate=ih.sample_rate / 2,
+                               axis=0)
         super().__init__(ih,
                          samples_per_frame=samples_per_frame,
                          sample_rate=ih.sample_rate / 2,
@@ -69,24 +76,16 @@ class Real2Complex(TaskBase):
                                + ih.sample_rate / 2 * self.sideband)
 
     def task(self, data):
-        z = data.astype(self.dtype)
-        N = z.shape[0]
-
-        # Hilbert transform
-        z = self._fft(z)
-
-        h = np.zeros(N)
-        if N % 2 == 0:
-            h[0] = h[N // 2] = 1
-            h[1:N // 2] = 2
-        else:
-            h[0] = 1
-            h[1:(N + 1) // 2] = 2
-        z = self._ifft(z * h)
-
-        # Frequency shift signal by -B/2
-        h = np.exp(-1j * np.pi / 2 * np.arange(N))
-        z *= h
-
-        z = z[::2]
+        # Hilbert transform: only keep non-negative frequencies, with
+        # the frequency of 0 and the Nyquist frequency counted half.
+        ft = self._fft(data)
+        n = ft.shape[0] - 1
+
+        # Frequency shift signal by -B/2 and decimate by 2.  Decimation
+        # aliases the Nyquist frequency to 0, while the shift corresponds
+        # to a change in sign of every other sample.
+        z = ft[:n]
+        z[0] = (z[0] + ft[n]) / 2
+        z = self._ifft(z)
+        z[1::2] *= -1
         return z
@@ -1,6 +1,7 @@
 # Licensed under the GPLv3 - see LICENSE
 """Convolution tasks."""
 import numpy as np
+from astropy import units as u
 from astropy.utils import lazyproperty
 
 from .base import PaddedTaskBase, check_broadcast_to
@@ -19,7 +20,8 @@ class ConvolveSamples(PaddedTaskBase):
         Input data stream, with time as the first axis.
     response : `~numpy.ndarray`
         Response to convolce the time stream with.  If one-dimensional, assumed
-        to apply to the sample axis of ``ih``.
+        to apply to the sample axis of ``ih``.  Should be real if ``ih``
+        holds real data.
     offset : int, optional
         Where samples should be considered to be taken from.  For the default
         of 0, a given sample has the same time as the convolution of the filter
@@ -36,6 +38,9 @@ class ConvolveSamples(PaddedTaskBase):
     """
 
     def __init__(self, ih, response, offset=0, samples_per_frame=None):
+        if np.iscomplexobj(response) and not ih.complex_data:
+            raise ValueError("cannot convolve real data with a complex "
+                             "response.")
         if response.ndim == 1 and ih.ndim > 1:
             response = response.reshape(response.shape[:1]
                                         + (1,) * (ih.ndim - 1))
@@ -64,6 +69,8 @@ class Convolve(ConvolveSamples):
 
     The convolution is done via multiplication in the Fourier domain, which
     is faster than direct convolution for all but very simple responses.
+    For real data, real-input transforms are used, which need only half
+    the number of frequencies.
 
     Parameters
     ----------
@@ -71,7 +78,8 @@ class Convolve(ConvolveSamples):
         Input data stream, with time as the first axis.
     response : `~numpy.ndarray`
         Response to convolce the time stream with.  If one-dimensional, assumed
-        to apply to the sample axis of ``ih``.
+        to apply to the sample axis of ``ih``.  Should be real if ``ih``
+        holds real data.
     offset : int, optional
         Where samples should be considered to be taken from.  For the default
         of 0, a given sample has the same time as the convolution of the filter
@@ -98,14 +106,30 @@ class Convolve(ConvolveSamples):
                               sample_rate=self.ih.sample_rate)
         self._ifft = self._fft.inverse()
 
-    @lazyproperty
-    def _ft_response(self):
-        long_response = np.zeros((self._padded_samples_per_frame,)
-                                 + self._response.shape[1:], self.dtype)
+    def _get_ft_response(self, n):
+        long_response = np.zeros((n,) + self._response.shape[1:], self.dtype)
         long_response[:self._response.shape[0]] = self._response
         fft = self._FFT(shape=long_response.shape, dtype=self.dtype)
         return fft(long_response)
 
+    @lazyproperty
+    def _ft_response(self):
+        return self._get_ft_response(self._padded_samples_per_frame)
+
+    def _fourier_factor(self, fft):
+        """Response for a frame Fourier-transformed with ``fft``.
+
+        Unlike ``_ft_response``, this includes a phase gradient that shifts
+        the result by ``_pad_end``, so that the convolved samples start at
+        ``_pad_start``, as for other padded Fourier-domain tasks.  Used by
+        `~scintillometry.fusion.Fuse`.
+        """
+        ft_response = self._get_ft_response(fft.time_shape[0])
+        phase_delay = (self._pad_end / self.sample_rate * u.cycle
+                       * fft.frequency)
+        ft_response = ft_response * np.exp(phase_delay.to_value(u.rad) * 1j)
+        return ft_response.astype(fft.frequency_dtype, copy=False)
+
     def task(self, data):
         ft = self._fft(data)
         ft *= self._ft_response
@@ -4,12 +4,13 @@ import numpy as np
 from astropy import units as u
 from astropy.utils import lazyproperty
 
-from .base import PaddedTaskBase
+from .base import PaddedTaskBase, chirp_cache
 from .fourier import fft_maker
 from .dm import DispersionMeasure
 
 
-__all__ = ['Disperse', 'Dedisperse']
+__all__ = ['Disperse', 'Dedisperse', 'DedisperseMany',
+           'IncoherentDedisperse']
 
 
 class Disperse(PaddedTaskBase):
@@ -40,6 +41,11 @@ class Disperse(PaddedTaskBase):
     See Also
     --------
     scintillometry.fourier.fft_maker : to select the FFT package used.
+
+    Notes
+    -----
+    For real data, real-input transforms are used, and the phase factors
+    are calculated only for the non-negative frequencies.
     """
 
     def __init__(self, ih, dm, reference_frequency=None,
@@ -101,6 +107,7 @@ class Disperse(PaddedTaskBase):
                               + self.ih.sample_shape, dtype=self.ih.dtype,
                               sample_rate=self.ih.sample_rate)
         self._ifft = self._fft.inverse()
+        self._chirp_cache = chirp_cache.get()
         self.dm = dm
         self.reference_frequency = reference_frequency
         self._sample_offset = sample_offset
@@ -110,19 +117,99 @@ class Disperse(PaddedTaskBase):
 
     @lazyproperty
     def phase_factor(self):
-        """Phase offsets of the Fourier-transformed frame."""
-        frequency = self.frequency + self._fft.frequency * self.sideband
+        """Phase offsets of the Fourier-transformed frame.
+
+        Shared between tasks with the same settings via the
+        `~scintillometry.base.chirp_cache` active when the task was created.
+        Hence, it remains in memory after the task is closed; see
+        `~scintillometry.base.chirp_cache` for how to release it.
+        """
+        key = self._chirp_cache.key(
+            type(self).__name__, self.dm, self.reference_frequency,
+            self.frequency, self.sideband, self.sample_rate,
+            self._sample_offset, self._fft.time_shape, self._fft.time_dtype,
+            self._fft.frequency_dtype)
+        phase_factor = self._chirp_cache.get(key)
+        if phase_factor is None:
+            phase_factor = self._chirp_cache.add(
+                key, self._fourier_factor(self._fft))
+        return phase_factor
+
+    def _fourier_factor(self, fft):
+        """Phase offsets for a frame Fourier-transformed with ``fft``.
+
+        Used for `phase_factor`, as well as by
+        `~scintillometry.fusion.Fuse` to combine the dispersion with
+        other Fourier-domain tasks.
+
+        To limit the memory used, the phase delays are calculated in blocks
+        of frequencies, with the real and imaginary parts of the phase
+        factor calculated directly into the result, which has the frequency
+        dtype of ``fft``.
+        """
+        fft_frequency = self._fft_frequency(fft)
+        n_frequency = len(fft_frequency)
+        # First calculate a single frequency, to determine the output shape.
+        phase_delay = self._phase_delay(fft_frequency[:1])
+        phase_factor = np.empty((n_frequency,) + phase_delay.shape[1:],
+                                fft.frequency_dtype)
+        block_size = max(1, self._block_size // phase_delay.size)
+        start = 0
+        while start < n_frequency:
+            if start > 0:
+                phase_delay = self._phase_delay(
+                    fft_frequency[start:start+block_size])
+            block = phase_factor[start:start+len(phase_delay)]
+            np.cos(phase_delay, out=block.real, casting='same_kind')
+            np.sin(phase_delay, out=block.imag, casting='same_kind')
+            start += len(phase_delay)
+
+        return phase_factor
+
+    # Number of phase delays calculated in one go in _fourier_factor, and
+    # the (generous) number of bytes of intermediate results for each,
+    # plus a fixed allowance for the python objects created along the way.
+    _block_size = 2**16
+    _block_bytes_per_element = 64
+    _block_bytes_overhead = 2**16
+
+    def _phase_delay(self, fft_frequency):
+        """Phase delays in radians for the given FFT sample frequencies."""
+        frequency = self.frequency + fft_frequency * self.sideband
         phase_delay = self.dm.phase_delay(frequency, self.reference_frequency)
         phase_delay *= self.sideband
         # Correct for any time offset applied because the reference frequency
         # was out of range.
         if self._sample_offset != 0:
             phase_delay += (self._sample_offset / self.sample_rate * u.cycle
-                            * self._fft.frequency)
-        phase_factor = np.exp(phase_delay.to_value(u.rad) * 1j)
-        phase_factor = phase_factor.astype(self._fft.frequency_dtype,
-                                           copy=False)
-        return phase_factor
+                            * fft_frequency)
+        return phase_delay.to_value(u.rad)
+
+    def phase_factor_memory(self):
+        """Memory needed for the phase factor.
+
+        Can be used to size jobs, since for large dispersion measures at
+        low frequencies, the phase factor can be very large.
+
+        Returns
+        -------
+        nbytes : int
+            Number of bytes of the phase factor.
+        peak : int
+            Estimate of the peak number of bytes used while calculating
+            the phase factor, including the phase factor itself.
+        """
+        fft_frequency = self._fft_frequency(self._fft)
+        n_frequency = len(fft_frequency)
+        size = self._phase_delay(fft_frequency[:1]).size
+        nbytes = n_frequency * size * self._fft.frequency_dtype.itemsize
+        block_size = min(n_frequency, max(1, self._block_size // size))
+        return nbytes, (nbytes + fft_frequency.nbytes
+                        + block_size * size * self._block_bytes_per_element
+                        + self._block_bytes_overhead)
+
+    def _fft_frequency(self, fft):
+        return fft.frequency
 
     def task(self, data):
         ft = self._fft(data)
@@ -174,3 +261,223 @@ class Dedisperse(Disperse):
                  samples_per_frame=None, frequency=None, sideband=None):
         super().__init__(ih, -dm, reference_frequency, samples_per_frame,
                          frequency, sideband)
+
+
+class DedisperseMany(Dedisperse):
+    """Coherently dedisperse a time stream for many dispersion measures.
+
+    The data are Fourier transformed only once per frame, and then
+    multiplied with the phase factors for all dispersion measures, so
+    that the cost is dominated by the inverse transforms.  The padding
+    is set by the dispersion measure that requires the most.
+
+    Parameters
+    ----------
+    ih : task or `baseband` stream reader
+        Input data stream, with time as the first axis.
+    dm : array of float or `~scintillometry.dm.DispersionMeasure` quantity
+        Dispersion measures.  Should be one-dimensional.
+    reference_frequency : `~astropy.units.Quantity`
+        Frequency to which the data should be dedispersed.  Can be an array.
+        By default, the mean frequency.  If one doesn't want to change the
+        start time, choose the maximum frequency.
+    samples_per_frame : int, optional
+        Number of samples which should be dedispersed in one go. The number of
+        output dedispersed samples per frame will be smaller to avoid wrapping.
+        If not given, the minimum power of 2 needed to get at least 75%
+        efficiency.
+    frequency : `~astropy.units.Quantity`, optional
+        Frequencies for each channel in ``ih`` (channelized frequencies will
+        be calculated).  Default: taken from ``ih`` (if available).
+    sideband : array, optional
+        Whether frequencies in ``ih`` are upper (+1) or lower (-1) sideband.
+        Default: taken from ``ih`` (if available).
+
+    Notes
+    -----
+    The output has an extra dimension for the dispersion measures, i.e.,
+    the sample shape is ``(len(dm),) + ih.sample_shape``.  Like for
+    `~scintillometry.dispersion.Dedisperse`, the ``dm`` attribute holds
+    the negative of the dispersion measures, shaped such that they
+    broadcast against the sample shape.
+
+    See Also
+    --------
+    scintillometry.fourier.fft_maker : to select the FFT package used.
+    """
+
+    def __init__(self, ih, dm, reference_frequency=None,
+                 samples_per_frame=None, frequency=None, sideband=None):
+        dm = DispersionMeasure(dm)
+        if dm.ndim != 1:
+            raise ValueError("dispersion measures should be given as a "
+                             "one-dimensional array.")
+
+        dm = dm.reshape(dm.shape + (1,) * (ih.ndim - 1))
+        super().__init__(ih, dm, reference_frequency, samples_per_frame,
+                         frequency, sideband)
+        self._shape = self._shape[:1] + dm.shape[:1] + self.ih.sample_shape
+        self._ifft = fft_maker(shape=(self._padded_samples_per_frame,)
+                               + self.sample_shape, dtype=self.ih.dtype,
+                               direction='backward',
+                               sample_rate=self.ih.sample_rate)
+
+    def _fft_frequency(self, fft):
+        # Add an axis for the dispersion measures.
+        return fft.frequency[:, np.newaxis]
+
+    def task(self, data):
+        ft = self._fft(data)
+        ft = ft[:, np.newaxis] * self.phase_factor
+        result = self._ifft(ft)
+        return result[self._pad_slice]
+
+
+class IncoherentDedisperse(PaddedTaskBase):
+    """Incoherently dedisperse a stream of channelized power.
+
+    Uses the Fast Dispersion Measure Transform (FDMT) of Zackay & Ofek
+    (2017, ApJ 835, 11) to sum the power over all channels, shifted by the
+    dispersion delays, for all dispersion measures for which the delays
+    across the band differ by an integer number of samples, from 0 up to
+    a given maximum.
+
+    Parameters
+    ----------
+    ih : task or `baseband` stream reader
+        Input power stream, with time as the first axis and frequency as
+        the second, e.g., produced by `~scintillometry.functions.Square`
+        or `~scintillometry.functions.Power` following
+        `~scintillometry.channelize.Channelize`.  Any further axes (e.g.,
+        polarization) are dealt with independently.
+    dm : float or `~scintillometry.dm.DispersionMeasure` quantity
+        Maximum dispersion measure to search.
+    samples_per_frame : int, optional
+        Number of samples which should be dedispersed in one go. The number of
+        output dedispersed samples per frame will be smaller by the maximum
+        delay.  If not given, the minimum power of 2 needed to get at least
+        75% efficiency.
+    frequency : `~astropy.units.Quantity`, optional
+        Central frequencies of the channels in ``ih``.  Should be at least
+        two, and the channels are assumed to extend halfway to their
+        neighbours.  Default: taken from ``ih`` (if available).
+
+    Notes
+    -----
+    The dispersion measures are given by the ``dm`` attribute.  The output
+    has these as the second axis, i.e., the sample shape is
+    ``(len(dm),) + ih.sample_shape[1:]``.  The power is summed over all
+    channels, with times referring to the top of the band.
+
+    The overlap needed between frames is kept from one frame to the next,
+    so that reading sequentially requires reading each sample only once.
+    """
+
+    def __init__(self, ih, dm, samples_per_frame=None, frequency=None):
+        if ih.complex_data:
+            raise ValueError("stream should hold real power, e.g., "
+                             "produced by Square.")
+        if frequency is None:
+            frequency = ih.frequency
+        frequency = np.broadcast_to(frequency, ih.sample_shape, subok=True)
+        frequency = frequency.reshape(ih.shape[1:2] + (-1,))[:, 0]
+        if len(frequency) < 2:
+            raise ValueError("need at least two channels.")
+
+        # Get the channel edges, in increasing order.
+        order = np.argsort(frequency)
+        frequency = frequency[order]
+        edges = u.Quantity([1.5 * frequency[0] - 0.5 * frequency[1]]
+                           + list((frequency[1:] + frequency[:-1]) / 2.)
+                           + [1.5 * frequency[-1] - 0.5 * frequency[-2]])
+        low, high = edges[:-1], edges[1:]
+        # Express delays in samples relative to the top of a band for
+        # a dispersion measure of unity.
+        unit_dm = DispersionMeasure(1.)
+
+        def max_delay(f_low, f_high):
+            return (unit_dm.time_delay(f_low, f_high)
+                    * ih.sample_rate).to_value(u.one)
+
+        dm = DispersionMeasure(dm).to_value(unit_dm.unit)
+        n_delay = int(np.ceil(dm * max_delay(low[0], high[-1])))
+        super().__init__(ih, pad_end=n_delay,
+                         samples_per_frame=samples_per_frame)
+        self.dm = DispersionMeasure(
+            np.arange(n_delay + 1) / max_delay(low[0], high[-1]))
+        self._shape = (self._shape[:1] + self.dm.shape
+                       + self.ih.sample_shape[1:])
+        self._frequency = self._sideband = None
+        if ih.ndim <= 2:
+            self._polarization = None
+        self._channel_order = order
+
+        # Number of delays needed for each channel.
+        self._n_delays = [int(np.ceil(d)) + 1 for d in
+                          dm * max_delay(low, high)]
+        # Set up the pairwise merges of sub-bands, as a list with, for
+        # each iteration, the merges to do, each with the number of delays
+        # in the lower and upper sub-band to combine, where sub-bands
+        # without a partner are passed on as `None`.
+        self._merges = []
+        n_delays = self._n_delays
+        while len(low) > 1:
+            merges = []
+            new_low, new_high, new_n_delays = [], [], []
+            for i in range(0, len(low) - 1, 2):
+                f_low, f_middle, f_high = low[i], low[i+1], high[i+1]
+                n = int(np.ceil(dm * max_delay(f_low, f_high))) + 1
+                delay = np.arange(n)
+                upper = np.around(delay * (max_delay(f_middle, f_high)
+                                           / max_delay(f_low, f_high)))
+                upper = np.minimum(upper.astype(int), n_delays[i+1] - 1)
+                lower = np.minimum(delay - upper, n_delays[i] - 1)
+                merges.append((lower, upper))
+                new_low.append(f_low)
+                new_high.append(f_high)
+                new_n_delays.append(n)
+            if len(low) % 2:
+                merges.append(None)
+                new_low.append(low[-1])
+                new_high.append(high[-1])
+                new_n_delays.append(n_delays[-1])
+            self._merges.append(merges)
+            low = u.Quantity(new_low)
+            high = u.Quantity(new_high)
+            n_delays = new_n_delays
+
+    def task(self, data):
+        n = data.shape[0]
+        data = data[:, self._channel_order]
+        # Initialize with the power in each channel summed over the delays
+        # within the channel.  Sums beyond the end of the frame are invalid,
+        # but do not influence the samples that are returned.
+        bands = []
+        for channel, n_delay in enumerate(self._n_delays):
+            band = np.zeros((n_delay, n) + data.shape[2:], self.dtype)
+            band[0] = data[:, channel]
+            for delay in range(1, n_delay):
+                band[delay, :n-delay] = (band[delay-1, :n-delay]
+                                         + data[delay:, channel])
+            bands.append(band)
+
+        # Combine pairs of adjacent sub-bands, shifting the lower one
+        # by the delay across the upper one.
+        for merges in self._merges:
+            new_bands = []
+            for i, merge in enumerate(merges):
+                if merge is None:
+                    new_bands.append(bands[2*i])
+                    continue
+
+                low, high = bands[2*i], bands[2*i+1]
+                lower, upper = merge
+                band = high[upper]
+                for delay, (d_low, d_high) in enumerate(zip(lower, upper)):
+                    band[delay, :n-d_high] += low[d_low, d_high:]
+                new_bands.append(band)
+
+            bands = new_bands
+
+        result = np.moveaxis(bands[0], 0, 1)
+        return result[:self.samples_per_frame]
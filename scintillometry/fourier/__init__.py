@@ -14,6 +14,11 @@ Implementation Notes
 For each packages, there is a corresponding ``*FFTMaker`` class, which
 holds default information needed for creating an FFT instance. For
 instance, for `PyfftwFFTMaker`, this holds ``flags``, ``threads``, etc.
+For the system default `PyfftwFFTMaker`, the number of threads is taken
+from the ``OMP_NUM_THREADS`` environment variable.  By default, plans
+are estimated, but if ``SCINTILLOMETRY_FFTW_WISDOM`` is set, they are
+measured, with the resulting FFTW wisdom loaded from and saved to the
+file it gives.
 
 These ``*FFTMaker`` instances in turn can be used to create ``*FFT``
 instances which are set up to do the FFT on data with a given shape, in
@@ -24,11 +29,9 @@ from .numpy import NumpyFFTMaker
 
 # If pyfftw is available, import PyfftwFFTMaker.
 try:
-    from .pyfftw import PyfftwFFTMaker
+    from .pyfftw import PyfftwFFTMaker, _system_default  # noqa
     from os import environ
-    fft_maker._system_default = PyfftwFFTMaker(
-        flags=['FFTW_ESTIMATE', 'FFTW_DESTROY_INPUT'],
-        threads=int(environ.get('OMP_NUM_THREADS', 2)))
-    del environ
+    fft_maker._system_default = _system_default(environ)
+    del environ, _system_default
 except ImportError:
     fft_maker._system_default = NumpyFFTMaker()
@@ -8,7 +8,17 @@ The code for `PyfftwFFTBase` is relatively complex to ensure that the
 input and output arrays are re-used, even between the forward and
 backward transforms (if created using :meth:`PyfftwFFTBase.inverse`)
 
+Plans are created from FFTW's wisdom whenever possible: FFTW remembers
+the plans it measured within a process, and `PyfftwFFTMaker` can load
+and save this wisdom from a file, so that planning with, e.g.,
+``FFTW_MEASURE`` is done only once for a given problem, rather than
+for every task and every job.  Only if no wisdom is available is a new
+plan measured, with the contents of the arrays preserved.
+
 """
+import json
+import os
+import warnings
 
 import pyfftw
 
@@ -18,6 +28,54 @@ from .base import FFTMakerBase, FFTBase
 __all__ = ['PyfftwFFTBase', 'PyfftwFFTMaker']
 
 
+# Planning flags for which FFTW does not need to measure.
+_NO_MEASURE_FLAGS = {'FFTW_ESTIMATE', 'FFTW_WISDOM_ONLY'}
+_WISDOM_KEYS = ('double', 'single', 'long double')
+
+
+def _load_wisdom(filename):
+    """Import FFTW wisdom from a file, if it exists."""
+    try:
+        with open(filename) as f:
+            wisdom = json.load(f)
+        pyfftw.import_wisdom(tuple(wisdom[key].encode('ascii')
+                                   for key in _WISDOM_KEYS))
+    except FileNotFoundError:
+        pass
+    except Exception as exc:
+        warnings.warn("could not load FFTW wisdom from {}: {}"
+                      .format(filename, exc))
+
+
+def _save_wisdom(filename):
+    """Export FFTW wisdom to a file, merging with what is there already."""
+    # Import first, so that wisdom saved by other processes is kept.
+    _load_wisdom(filename)
+    wisdom = dict(zip(_WISDOM_KEYS, (w.decode('ascii')
+                                     for w in pyfftw.export_wisdom())))
+    # Write to a temporary file first, so that other processes
+    # never see an incomplete file.
+    tmp_file = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(tmp_file, 'w') as f:
+        json.dump(wisdom, f)
+    os.replace(tmp_file, filename)
+
+
+def _system_default(environ):
+    """Create the system default maker, using settings from ``environ``.
+
+    The number of threads is taken from ``OMP_NUM_THREADS`` (default 2).
+    If ``SCINTILLOMETRY_FFTW_WISDOM`` is set, wisdom is loaded from and
+    saved to that file, and plans are measured, since only measured plans
+    yield wisdom; otherwise, plans are estimated.
+    """
+    wisdom_file = environ.get('SCINTILLOMETRY_FFTW_WISDOM')
+    planning = 'FFTW_ESTIMATE' if wisdom_file is None else 'FFTW_MEASURE'
+    return PyfftwFFTMaker(flags=[planning, 'FFTW_DESTROY_INPUT'],
+                          threads=int(environ.get('OMP_NUM_THREADS', 2)),
+                          wisdom_file=wisdom_file)
+
+
 class PyfftwFFTBase(FFTBase):
     """Single pre-defined FFT based on `pyfftw.FFTW`.
 
@@ -34,6 +92,16 @@ class PyfftwFFTBase(FFTBase):
     _inverse = None
 
     def _fft(self, a):
+        if not a.flags.writeable:
+            # Do not let FFTW adopt read-only input, such as a view of a
+            # frame cached by another task, as it may overwrite it.
+            if self._fftw is None:
+                b = pyfftw.empty_aligned(a.shape, a.dtype, n=self._n_simd)
+            else:
+                b = self._fftw.input_array
+            b[...] = a
+            a = b
+
         if self._fftw is None:
             a = pyfftw.byte_align(a, n=self._n_simd)
             self._setup_fftw(a)
@@ -81,17 +149,38 @@ class PyfftwFFTBase(FFTBase):
                                              self._time_dtype,
                                              n=self._n_simd)
 
-        direction = 'FFTW_{}'.format(self.direction.upper())
-        self._fftw = pyfftw.FFTW(a, b, axes=(self.axis,),
-                                 direction=direction,
-                                 normalise_idft=self._normalise_idft,
-                                 ortho=self._ortho,
-                                 **self._fftw_kwargs)
+        self._fftw = self._plan(a, b)
         # Set up original with same arrays if it wasn't set up before us,
         # so that self._inverse._fftw is guaranteed to exist in _fft.
         if self._inverse is not None and self._inverse._fftw is None:
             self._inverse._setup_fftw(b, a)
 
+    def _plan(self, a, b):
+        # Create the FFTW plan, from wisdom if possible.  Otherwise, plan
+        # anew, restoring the arrays afterwards, since measuring overwrites
+        # them, and save the new wisdom if requested.
+        kwargs = dict(axes=(self.axis,),
+                      direction='FFTW_{}'.format(self.direction.upper()),
+                      normalise_idft=self._normalise_idft, ortho=self._ortho)
+        kwargs.update(self._fftw_kwargs)
+        flags = tuple(kwargs.pop('flags', ('FFTW_MEASURE',)))
+        if _NO_MEASURE_FLAGS.intersection(flags):
+            return pyfftw.FFTW(a, b, flags=flags, **kwargs)
+
+        try:
+            return pyfftw.FFTW(a, b, flags=flags+('FFTW_WISDOM_ONLY',),
+                               **kwargs)
+        except RuntimeError:
+            pass
+
+        a_copy, b_copy = a.copy(), b.copy()
+        fftw = pyfftw.FFTW(a, b, flags=flags, **kwargs)
+        a[...] = a_copy
+        b[...] = b_copy
+        if self._wisdom_file is not None:
+            _save_wisdom(self._wisdom_file)
+        return fftw
+
 
 class PyfftwFFTMaker(FFTMakerBase):
     """FFT factory class utilizing the `pyfftw` package.
@@ -109,15 +198,30 @@ class PyfftwFFTMaker(FFTMakerBase):
     n_simd : int or None, optional
       Single Instruction Multiple Data (SIMD) alignment in bytes.  If `None`,
       uses ``pyfftw.simd_alignment``, which is found by inspecting the CPU.
+    wisdom_file : str or None, optional
+      File from which to load FFTW wisdom, and to which to save it whenever
+      a new plan has been measured.  This avoids repeating slow planning
+      (e.g., with ``FFTW_MEASURE``) in every job.  The file need not exist.
     **kwargs
       Optional keywords to `pyfftw.FFTW` class, including planning flags, the
       number of threads to be used, and the planning time limit.
+
+    Notes
+    -----
+    Within a process, FFTW remembers all plans it has measured, so
+    transforms with the same shape, dtype, axis, direction, flags, and
+    number of threads as an earlier one are planned from that wisdom,
+    without measuring again.  Note that wisdom is only useful for flags
+    that imply measuring, i.e., not for ``FFTW_ESTIMATE``.
     """
     _FFTBase = PyfftwFFTBase
 
-    def __init__(self, n_simd=None, **kwargs):
+    def __init__(self, n_simd=None, wisdom_file=None, **kwargs):
         self._n_simd = pyfftw.simd_alignment if n_simd is None else n_simd
+        self._wisdom_file = wisdom_file
         self._fftw_kwargs = kwargs
+        if wisdom_file is not None:
+            _load_wisdom(wisdom_file)
         super().__init__()
 
     def __call__(self, shape, dtype, direction='forward', axis=0, ortho=False,
@@ -152,9 +256,12 @@ class PyfftwFFTMaker(FFTMakerBase):
             shape=shape, dtype=dtype, direction=direction,
             axis=axis, ortho=ortho, sample_rate=sample_rate,
             normalise_idft=(False if ortho else True),
-            n_simd=self._n_simd, fftw_kwargs=self._fftw_kwargs)
+            n_simd=self._n_simd, fftw_kwargs=self._fftw_kwargs,
+            wisdom_file=self._wisdom_file)
 
     def __repr__(self):
         self._repr_kwargs = dict(n_simd=self._n_simd)
+        if self._wisdom_file is not None:
+            self._repr_kwargs['wisdom_file'] = self._wisdom_file
         self._repr_kwargs.update(self._fftw_kwargs)
         return super().__repr__()
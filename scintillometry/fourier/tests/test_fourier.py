@@ -1,5 +1,6 @@
 # Licensed under the GPLv3 - see LICENSE
 import copy
+import os
 
 import numpy as np
 import astropy.units as u
@@ -234,3 +235,89 @@ class TestPyfftwFFT:
         y1 = fft1(x.copy())
         y2 = fft2(x.copy())
         assert np.allclose(y1, y2 / np.sqrt(16))
+
+    def test_read_only_input_not_adopted(self):
+        import pyfftw
+
+        x = np.linspace(0., 10., 8192)
+        y = pyfftw.empty_aligned(x.shape, dtype=complex)
+        y[:] = np.exp(1.j * 2. * np.pi * x)
+        y.flags.writeable = False
+        fft = self.maker(flags=['FFTW_ESTIMATE', 'FFTW_DESTROY_INPUT'])(
+            y.shape, y.dtype)
+        ifft = fft.inverse()
+        Y = fft(y)
+        assert fft._fftw.input_array is not y
+        assert np.allclose(Y, np.fft.fft(y))
+        Y2 = fft(y[::-1])
+        assert np.allclose(Y2, np.fft.fft(y[::-1]))
+        y_back = ifft(Y2)
+        assert np.allclose(y_back, y[::-1])
+        assert not y.flags.writeable
+
+    @pytest.mark.parametrize('dtype', ('c16', 'f8'))
+    def test_measure_preserves_input(self, dtype):
+        import pyfftw
+
+        pyfftw.forget_wisdom()
+        x = np.linspace(0., 10., 1000)
+        y = np.exp(1.j * 2. * np.pi * x).astype(dtype)
+        y_copy = y.copy()
+        fft = self.maker(flags=['FFTW_MEASURE'])(y.shape, y.dtype)
+        ifft = fft.inverse()
+        Y = fft(y)
+        assert np.all(y == y_copy)
+        assert np.allclose(Y, np.fft.fft(y_copy)[:len(Y)])
+        Y_copy = Y.copy()
+        y_back = ifft(Y)
+        assert np.allclose(y_back, y_copy)
+        # A second transform should be planned from the wisdom.
+        fft2 = self.maker(flags=['FFTW_MEASURE', 'FFTW_WISDOM_ONLY'])(
+            y.shape, y.dtype)
+        assert np.allclose(fft2(y_copy.copy()), Y_copy)
+
+    def test_wisdom_file(self, tmpdir):
+        import pyfftw
+
+        wisdom_file = str(tmpdir.join('wisdom.json'))
+        pyfftw.forget_wisdom()
+        maker = self.maker(flags=['FFTW_MEASURE'], wisdom_file=wisdom_file)
+        assert 'wisdom_file' in repr(maker)
+        fft = maker((1024,), 'c8')
+        x = np.ones(1024, 'c8')
+        fft(x)
+        assert os.path.exists(wisdom_file)
+        # Without wisdom, planning with FFTW_WISDOM_ONLY fails.
+        pyfftw.forget_wisdom()
+        with pytest.raises(RuntimeError):
+            self.maker(flags=['FFTW_MEASURE', 'FFTW_WISDOM_ONLY'])(
+                (1024,), 'c8')(x)
+        # But it works after loading it from file.
+        self.maker(wisdom_file=wisdom_file)
+        fft2 = self.maker(flags=['FFTW_MEASURE', 'FFTW_WISDOM_ONLY'])(
+            (1024,), 'c8')
+        assert np.allclose(fft2(x), np.fft.fft(x))
+
+    def test_system_default_wisdom(self, tmpdir):
+        import pyfftw
+        from ..pyfftw import _system_default
+
+        maker = _system_default({})
+        assert 'FFTW_ESTIMATE' in maker._fftw_kwargs['flags']
+        assert maker._wisdom_file is None
+        wisdom_file = str(tmpdir.join('wisdom.json'))
+        pyfftw.forget_wisdom()
+        maker = _system_default({'SCINTILLOMETRY_FFTW_WISDOM': wisdom_file,
+                                 'OMP_NUM_THREADS': '1'})
+        assert 'FFTW_MEASURE' in maker._fftw_kwargs['flags']
+        assert maker._fftw_kwargs['threads'] == 1
+        x = np.ones(1024, 'c8')
+        assert np.allclose(maker((1024,), 'c8')(x.copy()), np.fft.fft(x))
+        assert os.path.exists(wisdom_file)
+
+    def test_corrupt_wisdom_file(self, tmpdir):
+        wisdom_file = str(tmpdir.join('wisdom.json'))
+        with open(wisdom_file, 'w') as f:
+            f.write('garbage')
+        with pytest.warns(UserWarning, match='could not load'):
+            self.maker(wisdom_file=wisdom_file)
@@ -0,0 +1,116 @@
+# Licensed under the GPLv3 - see LICENSE
+"""Fusion of tasks that operate in the Fourier domain."""
+
+import numpy as np
+from astropy.utils import lazyproperty
+
+from .base import PaddedTaskBase
+from .fourier import fft_maker
+
+
+__all__ = ['Fuse']
+
+
+class Fuse(PaddedTaskBase):
+    """Combine consecutive Fourier-domain tasks in a single transform.
+
+    Tasks such as `~scintillometry.dispersion.Dedisperse`,
+    `~scintillometry.sampling.Resample`, and
+    `~scintillometry.convolution.Convolve` each Fourier transform their
+    input, multiply by a factor, and transform back.  If several of those
+    follow each other, this task replaces them by a single forward
+    transform, a multiplication with the product of their factors, and
+    a single inverse transform, with padding equal to the sum of the
+    paddings of the separate tasks.
+
+    Parameters
+    ----------
+    ih : task
+        The last of the sequence of tasks to be fused.  The sequence is
+        followed upstream (via the ``ih`` attributes) for as long as tasks
+        operate in the Fourier domain.
+    samples_per_frame : int, optional
+        Number of samples which should be processed in one go. The number of
+        output samples per frame will be smaller to avoid wrapping.
+        If not given, the minimum power of 2 needed to get at least 75%
+        efficiency.
+
+    Notes
+    -----
+    The start time, frequency, sideband, and polarization, as well as the
+    current offset, are taken from ``ih``.  Since the fused task reads
+    frames of its own size, the total number of samples can differ
+    slightly from that of ``ih``.
+
+    Only the stream underlying the sequence is read; the tasks in the
+    sequence are used just to calculate the combined Fourier-domain factor.
+
+    See Also
+    --------
+    scintillometry.fourier.fft_maker : to select the FFT package used.
+
+    Examples
+    --------
+    To dedisperse a stream and resample it such that a sample falls on a
+    given time, using only one forward and one inverse FFT per frame::
+
+        >>> from scintillometry.dispersion import Dedisperse
+        >>> from scintillometry.sampling import Resample
+        >>> from scintillometry.fusion import Fuse
+        >>> dd = Dedisperse(fh, dm)  # doctest: +SKIP
+        >>> rh = Fuse(Resample(dd, time))  # doctest: +SKIP
+    """
+
+    def __init__(self, ih, *, samples_per_frame=None):
+        stages = []
+        stage = ih
+        while (callable(getattr(stage, '_fourier_factor', None))
+               and stage.sample_shape == stage.ih.sample_shape):
+            stages.insert(0, stage)
+            stage = stage.ih
+
+        if not stages:
+            raise ValueError("can only fuse tasks that operate in the "
+                             "Fourier domain, such as Dedisperse.")
+
+        pad_start = sum(stage._pad_start for stage in stages)
+        pad_end = sum(stage._pad_end for stage in stages)
+        super().__init__(stages[0].ih, pad_start=pad_start, pad_end=pad_end,
+                         samples_per_frame=samples_per_frame,
+                         frequency=getattr(ih, 'frequency', None),
+                         sideband=getattr(ih, 'sideband', None),
+                         polarization=getattr(ih, 'polarization', None))
+        # Sample offsets due to the tasks are included in their factors.
+        self._start_time = ih.start_time
+        self._stages = stages
+        self._fft = fft_maker(shape=(self._padded_samples_per_frame,)
+                              + self.ih.sample_shape, dtype=self.ih.dtype,
+                              sample_rate=self.ih.sample_rate)
+        self._ifft = self._fft.inverse()
+        self._pad_slice = slice(self._pad_start,
+                                self._padded_samples_per_frame - self._pad_end)
+        if ih.offset < self.shape[0]:
+            self.seek(ih.offset)
+
+    @lazyproperty
+    def fourier_factor(self):
+        """Combined factor to multiply the Fourier-transformed frame with."""
+        fourier_factor = self._stages[0]._fourier_factor(self._fft)
+        for stage in self._stages[1:]:
+            fourier_factor = fourier_factor * stage._fourier_factor(self._fft)
+        return np.asanyarray(fourier_factor).astype(
+            self._fft.frequency_dtype, copy=False)
+
+    def task(self, data):
+        ft = self._fft(data)
+        ft *= self.fourier_factor
+        result = self._ifft(ft)
+        return result[self._pad_slice]
+
+    def close(self):
+        super().close()
+        # Clear the caches of the lazyproperties to release memory.
+        del self.fourier_factor
+        del self._fft
+        del self._ifft
+        del self._stages
@@ -1,17 +1,21 @@
 # Licensed under the GPLv3 - see LICENSE
 """Tasks for integration over time and pulse phase."""
 
+import json
 import operator
+import os
+import time
 import warnings
 
 import numpy as np
 from astropy import units as u
+from astropy.time import Time
 from astropy.utils import ShapedLikeNDArray, lazyproperty
 
 from .base import BaseTaskBase
 
 
-__all__ = ['Integrate', 'Fold', 'Stack']
+__all__ = ['Integrate', 'Fold', 'Stack', 'Checkpoint']
 
 
 class _FakeOutput(ShapedLikeNDArray):
@@ -38,6 +42,115 @@ class _FakeOutput(ShapedLikeNDArray):
         raise NotImplementedError("No _apply possible for _FakeOutput")
 
 
+class Checkpoint:
+    """Store completed frames of a task on disk, to allow resuming.
+
+    The frames are stored in a memory-mapped ``.npy`` file, and which frames
+    have been completed in a ``.json`` file alongside it, together with a
+    key describing the settings of the task.  The latter file is only
+    updated after the frames have been flushed to disk, so that if a run is
+    interrupted, all frames recorded as completed can be trusted.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the ``.npy`` file.  If it exists, together with its ``.json``
+        file, frames are loaded from it.
+    shape : tuple
+        Shape of the task output.
+    dtype : `~numpy.dtype`
+        Dtype of the task output.
+    samples_per_frame : int
+        Number of samples in a frame.
+    key : dict, optional
+        Settings of the task, which should be the same when resuming.
+        Should be serializable with `json`.  The shape, dtype and samples
+        per frame are always included.  Anything else that affects the
+        output, such as the input stream and, for folding, the phase model,
+        should be identified by the caller.
+    interval : `~astropy.units.Quantity`, optional
+        Minimum wall-clock time between saves.  Default: 1 minute.
+    """
+
+    def __init__(self, filename, shape, dtype, samples_per_frame, key=None,
+                 interval=1. * u.min):
+        self.filename = filename
+        self.samples_per_frame = samples_per_frame
+        self.interval = interval.to_value(u.s)
+        self._state_file = os.path.splitext(filename)[0] + '.json'
+        self._key = dict(key or {}, shape=list(shape),
+                         dtype=str(np.dtype(dtype)),
+                         samples_per_frame=samples_per_frame)
+        # Frames recorded as completed on disk, and in the file so far.
+        self._done = np.zeros(shape[0] // samples_per_frame, bool)
+        if os.path.exists(filename) and os.path.exists(self._state_file):
+            with open(self._state_file) as f:
+                state = json.load(f)
+            if state['key'] != self._key:
+                raise ValueError("checkpoint '{}' was made with different "
+                                 "settings.".format(filename))
+            self._data = np.lib.format.open_memmap(filename, mode='r+')
+            self._done[state['done']] = True
+        else:
+            self._data = np.lib.format.open_memmap(
+                filename, mode='w+', dtype=dtype, shape=shape)
+        self._completed = self._done.copy()
+        self.save()
+
+    @property
+    def n_done(self):
+        """Number of frames recorded as completed on disk."""
+        return int(self._done.sum())
+
+    def get(self, frame_index):
+        """Get a copy of a completed frame, or `None` if not available."""
+        if not self._completed[frame_index]:
+            return None
+        start = frame_index * self.samples_per_frame
+        return np.array(self._data[start:start + self.samples_per_frame])
+
+    def add(self, frame_index, frame):
+        """Store a completed frame, saving if enough time has passed."""
+        start = frame_index * self.samples_per_frame
+        self._data[start:start + self.samples_per_frame] = frame
+        self._completed[frame_index] = True
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        """Flush completed frames to disk and record them as done."""
+        self._data.flush()
+        self._done[...] = self._completed
+        state = {'key': self._key,
+                 'done': np.nonzero(self._done)[0].tolist()}
+        # Write to a temporary file first, so that an interruption cannot
+        # leave a partially written state.
+        tmp_file = self._state_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self._state_file)
+        self._last_save = time.monotonic()
+
+    def close(self):
+        self.save()
+        del self._data
+
+
+def _key_value(value):
+    """Represent a time, phase or quantity exactly for a checkpoint key."""
+    if value is None:
+        return None
+    if isinstance(value, Time):
+        return [np.asarray(value.jd1).tolist(),
+                np.asarray(value.jd2).tolist(), value.scale]
+    if hasattr(value, 'int') and hasattr(value, 'frac'):
+        # Phase; store integer and fractional parts to keep precision.
+        return [value.int.value.tolist(), value.frac.value.tolist(),
+                str(value.unit)]
+    value = u.Quantity(value)
+    return [value.value.tolist(), str(value.unit)]
+
+
 def is_index(n):
     """Helper that checks whether n is suitable for indexing."""
     try:
@@ -66,7 +179,9 @@ class Integrate(BaseTaskBase):
         Should return full pulse phase (i.e., including cycle count) for given
         input times (passed in as '~astropy.time.Time').  The output should be
         compatible with ``step``, i.e., generally an `~astropy.units.Quantity`
-        with angular units.
+        with angular units.  Since it is evaluated repeatedly, an expensive
+        calculation is best wrapped in an
+        `~scintillometry.phases.InterpolatedPhase` instance.
     start : `~astropy.time.Time` or int, optional
         Time or offset at which to start the integration. If an offset or if
         ``step`` is integer, the actual start time will the underlying sample
@@ -83,6 +198,16 @@ class Integrate(BaseTaskBase):
         stream is good enough, but can be used to increase precision.  Note
         that if ``average=True``, it is the user's responsibilty to pass in
         a structured dtype.
+    checkpoint : str, optional
+        Name of a ``.npy`` file in which to store completed output frames,
+        so that an interrupted run can be resumed.  If the file exists,
+        frames stored in it are used instead of being recalculated, but only
+        if the input stream and settings are the same (with a ``phase``
+        callable identified by the phases at the start and end of the
+        input).  See `~scintillometry.integration.Checkpoint`.
+    checkpoint_interval : `~astropy.units.Quantity`, optional
+        Minimum wall-clock time between saves of the checkpoint.
+        Default: 1 minute.
 
     Notes
     -----
@@ -99,7 +224,8 @@ class Integrate(BaseTaskBase):
     """
 
     def __init__(self, ih, step=None, phase=None, *,
-                 start=0, average=True, samples_per_frame=1, dtype=None):
+                 start=0, average=True, samples_per_frame=1, dtype=None,
+                 checkpoint=None, checkpoint_interval=1. * u.min):
         ih_start = ih.seek(start)
         ih_n_sample = ih.shape[0] - ih_start
         if ih_start < 0 or ih_n_sample < 0:
@@ -137,6 +263,7 @@ class Integrate(BaseTaskBase):
             # Initialize values for _get_offsets.
             self._mean_offset_size = n_sample / ih_n_sample
             self._start = start
+            self._stop = stop
 
         if dtype is None:
             if average:
@@ -150,6 +277,38 @@ class Integrate(BaseTaskBase):
         self.average = average
         self._phase = phase
         self._ih_start = ih_start
+        self._checkpoint_file = checkpoint
+        self._checkpoint_interval = checkpoint_interval
+
+    @lazyproperty
+    def checkpoint(self):
+        """Checkpoint used to store completed frames (`None` if not used).
+
+        Created on first access, once the output shape is fixed.
+        """
+        if self._checkpoint_file is None:
+            return None
+
+        return Checkpoint(self._checkpoint_file, self.shape, self.dtype,
+                          self.samples_per_frame, key=self._checkpoint_key(),
+                          interval=self._checkpoint_interval)
+
+    def _checkpoint_key(self):
+        """Settings that should be the same when resuming from a checkpoint.
+
+        These identify the underlying stream and determine the offsets in it
+        of the output samples.  For a phase callable, the phases at the start
+        and end of the stream serve to identify the phase model (e.g., they
+        change if the ephemeris is updated).
+        """
+        return {'ih_shape': list(self.ih.shape),
+                'ih_start_time': _key_value(self.ih.start_time),
+                'ih_sample_rate': _key_value(self.ih.sample_rate),
+                'ih_start': float(self._ih_start),
+                'mean_offset_size': float(self._mean_offset_size),
+                'start': _key_value(getattr(self, '_start', None)),
+                'stop': _key_value(getattr(self, '_stop', None)),
+                'sample_rate': _key_value(self.sample_rate)}
 
     def _ih_time(self, offset):
         """Get time in underlying stream for given offset.
@@ -245,6 +404,19 @@ class Integrate(BaseTaskBase):
         return offsets.round().astype(int).reshape(shape)
 
     def _read_frame(self, frame_index):
+        """Get a frame from the checkpoint, or integrate to calculate it."""
+        checkpoint = self.checkpoint
+        if checkpoint is not None:
+            frame = checkpoint.get(frame_index)
+            if frame is not None:
+                return frame
+
+        frame = self._integrate_frame(frame_index)
+        if checkpoint is not None:
+            checkpoint.add(frame_index, frame)
+        return frame
+
+    def _integrate_frame(self, frame_index):
         """Determine which samples to read, and integrate over them.
 
         Uses the a ``_get_offsets`` method to determine where in the underlying
@@ -287,6 +459,11 @@ class Integrate(BaseTaskBase):
 
         return frame
 
+    def close(self):
+        if self.__dict__.get('checkpoint') is not None:
+            self.checkpoint.close()
+        super().close()
+
     def _integrate(self, item, data):
         """Sum data in the correct samples.
 
@@ -333,7 +510,9 @@ class Fold(Integrate):
         Should return pulse phases (with or without cycle count) for given
         input time(s), passed in as an '~astropy.time.Time' object.  The output
         can be an `~astropy.units.Quantity` with angular units or a regular
-        array of float (in which case units of cycles are assumed).
+        array of float (in which case units of cycles are assumed).  Since it
+        is evaluated for every input sample, an expensive calculation is best
+        wrapped in an `~scintillometry.phases.InterpolatedPhase` instance.
     step : int or `~astropy.units.Quantity`, optional
         Number of input samples or time interval over which to fold.
         If not given, the whole file will be folded into a single profile.
@@ -353,6 +532,16 @@ class Fold(Integrate):
         stream is good enough, but can be used to increase precision.  Note
         that if ``average=True``, it is the user's responsibilty to pass in
         a structured dtype.
+    checkpoint : str, optional
+        Name of a ``.npy`` file in which to store completed profiles, so that
+        an interrupted run can be resumed.  If the file exists, profiles
+        stored in it are used instead of being recalculated, but only if the
+        input stream and settings are the same (with ``phase`` identified by
+        the phases at the start and end of the input).  See
+        `~scintillometry.integration.Checkpoint`.
+    checkpoint_interval : `~astropy.units.Quantity`, optional
+        Minimum wall-clock time between saves of the checkpoint.
+        Default: 1 minute.
 
     See Also
     --------
@@ -373,21 +562,31 @@ class Fold(Integrate):
     """
 
     def __init__(self, ih, n_phase, phase, step=None, *,
-                 start=0, average=True, samples_per_frame=1, dtype=None):
+                 start=0, average=True, samples_per_frame=1, dtype=None,
+                 checkpoint=None, checkpoint_interval=1. * u.min):
         super().__init__(ih, step=step, start=start, average=average,
-                         samples_per_frame=samples_per_frame)
+                         samples_per_frame=samples_per_frame,
+                         checkpoint=checkpoint,
+                         checkpoint_interval=checkpoint_interval)
         # And ensure we reshape it to cycles.
         self._shape = (self._shape[0], n_phase) + ih.sample_shape
         self.n_phase = n_phase
         self.phase = phase
 
-    def _read_frame(self, frame_index):
+    def _checkpoint_key(self):
+        key = super()._checkpoint_key()
+        # Identify the phase model by the phases at the stream edges.
+        key['phase'] = _key_value(self.phase(
+            self.ih.start_time + [0., self.ih.shape[0]] / self.ih.sample_rate))
+        return key
+
+    def _integrate_frame(self, frame_index):
         # Before calling the underlying implementation, get the start time in
         # the underlying frame, to be used to calculate phases in _integrate.
         offset0 = self._get_offsets(frame_index * self.samples_per_frame)
         self.ih.seek(offset0)
         self._raw_time = self.ih.time
-        return super()._read_frame(frame_index)
+        return super()._integrate_frame(frame_index)
 
     def _integrate(self, item, raw):
         # Get sample and phase indices.
@@ -402,9 +601,30 @@ class Fold(Integrate):
         phase_index = ((phases % (1. * u.cycle)).to_value(u.cycle)
                        * self.n_phase).astype(int)
         # Do the actual folding, adding the data to the sums and counts.
-        # TODO: np.add.at is not very efficient; replace?
-        np.add.at(self._frame['data'], (sample_index, phase_index), raw)
-        np.add.at(self._frame['count'], (sample_index, phase_index), 1)
+        # For speed, rather than use np.add.at, we combine the sample and
+        # phase indices into a single bin index, and use np.bincount.
+        bin_index = sample_index * self.n_phase + phase_index
+        n_bin = self.samples_per_frame * self.n_phase
+        counts = np.bincount(bin_index, minlength=n_bin)
+        self._frame['count'] += counts.reshape(
+            (self.samples_per_frame, self.n_phase)
+            + (1,) * len(self.ih.sample_shape))
+        # For the data, include the sample elements in the index.
+        raw = raw.reshape(len(raw), -1)
+        n_element = raw.shape[1]
+        element_index = (bin_index[:, np.newaxis] * n_element
+                         + np.arange(n_element)).ravel()
+        sums = np.empty(n_bin * n_element,
+                        np.result_type(raw.dtype, np.float64))
+        if raw.dtype.kind == 'c':
+            sums.real = np.bincount(element_index, raw.real.ravel(),
+                                    minlength=sums.size)
+            sums.imag = np.bincount(element_index, raw.imag.ravel(),
+                                    minlength=sums.size)
+        else:
+            sums[...] = np.bincount(element_index, raw.ravel(),
+                                    minlength=sums.size)
+        self._frame['data'] += sums.reshape(self._frame['data'].shape)
 
 
 class Stack(BaseTaskBase):
@@ -437,6 +657,16 @@ class Stack(BaseTaskBase):
         stream is good enough, but can be used to increase precision.  Note
         that if ``average=True``, it is the user's responsibilty to pass in
         a structured dtype.
+    checkpoint : str, optional
+        Name of a ``.npy`` file in which to store completed profiles, so that
+        an interrupted run can be resumed.  If the file exists, profiles
+        stored in it are used instead of being recalculated, but only if the
+        input stream and settings are the same (with ``phase`` identified by
+        the phases at the start and end of the input).  See
+        `~scintillometry.integration.Checkpoint`.
+    checkpoint_interval : `~astropy.units.Quantity`, optional
+        Minimum wall-clock time between saves of the checkpoint.
+        Default: 1 minute.
 
     See Also
     --------
@@ -459,12 +689,15 @@ class Stack(BaseTaskBase):
     """
 
     def __init__(self, ih, n_phase, phase, *,
-                 start=0, average=True, samples_per_frame=1, dtype=None):
-        # Set up the integration in phase bins.
+                 start=0, average=True, samples_per_frame=1, dtype=None,
+                 checkpoint=None, checkpoint_interval=1. * u.min):
+        # Set up the integration in phase bins.  Since frames are read from
+        # it directly, it can take care of the checkpointing.
         phased = Integrate(ih, u.cycle/n_phase, phase,
                            start=start, average=average,
                            samples_per_frame=samples_per_frame*n_phase,
-                           dtype=dtype)
+                           dtype=dtype, checkpoint=checkpoint,
+                           checkpoint_interval=checkpoint_interval)
         # And ensure we reshape it to cycles.
         shape = (phased.shape[0] // n_phase, n_phase) + phased.shape[1:]
         super().__init__(phased, shape=shape,
@@ -482,3 +715,8 @@ class Stack(BaseTaskBase):
     def stop_time(self):
         """Time at the end of the output, just after the last sample."""
         return self.ih.stop_time
+
+    def close(self):
+        # Close our phase integrator, to ensure its checkpoint gets saved.
+        self.ih.close()
+        super().close()
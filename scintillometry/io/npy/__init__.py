@@ -0,0 +1,2 @@
+# Licensed under the GPLv3 - see LICENSE
+from .core import *  # noqa
@@ -0,0 +1,232 @@
+# Licensed under the GPLv3 - see LICENSE
+"""Interfaces for storing streams in memory-mapped numpy files.
+
+The data are stored in a ``.npy`` file, and the stream attributes such
+as ``start_time`` and ``sample_rate`` in a ``.json`` file alongside it.
+"""
+import io
+import json
+import math
+import operator
+import os
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import EarthLocation
+from astropy.time import Time
+
+from scintillometry.base import Base
+
+
+__all__ = ['open', 'StreamWriter', 'StreamReader']
+
+
+def open(filename, mode='r', **kwargs):
+    """Open a stream stored in a numpy file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the ``.npy`` file.  The attributes are stored in a file with
+        the same name but extension ``.json``.
+    mode : str
+        Open mode, either 'r' or 'w'.
+    **kwargs
+        Additional arguments for `~scintillometry.io.npy.StreamReader` or
+        `~scintillometry.io.npy.StreamWriter`.  For writing, this should
+        include the input stream ``ih``.
+
+    Returns
+    -------
+    fh : `~scintillometry.io.npy.StreamReader` or
+        `~scintillometry.io.npy.StreamWriter`
+    """
+    if mode == 'r':
+        return StreamReader(filename, **kwargs)
+    elif mode == 'w':
+        return StreamWriter(filename, **kwargs)
+    else:
+        raise ValueError("Unknown mode '{}'. Only 'r' and 'w' modes are "
+                         "supported.".format(mode))
+
+
+def _attrs_filename(filename):
+    return os.path.splitext(filename)[0] + '.json'
+
+
+def _encode_array(value):
+    """Encode an array or Quantity as a JSON-compatible dict."""
+    if value is None:
+        return None
+    encoded = {}
+    if isinstance(value, u.Quantity):
+        encoded['unit'] = value.unit.to_string()
+        value = value.value
+    value = np.asarray(value)
+    encoded.update(value=value.tolist(), shape=value.shape)
+    return encoded
+
+
+def _decode_array(encoded):
+    if encoded is None:
+        return None
+    value = np.array(encoded['value']).reshape(encoded['shape'])
+    if 'unit' in encoded:
+        value = u.Quantity(value, encoded['unit'], copy=False)
+    return value
+
+
+def _encode_time(time):
+    encoded = {'jd1': np.asarray(time.jd1).tolist(),
+               'jd2': np.asarray(time.jd2).tolist(),
+               'scale': time.scale}
+    if time.location is not None:
+        encoded['location'] = _encode_array(u.Quantity(
+            time.location.geocentric).to(u.m))
+    return encoded
+
+
+def _decode_time(encoded):
+    location = encoded.get('location')
+    if location is not None:
+        location = EarthLocation(*_decode_array(location))
+    return Time(encoded['jd1'], encoded['jd2'], format='jd',
+                scale=encoded['scale'], location=location, precision=9)
+
+
+class StreamWriter:
+    """Write a stream to a memory-mapped numpy file.
+
+    Frames are read from the input and written directly into the
+    memory-mapped output, so the stream never needs to be held in memory
+    as a whole.  The stream attributes are stored in a ``.json`` file
+    alongside the ``.npy`` file.  Both can be read back with
+    `~scintillometry.io.npy.StreamReader`.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the ``.npy`` file.
+    ih : task or `baseband` stream reader
+        Input data stream.
+    samples_per_frame : int, optional
+        Number of samples to read and write in one go.  Default: taken from
+        the input.
+
+    Notes
+    -----
+    On closing, only the samples written are recorded as part of the stream;
+    if fewer than in the input were written, the remainder of the ``.npy``
+    file will not be accessible via `~scintillometry.io.npy.StreamReader`.
+    """
+
+    def __init__(self, filename, ih, samples_per_frame=None):
+        self.filename = filename
+        self.ih = ih
+        if samples_per_frame is None:
+            samples_per_frame = ih.samples_per_frame
+        self.samples_per_frame = operator.index(samples_per_frame)
+        self.shape = ih.shape
+        self.offset = 0
+        self._data = np.lib.format.open_memmap(
+            filename, mode='w+', dtype=ih.dtype, shape=ih.shape)
+        self._attrs = {
+            'start_time': _encode_time(ih.start_time),
+            'sample_rate': _encode_array(ih.sample_rate),
+            'samples_per_frame': self.samples_per_frame}
+        for attr in ('frequency', 'sideband', 'polarization'):
+            self._attrs[attr] = _encode_array(getattr(ih, attr, None))
+        self._write_attrs()
+        self.closed = False
+
+    def _write_attrs(self):
+        self._attrs['nsample'] = self.offset
+        with io.open(_attrs_filename(self.filename), 'w') as f:
+            json.dump(self._attrs, f)
+
+    def write(self, count=None):
+        """Read samples from the input and write them to the file.
+
+        Parameters
+        ----------
+        count : int, optional
+            Number of samples to write.  Default: all remaining.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed writer.")
+        n_left = self.shape[0] - self.offset
+        if count is None or count < 0:
+            count = n_left
+        if count > n_left:
+            raise EOFError("cannot write beyond the end of the input.")
+
+        self.ih.seek(self.offset)
+        stop = self.offset + count
+        while self.offset < stop:
+            n = min(stop - self.offset,
+                    self.samples_per_frame
+                    - self.offset % self.samples_per_frame)
+            self.ih.read(out=self._data[self.offset:self.offset + n])
+            self.offset += n
+
+    def flush(self):
+        """Ensure the data written so far are on disk and readable."""
+        self._data.flush()
+        self._write_attrs()
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        del self._data
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class StreamReader(Base):
+    """Read a stream stored by `~scintillometry.io.npy.StreamWriter`.
+
+    The data are memory-mapped, so seeking is fast and only the data
+    actually read are loaded from disk.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the ``.npy`` file.
+    samples_per_frame : int, optional
+        Number of samples in a frame.  Default: as stored with the data,
+        or, if the number of samples stored is not a multiple of that, the
+        largest divisor of both.
+    """
+
+    def __init__(self, filename, samples_per_frame=None):
+        with io.open(_attrs_filename(filename)) as f:
+            attrs = json.load(f)
+        self.filename = filename
+        self._data = np.load(filename, mmap_mode='r')
+        nsample = attrs['nsample']
+        if samples_per_frame is None:
+            samples_per_frame = math.gcd(nsample, attrs['samples_per_frame'])
+        sideband = _decode_array(attrs['sideband'])
+        polarization = _decode_array(attrs['polarization'])
+        super().__init__(
+            shape=(nsample,) + self._data.shape[1:],
+            start_time=_decode_time(attrs['start_time']),
+            sample_rate=_decode_array(attrs['sample_rate']),
+            samples_per_frame=samples_per_frame,
+            frequency=_decode_array(attrs['frequency']),
+            sideband=sideband, polarization=polarization,
+            dtype=self._data.dtype)
+
+    def _read_frame(self, frame_index):
+        start = frame_index * self.samples_per_frame
+        return self._data[start:start + self.samples_per_frame]
+
+    def close(self):
+        super().close()
+        del self._data
@@ -0,0 +1,89 @@
+# Licensed under the GPLv3 - see LICENSE
+"""Tests of writing and reading streams to and from numpy files."""
+import pytest
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+from ... import npy
+from ....base import Task
+from ....generators import StreamGenerator
+from ....tests.common import UseVDIFSampleWithAttrs
+
+
+class TestNpyVDIF(UseVDIFSampleWithAttrs):
+    def test_round_trip(self, tmpdir):
+        filename = str(tmpdir.join('vdif.npy'))
+        fh = self.fh
+        expected = fh.read()
+        with npy.open(filename, 'w', ih=fh) as fw:
+            assert isinstance(fw, npy.StreamWriter)
+            fw.write()
+        with npy.open(filename) as fr:
+            assert isinstance(fr, npy.StreamReader)
+            assert fr.shape == fh.shape
+            assert fr.dtype == fh.dtype
+            assert fr.samples_per_frame == fh.samples_per_frame
+            assert fr.start_time == fh.start_time
+            assert fr.sample_rate == fh.sample_rate
+            assert np.all(fr.frequency == fh.frequency)
+            assert np.all(fr.sideband == fh.sideband)
+            assert np.all(fr.polarization == fh.polarization)
+            assert np.all(fr.read() == expected)
+            fr.seek(12345)
+            assert np.all(fr.read(20000) == expected[12345:32345])
+
+    def test_task(self, tmpdir):
+        # Sink a pipeline, writing in chunks of partial input frames.
+        filename = str(tmpdir.join('squared.npy'))
+        th = Task(self.fh, lambda data: data ** 2)
+        expected = th.read()
+        with npy.StreamWriter(filename, th, samples_per_frame=3000) as fw:
+            fw.write(7000)
+            assert fw.offset == 7000
+            fw.write(1000)
+        with npy.open(filename) as fr:
+            # Only part was written, so frame size adjusted.
+            assert fr.shape == (8000,) + th.sample_shape
+            assert fr.samples_per_frame == 1000
+            assert np.all(fr.read() == expected[:8000])
+
+
+class TestNpyGenerator:
+    def setup(self):
+        self.data = np.arange(40.).reshape(10, 4)
+        self.gen = StreamGenerator(
+            lambda sh: self.data[sh.tell():sh.tell()+sh.samples_per_frame],
+            shape=self.data.shape,
+            start_time=Time('2019-02-03T04:05:06.123456789',
+                            location=(10. * u.deg, 20. * u.deg)),
+            sample_rate=1. * u.kHz, samples_per_frame=5,
+            dtype='f8')
+
+    def test_no_frequency(self, tmpdir):
+        filename = str(tmpdir.join('gen.npy'))
+        with npy.open(filename, 'w', ih=self.gen) as fw:
+            fw.write()
+        with npy.open(filename) as fr:
+            assert fr.start_time == self.gen.start_time
+            assert fr.start_time.location == self.gen.start_time.location
+            assert fr.sample_rate == self.gen.sample_rate
+            with pytest.raises(AttributeError):
+                fr.frequency
+            assert np.all(fr.read() == self.data)
+
+    def test_flush(self, tmpdir):
+        filename = str(tmpdir.join('gen.npy'))
+        fw = npy.open(filename, 'w', ih=self.gen)
+        fw.write(5)
+        fw.flush()
+        with npy.open(filename) as fr:
+            assert fr.shape == (5, 4)
+            assert np.all(fr.read() == self.data[:5])
+        fw.close()
+        with pytest.raises(ValueError):
+            fw.write()
+
+    def test_invalid_mode(self, tmpdir):
+        with pytest.raises(ValueError):
+            npy.open(str(tmpdir.join('gen.npy')), 'a')
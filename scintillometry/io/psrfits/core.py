@@ -1,15 +1,22 @@
 # Licensed under the GPLv3 - see LICENSE
-"""Interfaces for dealing with PSRFITS fold-mode data."""
+"""Interfaces for dealing with PSRFITS fold-mode and search-mode data."""
 
+import glob
+import io
+from collections import OrderedDict
+
+import numpy as np
 from astropy.io import fits
 from astropy import log
+from astropy import units as u
 from collections import defaultdict
 
-from scintillometry.base import BaseTaskBase
-from .hdu import HDU_map
+from scintillometry.base import Base, BaseTaskBase
+from .hdu import HDU_map, PSRFITSPrimaryHDU, SubintHDU
 
 
-__all__ = ['open', 'get_readers', 'PSRFITSReader']
+__all__ = ['open', 'get_readers', 'PSRFITSReader', 'SequentialPSRFITSReader',
+           'PSRFITSWriter']
 
 
 def open(filename, mode='r', **kwargs):
@@ -17,12 +24,15 @@ def open(filename, mode='r', **kwargs):
 
     Parameters
     ----------
-    filename : str
-        Input PSRFITS file name.
+    filename : str, path-like, file-like, or list of str
+        Input PSRFITS file name.  For reading, can also be a list or tuple
+        of file names or a glob pattern for files with sequential data.
     mode : str
-        Open mode, currently, it only supports 'r'/'read' mode.
+        Open mode, currently, it only supports 'r' and 'w'.
     **kwargs
-        Additional arguments for opening the fits file and creating the reader.
+        Additional arguments for opening the fits file and creating the reader,
+        or for creating the writer (see
+        `~scintillometry.io.psrfits.PSRFITSWriter`).
 
     --- For opening the fits file :
 
@@ -36,35 +46,63 @@ def open(filename, mode='r', **kwargs):
     weighted :  bool, optional
         Whether the data should be weighted along the frequency axis.
         Default is `True`.
+    samples_per_frame : int, optional
+        Number of samples to read in one go; should be a multiple of the
+        number of samples per row.  Default: the number per row.
+    frequency, sideband, polarization, dtype : optional
+        Override the values inferred from the SUBINT HDU (see
+        `~scintillometry.io.psrfits.PSRFITSReader`).
     verify : bool, optional
         Whether to do basic checks on the PSRFITS HDUs.
         Default is `True`.
 
+    --- For multiple files or SUBINT HDUs :
+
+    max_open_files : int, optional
+        Maximum number of files kept open at the same time.  Default: 8.
+
     Returns
     -------
-    reader : file-handle like reader for the first SUBINT HDU
+    reader : file-handle like reader for the SUBINT HDU
+        If multiple files or SUBINT HDUs are present, a
+        `~scintillometry.io.psrfits.SequentialPSRFITSReader`.
+        For 'w' mode, a `~scintillometry.io.psrfits.PSRFITSWriter`.
 
     Raises
     ------
     RuntimeError
-        If more than one SUBINT HDU is present.
+        If no SUBINT HDU is present.
 
     Notes
     -----
-    The current version` only opens and reads one SUBINT HDU and ignores all
-    other types of HDUs.
+    Only SUBINT HDUs are read; all other types of HDUs are ignored.
     """
     if mode == 'r':
+        if isinstance(filename, str) and glob.has_magic(filename):
+            pattern = filename
+            filename = sorted(glob.glob(pattern))
+            if not filename:
+                raise FileNotFoundError("no files match '{}'."
+                                        .format(pattern))
+        if isinstance(filename, (list, tuple)):
+            return SequentialPSRFITSReader(filename, **kwargs)
+
         memmap = kwargs.pop('memmap', None)
         hdu_list = fits.open(filename, 'readonly', memmap=memmap)
+        n_subint = sum(hdu.name == 'SUBINT' for hdu in hdu_list)
+        if n_subint > 1:
+            hdu_list.close()
+            return SequentialPSRFITSReader([filename], memmap=memmap,
+                                           **kwargs)
         reader_list = get_readers(hdu_list, **kwargs)
-        # TODO: allow support for more than one HDU.
         if len(reader_list) != 1:
-            raise RuntimeError("Current reader can only read one SUBINT HDU.")
+            raise RuntimeError("File does not contain a SUBINT HDU.")
         return reader_list[0]
+    elif mode == 'w':
+        return PSRFITSWriter(filename, **kwargs)
     else:
-        raise ValueError("Unknown mode '{}'. Currently only 'r' mode are"
-                         " supported.".format(mode))
+        raise ValueError("Unknown mode '{}'. Currently only 'r' and 'w' "
+                         "modes are supported.".format(mode))
 
 
 def get_readers(hdu_list, **kwargs):
@@ -133,19 +171,34 @@ class PSRFITSReader(BaseTaskBase):
         Whether to weight the data along the frequency axis using the
         'DAT_WTS' column.  Default of `True` should suffice for most purposes,
         but sometimes the weights are incorrect.
+    samples_per_frame : int, optional
+        Number of samples to read in one go.  Should be a multiple of the
+        number of samples in a row of the HDU.  Larger values help reduce
+        overhead for HDUs with many small rows, but note that any rows
+        beyond the last complete frame will not be accessible.
+        Default: the number of samples in a row.
     """
     # Note: this very light-weight wrapper around SubintHDU is mostly here
     # because eventually it might unify different/multiple HDUs.
 
     def __init__(self, ih, frequency=None, sideband=None, polarization=None,
-                 dtype=None, weighted=True):
+                 dtype=None, weighted=True, samples_per_frame=None):
         self.weighted = weighted
+        if samples_per_frame is None:
+            samples_per_frame = ih.samples_per_frame
+        elif samples_per_frame % ih.samples_per_frame != 0:
+            raise ValueError("samples_per_frame should be a multiple of the "
+                             "number of samples per row, {}."
+                             .format(ih.samples_per_frame))
+        self._rows_per_frame = samples_per_frame // ih.samples_per_frame
         super().__init__(ih, frequency=frequency, sideband=sideband,
-                         polarization=polarization, dtype=dtype)
+                         polarization=polarization, dtype=dtype,
+                         samples_per_frame=samples_per_frame)
 
     def _read_frame(self, frame_index):
-        res = self.ih.read_data_row(frame_index, weighted=self.weighted).T
-        return res.reshape((self.samples_per_frame, ) + self.sample_shape)
+        start = frame_index * self._rows_per_frame
+        return self.ih.read_data_rows(start, start + self._rows_per_frame,
+                                      weighted=self.weighted)
 
     def close(self):
         file = self.ih.hdu._file
@@ -153,28 +206,345 @@ class PSRFITSReader(BaseTaskBase):
         file.close()
 
 
+class SequentialPSRFITSReader(Base):
+    """Reader of data sequential in time across PSRFITS files and HDUs.
+
+    On opening, the files are indexed using the headers and the start times
+    of their SUBINT HDUs, and all HDUs are presented as a single stream,
+    ordered in time.  Files are only opened when data in them are needed,
+    and at most ``max_open_files`` are kept open at any time.
+
+    Parameters
+    ----------
+    filenames : list of str
+        PSRFITS files to read.  They do not have to be in order.
+    frequency, sideband, polarization, dtype : optional
+        Passed on to the `~scintillometry.io.psrfits.PSRFITSReader` for
+        each SUBINT HDU.  Default: inferred from the first HDU.
+    weighted : bool, optional
+        Whether to weight the data along the frequency axis using the
+        'DAT_WTS' column.  Default: `True`.
+    samples_per_frame : int, optional
+        Number of samples to read in one go.  Should be a multiple of the
+        number of samples in a row, and frames cannot straddle HDUs, so for
+        all but the last HDU, the number of samples should be a multiple
+        of it as well.  Default: the number of samples in a row.
+    max_open_files : int, optional
+        Maximum number of files to keep open.  Default: 8.
+    memmap : bool, optional
+        Whether to use memory mapping.  Default: taken from the
+        ``astropy.io.fits.Conf.use_memmap`` configuration item.
+
+    Notes
+    -----
+    All HDUs should have the same sample shape, number of samples per row,
+    and sample rate.  A warning is given if the data are not contiguous in
+    time.  As for `~scintillometry.io.psrfits.PSRFITSReader`, any rows in
+    the last HDU beyond the last complete frame are not accessible.
+    """
+
+    def __init__(self, filenames, frequency=None, sideband=None,
+                 polarization=None, dtype=None, weighted=True,
+                 samples_per_frame=None, max_open_files=8, memmap=None):
+        if len(filenames) == 0:
+            raise ValueError("need at least one file to read.")
+        if max_open_files < 1:
+            raise ValueError("need to be able to open at least one file.")
+        self.max_open_files = max_open_files
+        self._memmap = memmap
+        self._reader_kwargs = dict(
+            frequency=frequency, sideband=sideband, polarization=polarization,
+            dtype=dtype, weighted=weighted,
+            samples_per_frame=samples_per_frame)
+        self._files = OrderedDict()
+
+        segments = []
+        for filename in filenames:
+            segments.extend(self._index(filename))
+        segments.sort(key=lambda segment: segment['start_time'].mjd)
+        self._segments = segments
+        first = segments[0]
+        for segment in segments[1:]:
+            if (segment['sample_shape'] != first['sample_shape']
+                    or segment['samples_per_row']
+                    != first['samples_per_row']):
+                raise ValueError("all SUBINT HDUs should have the same "
+                                 "sample shape and samples per row.")
+            if not u.isclose(segment['sample_rate'], first['sample_rate']):
+                raise ValueError("all SUBINT HDUs should have the same "
+                                 "sample rate.")
+        samples_per_row = first['samples_per_row']
+        sample_rate = first['sample_rate']
+        start_time = first['start_time']
+        # Index of the first row of each segment in the stream.
+        row_start = np.cumsum([0] + [segment['nrow']
+                                     for segment in segments])
+        for segment, start in zip(segments[1:], row_start[1:]):
+            gap = (segment['start_time'] - start_time
+                   - start * samples_per_row / sample_rate)
+            if abs(gap) > 0.5 / sample_rate:
+                log.warning("SUBINT HDU {} of {} is offset by {} relative to "
+                            "the end of the previous one."
+                            .format(segment['index'], segment['filename'],
+                                    gap.to(u.s)))
+
+        reader = self._get_reader(0)
+        rows_per_frame = reader.samples_per_frame // samples_per_row
+        for segment in segments[:-1]:
+            if segment['nrow'] % rows_per_frame != 0:
+                raise ValueError("with {} rows per frame, frames would "
+                                 "straddle SUBINT HDUs."
+                                 .format(rows_per_frame))
+        # Index of the first frame of each segment in the stream.
+        self._frame_start = row_start // rows_per_frame
+        super().__init__(
+            shape=((self._frame_start[-1] * reader.samples_per_frame,)
+                   + reader.sample_shape),
+            start_time=start_time, sample_rate=sample_rate,
+            samples_per_frame=reader.samples_per_frame,
+            frequency=reader.frequency, sideband=reader.sideband,
+            polarization=reader.polarization, dtype=reader.dtype)
+
+    @property
+    def weighted(self):
+        """Whether the data are weighted along the frequency axis."""
+        return self._reader_kwargs['weighted']
+
+    def _index(self, filename):
+        """Get properties of all SUBINT HDUs in a file."""
+        segments = []
+        with fits.open(filename, 'readonly', memmap=self._memmap) as hdul:
+            primary = HDU_map['PRIMARY'](hdul[0])
+            for index, hdu in enumerate(hdul):
+                if hdu.name != 'SUBINT':
+                    continue
+                subint = HDU_map['SUBINT'](hdu, primary, verify=False)
+                segments.append(dict(
+                    filename=filename, index=index, nrow=subint.nrow,
+                    start_time=subint.start_time,
+                    sample_rate=subint.sample_rate,
+                    samples_per_row=subint.samples_per_frame,
+                    sample_shape=tuple(subint.sample_shape)))
+        return segments
+
+    def _get_reader(self, segment_index):
+        """Get the reader for a segment, opening its file if needed."""
+        segment = self._segments[segment_index]
+        filename = segment['filename']
+        hdul, readers = self._files.pop(filename, (None, None))
+        if hdul is None:
+            while len(self._files) >= self.max_open_files:
+                self._files.popitem(last=False)[1][0].close()
+            hdul = fits.open(filename, 'readonly', memmap=self._memmap)
+            readers = {}
+        # (Re)insert to mark the file as most recently used.
+        self._files[filename] = hdul, readers
+        reader = readers.get(segment['index'])
+        if reader is None:
+            primary = HDU_map['PRIMARY'](hdul[0])
+            subint = HDU_map['SUBINT'](hdul[segment['index']], primary)
+            reader = PSRFITSReader(subint, **self._reader_kwargs)
+            readers[segment['index']] = reader
+        return reader
+
+    def _read_frame(self, frame_index):
+        segment_index = np.searchsorted(self._frame_start, frame_index,
+                                        side='right') - 1
+        reader = self._get_reader(segment_index)
+        return reader._read_frame(frame_index
+                                  - self._frame_start[segment_index])
+
+    def close(self):
+        super().close()
+        # Closing the HDU lists suffices; the readers just wrap their HDUs.
+        while self._files:
+            self._files.popitem()[1][0].close()
+
+
 class PSRFITSWriter:
-    """Interface class for writing the PSRFITS HDUs
+    """Streaming writer of fold-mode PSRFITS files.
+
+    The headers are created from the PSRFITS templates and written on
+    opening.  Subsequently, sub-integrations are read from the input and
+    appended to the file as they are computed, so the full archive is never
+    held in memory.  The data are stored as 16-bit integers, with scales
+    and offsets determined for each sub-integration, channel and
+    polarization.  Since integers cannot represent NaN, any NaN in the
+    profiles (e.g., for empty phase bins) are written as the offset, i.e.,
+    the middle of the range of the other values.
 
     Parameters
     ----------
     filename : str
         Output file name.
-    ih : input file handle
-        The file handle for input data.
-    hdus: str, optional
-
-
+    ih : task or stream reader
+        Input data, with samples that are pulse profiles, i.e., with a sample
+        shape of ``(nbin,)``, ``(nbin, nchan)``, or ``(nbin, nchan, npol)``.
+        Typically, this will be a `~scintillometry.integration.Fold` or
+        `~scintillometry.integration.Stack` instance.
+    primary_hdu : `~scintillometry.io.psrfits.PSRFITSPrimaryHDU`, optional
+        Used as a template for the primary header, e.g., to copy information
+        on the telescope and source.  Its header is copied, and the mode,
+        start time and frequencies are set from the input.
 
     Notes
     -----
-    Currently it only support write the PSRFITS primary HDU and Subint HDU.
+    Currently only supports writing the PSRFITS primary HDU and a single
+    SUBINT HDU.
     """
 
-    def __init__(self, filename, ih, hdus=None):
+    def __init__(self, filename, ih, primary_hdu=None):
+        if ih.dtype.kind == 'c':
+            raise ValueError("PSRFITS can only store real data.")
+        if ih.dtype.kind not in 'fiu':
+            raise ValueError("PSRFITS can only store plain floating point or "
+                             "integer data, not data with dtype {}; for "
+                             "folds, use average=True.".format(ih.dtype))
+        sample_shape = ih.sample_shape
+        if not 1 <= len(sample_shape) <= 3:
+            raise ValueError("input samples should have shape (nbin,), "
+                             "(nbin, nchan), or (nbin, nchan, npol).")
+        self._sample_shape = (tuple(sample_shape)
+                              + (1,) * (3 - len(sample_shape)))
         self.filename = filename
         self.ih = ih
-        self.hdus = hdus
+        self.nrow = ih.shape[0]
+        self.offset = 0
+        self._tsubint = (1. / ih.sample_rate).to_value(u.s)
+
+        # Set up the HDUs, with a single row to get the data types.
+        if primary_hdu is None:
+            primary = PSRFITSPrimaryHDU()
+        else:
+            primary = PSRFITSPrimaryHDU(
+                fits.PrimaryHDU(header=primary_hdu.header.copy()))
+        primary.obs_mode = 'PSR'
+        primary.start_time = ih.start_time
+        subint = SubintHDU(primary_hdu=primary)
+        subint.nrow = 1
+        subint.sample_shape = self._sample_shape
+        subint.header['ZERO_OFF'] = 0
+        subint.header['NSBLK'] = 1
+        subint.header['TBIN'] = self._tsubint / subint.nbin
+        self._set_frequency(subint)
+        self._set_polarization(subint)
+        # FITS tables are stored in big-endian order.
+        self._row = np.zeros(1, subint.data.dtype.newbyteorder('>'))
+        self._row['DAT_FREQ'] = subint.data['DAT_FREQ']
+        self._row['DAT_WTS'] = 1.
+        self._row['TSUBINT'] = self._tsubint
+        subint.hdu.update()
+        subint.header['NAXIS2'] = self.nrow
+
+        self._fh = io.open(filename, 'wb')
+        self._fh.write(primary.header.tostring().encode('ascii'))
+        self._subint_header_start = self._fh.tell()
+        self._subint_header = subint.header
+        self._fh.write(subint.header.tostring().encode('ascii'))
+        self.closed = False
+
+    def _set_frequency(self, subint):
+        frequency = getattr(self.ih, 'frequency', None)
+        if frequency is None:
+            return
+        frequency = np.broadcast_to(
+            frequency, self.ih.sample_shape, subok=True).reshape(
+                self._sample_shape)[0, :, 0]
+        subint.data['DAT_FREQ'] = frequency.to_value(u.MHz)
+        if subint.nchan > 1:
+            subint.header['CHAN_BW'] = (frequency[1]
+                                        - frequency[0]).to_value(u.MHz)
+            subint.primary_hdu.frequency = frequency
+        else:
+            # For a single channel, the bandwidth cannot be inferred from
+            # the frequencies; use that of the observation if available.
+            header = subint.primary_hdu.header
+            try:
+                chan_bw = abs(float(header['OBSBW'])) or 1.
+            except (KeyError, ValueError):
+                chan_bw = 1.
+            sideband = getattr(self.ih, 'sideband', None)
+            if sideband is not None:
+                chan_bw *= np.broadcast_to(
+                    sideband, self.ih.sample_shape).reshape(
+                        self._sample_shape)[0, 0, 0]
+            subint.header['CHAN_BW'] = chan_bw
+            header['OBSNCHAN'] = 1
+            header['OBSFREQ'] = frequency[0].to_value(u.MHz)
+            header['OBSBW'] = chan_bw
+
+    def _set_polarization(self, subint):
+        polarization = getattr(self.ih, 'polarization', None)
+        if polarization is not None:
+            subint.polarization = np.broadcast_to(
+                polarization, self.ih.sample_shape).reshape(
+                    self._sample_shape)[0, 0]
+        elif subint.npol == 1:
+            subint.polarization = ['INTEN']
+
+    def _make_rows(self, data):
+        """Quantize profiles and put them in rows of the SUBINT table."""
+        # Get order of samples in the FITS data, (n, npol, nchan, nbin).
+        data = data.reshape((-1,) + self._sample_shape).transpose(0, 3, 2, 1)
+        # Ignore NaN, e.g., from empty phase bins in averaged folds, in
+        # determining the range; profiles that are all NaN get offset 0.
+        nan = np.isnan(data)
+        d_min = np.where(nan, np.inf, data).min(-1, keepdims=True)
+        d_max = np.where(nan, -np.inf, data).max(-1, keepdims=True)
+        empty = nan.all(-1, keepdims=True)
+        d_min[empty] = d_max[empty] = 0.
+        offset = (d_max + d_min) / 2
+        scale = (d_max - d_min) / (2 * np.iinfo('i2').max)
+        scale[scale == 0] = 1.
+        rows = np.repeat(self._row, len(data))
+        index = self.offset + np.arange(len(data))
+        rows['OFFS_SUB'] = (index + 0.5) * self._tsubint
+        # NaN samples are stored as 0, i.e., they will be read as the offset.
+        rows['DATA'] = np.where(nan, 0., np.around((data - offset) / scale))
+        rows['DAT_OFFS'] = offset.reshape(len(data), -1)
+        rows['DAT_SCL'] = scale.reshape(len(data), -1)
+        return rows
+
+    def write(self, count=None):
+        """Read sub-integrations from the input and append them to the file.
+
+        Parameters
+        ----------
+        count : int, optional
+            Number of sub-integrations to write.  Default: all remaining.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed writer.")
+        n_left = self.nrow - self.offset
+        if count is None or count < 0:
+            count = n_left
+        if count > n_left:
+            raise EOFError("cannot write beyond the end of the input.")
+
+        self.ih.seek(self.offset)
+        while count > 0:
+            n = min(count, self.ih.samples_per_frame)
+            rows = self._make_rows(self.ih.read(n))
+            self._fh.write(rows.tobytes())
+            self.offset += n
+            count -= n
 
     def close(self):
-        pass
+        if self.closed:
+            return
+        if self.offset != self.nrow:
+            # Fewer rows written than anticipated; update the header.
+            self._subint_header['NAXIS2'] = self.offset
+            self._fh.seek(self._subint_header_start)
+            self._fh.write(self._subint_header.tostring().encode('ascii'))
+            self._fh.seek(0, 2)
+        # Pad the data to a multiple of the FITS block size.
+        self._fh.write(b'\0' * (-self._fh.tell() % 2880))
+        self._fh.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
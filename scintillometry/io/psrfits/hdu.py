@@ -7,6 +7,7 @@ from astropy.time import Time, TimeDelta
 from astropy.coordinates import EarthLocation
 from astropy.coordinates import Latitude, Longitude
 from astropy.io import fits
+from astropy.io.fits.column import _ColumnFormat
 from astropy.utils import lazyproperty
 import numpy as np
 import operator
@@ -14,7 +15,7 @@ from .psrfits_htm_parser import HDU_TEMPLATES
 
 
 __all__ = ["HDU_map", "HDUWrapper", "PSRFITSPrimaryHDU",
-           "SubintHDU", "PSRSubintHDU"]
+           "SubintHDU", "PSRSubintHDU", "SearchSubintHDU"]
 
 
 class HDUWrapper:
@@ -279,6 +280,15 @@ class SubintHDU(HDUWrapper):
             self.hdu.columns.change_attrib('DATA', '_dims', dims)
             repr_dims = repr(dims).replace(' ', '')
             self.hdu.columns.change_attrib('DATA', 'dim', repr_dims)
+            # Columns with values per channel or per channel and polarization.
+            for name, count in (('DAT_FREQ', self.nchan),
+                                ('DAT_WTS', self.nchan),
+                                ('DAT_OFFS', self.nchan * self.npol),
+                                ('DAT_SCL', self.nchan * self.npol)):
+                format = self.hdu.columns[name].format
+                self.hdu.columns.change_attrib(
+                    name, 'format',
+                    _ColumnFormat('{}{}'.format(count, format.format)))
             self.hdu.data = np.zeros(self.nrow, self.hdu.columns.dtype)
 
         return self.hdu.data
@@ -360,11 +370,13 @@ class SubintHDU(HDUWrapper):
 
     @property
     def polarization(self):
-        pol_type = self.header['POL_TYPE']
-        # split into equal parts using zip;
-        # see https://docs.python.org/3.5/library/functions.html#zip
-        return np.array([map(''.join, zip(*[iter(self.header['POL_TYPE'])]
-                                          * (len(pol_type) // self.npol)))])
+        pol_type = self.header['POL_TYPE'].strip()
+        if not pol_type or len(pol_type) % self.npol:
+            raise AttributeError('polarization has not yet been set.')
+        # split into equal parts.
+        n = len(pol_type) // self.npol
+        return np.array([pol_type[i:i+n]
+                         for i in range(0, len(pol_type), n)])
 
     @polarization.setter
     def polarization(self, value):
@@ -425,25 +437,82 @@ class SubintHDU(HDUWrapper):
         """Data type of the data.  Inferred from ``read_data_row(0)``."""
         return self.read_data_row(0).dtype
 
-    def read_data_row(self, index, weighted=False):
-        if index >= self.nrow:
-            raise EOFError("cannot read from beyond end of input SUBINT HDU.")
-
-        row = self.data[index]
-        # Reversed the header shape to match the data
-        data_scale = row['DAT_SCL'].reshape(-1, 1)
-        data_off_set = row['DAT_OFFS'].reshape(-1, 1)
+    @lazyproperty
+    def zero_off(self):
+        """Zero offset of the stored data.  Taken from 'ZERO_OFF'."""
         try:
             zero_off = self.header['ZERO_OFF']
             # Sometimes zero_off equals * or some such
             float(zero_off)
         except Exception:
             zero_off = 0
-        result = (row['DATA'] - zero_off) * data_scale + data_off_set
+        return zero_off
+
+    def read_data_row(self, index, weighted=False):
+        if index >= self.nrow:
+            raise EOFError("cannot read from beyond end of input SUBINT HDU.")
+
+        row = self.data[index]
+        # Reversed the header shape to match the data
+        data_scale = row['DAT_SCL'].reshape(self.npol, self.nchan, 1)
+        data_off_set = row['DAT_OFFS'].reshape(self.npol, self.nchan, 1)
+        result = (row['DATA'] - self.zero_off) * data_scale + data_off_set
         if weighted and 'DAT_WTS' in self.data.names:
             result *= row['DAT_WTS'].reshape(-1, 1)
         return result
 
+    def _get_out(self, start, stop, out):
+        """Check the row range and get an output array of the right shape."""
+        if stop > self.nrow:
+            raise EOFError("cannot read from beyond end of input SUBINT HDU.")
+
+        shape = (((stop - start) * self.samples_per_frame,)
+                 + tuple(self.sample_shape))
+        if out is None:
+            out = np.empty(shape, self.dtype)
+        else:
+            assert out.shape == shape, (
+                "'out' should have shape {}".format(shape))
+        return out
+
+    def read_data_rows(self, start, stop, weighted=False, out=None):
+        """Read a range of rows, ordered as samples.
+
+        The table is sliced only once, and scales, offsets and possibly
+        weights are applied to all rows in one go.
+
+        Parameters
+        ----------
+        start, stop : int
+            Range of rows to read.
+        weighted : bool, optional
+            Whether to apply the 'DAT_WTS' weights.  Default: `False`.
+        out : `~numpy.ndarray`, optional
+            Array to store the output in.  Should have the shape given
+            below.
+
+        Returns
+        -------
+        data : `~numpy.ndarray`
+            With shape ``(n_row * samples_per_frame,) + sample_shape``.
+        """
+        out = self._get_out(start, stop, out)
+        n_row = stop - start
+        data = self.data[start:stop]
+        # Stored data have shape (n_row, npol, nchan, nbin); do the
+        # calculation in that order, directly in the output array.
+        result = out.reshape(n_row, self.nbin, self.nchan,
+                             self.npol).transpose(0, 3, 2, 1)
+        scale = data['DAT_SCL'].reshape(n_row, self.npol, self.nchan, 1)
+        offset = data['DAT_OFFS'].reshape(n_row, self.npol, self.nchan, 1)
+        np.subtract(data['DATA'], self.zero_off, out=result,
+                    casting='unsafe')
+        result *= scale
+        result += offset
+        if weighted and 'DAT_WTS' in data.names:
+            result *= data['DAT_WTS'].reshape(n_row, 1, self.nchan, 1)
+        return out
+
 
 class PSRSubintHDU(SubintHDU):
     """Wrapper for PSRFITS SUBINT HDUs, providing baseband-style properties.
@@ -547,10 +616,161 @@ class PSRSubintHDU(SubintHDU):
         self.primary_hdu.close()
 
 
+class SearchSubintHDU(SubintHDU):
+    """Wrapper for PSRFITS search-mode SUBINT HDUs.
+
+    The packed 'DATA' column is accessed directly, i.e., for memory-mapped
+    files only the rows that are read are loaded from disk.  Samples with
+    1, 2, or 4 bits are unpacked assuming the first sample is stored in the
+    most significant bits, as is standard for PSRFITS.  Samples with 8 bits
+    are taken to be unsigned, unless 'SIGNINT' is set in the header.  Other
+    bit depths are not supported.
+
+    Parameters
+    ----------
+    hdu : `~astropy.io.fits.BinTableHDU` instance
+        The PSRFITS table HDU of SUBINT type.
+    primary : `~scintillometry.io.psrfits.PSRFITSPrimaryHDU`
+        The wrapped PSRFITS main header.
+    verify: bool, optional
+        Whether to do basic verification.  Default is `True`.
+
+    Notes
+    -----
+    Samples are ordered as ``(nsample, nchan, npol)``, i.e., each row
+    holds ``NSBLK`` samples.  Right now we are assuming the data rows are
+    continuous in time and the frequencies do not vary.
+    """
+
+    _sample_shape_maker = namedtuple('SampleShape', 'nchan, npol')
+    _shape_maker = namedtuple('Shape', 'nsample, nchan, npol')
+
+    def __init__(self, hdu=None, primary_hdu=None, verify=True):
+        super().__init__(hdu, primary_hdu, verify=verify)
+        self.sample_label = ('nchan', 'npol')
+
+    def verify(self):
+        super().verify()
+        assert self.mode.upper() == 'SEARCH', \
+            "Header HDU is not in the search mode."
+        assert self.nbits in (1, 2, 4, 8), \
+            "Unsupported 'NBITS' field in the header."
+        assert not self.signed or self.nbits == 8, \
+            "Signed integers are only supported for 8 bits."
+        n_bytes = (self.samples_per_frame * self.npol * self.nchan
+                   * self.nbits // 8)
+        assert self.data['DATA'].nbytes == self.nrow * n_bytes, \
+            "Data size does not match with the header information."
+
+    @property
+    def nbits(self):
+        return self.header['NBITS']
+
+    @property
+    def signed(self):
+        """Whether the samples are signed integers.  From 'SIGNINT'."""
+        return self.header.get('SIGNINT', 0) == 1
+
+    @property
+    def sample_shape(self):
+        return self._sample_shape_maker(self.nchan, self.npol)
+
+    @property
+    def shape(self):
+        return self._shape_maker(self.nrow * self.samples_per_frame,
+                                 self.nchan, self.npol)
+
+    @property
+    def start_time(self):
+        """Start time of the first sample."""
+        start_time = super().start_time
+        if "OFFS_SUB" in self.data.names:
+            offset0 = self.data['OFFS_SUB'][0] - self.data['TSUBINT'][0] / 2
+            start_time += u.Quantity(offset0, u.s, copy=False)
+
+        return start_time
+
+    @property
+    def samples_per_frame(self):
+        return self.header['NSBLK']
+
+    @property
+    def sample_rate(self):
+        return 1.0 / u.Quantity(self.header['TBIN'], u.s)
+
+    @property
+    def dtype(self):
+        return np.dtype('f4')
+
+    def _unpack(self, raw):
+        """Unpack samples with fewer than 8 bits from rows of bytes.
+
+        For 8-bit samples, the bytes are interpreted as signed if needed.
+        """
+        nbits = self.nbits
+        if nbits == 8:
+            return raw.view('i1') if self.signed else raw
+        shifts = np.arange(8 - nbits, -1, -nbits, dtype='u1')
+        mask = np.uint8((1 << nbits) - 1)
+        return ((raw[..., np.newaxis] >> shifts) & mask).reshape(
+            len(raw), -1)
+
+    def read_data_rows(self, start, stop, weighted=False, out=None):
+        """Read a range of rows, ordered as samples.
+
+        The table is sliced only once, and scales, offsets and possibly
+        weights are applied to all rows in one go.
+
+        Parameters
+        ----------
+        start, stop : int
+            Range of rows to read.
+        weighted : bool, optional
+            Whether to apply the 'DAT_WTS' weights.  Default: `False`.
+        out : `~numpy.ndarray`, optional
+            Array to store the output in.  Should have the shape given
+            below.
+
+        Returns
+        -------
+        data : `~numpy.ndarray`
+            With shape ``(n_row * samples_per_frame, nchan, npol)``.
+        """
+        out = self._get_out(start, stop, out)
+        n_row = stop - start
+        nsblk, nchan, npol = self.samples_per_frame, self.nchan, self.npol
+        data = self.data[start:stop]
+        raw = data['DATA'].reshape(n_row, -1)
+        raw = self._unpack(raw).reshape(n_row, nsblk, npol, nchan)
+        # Do the calculation in the stored order, directly in the output.
+        result = out.reshape(n_row, nsblk, nchan, npol).transpose(0, 1, 3, 2)
+        scale = data['DAT_SCL'].reshape(n_row, 1, npol, nchan)
+        offset = data['DAT_OFFS'].reshape(n_row, 1, npol, nchan)
+        np.subtract(raw, self.zero_off, out=result, dtype=out.dtype,
+                    casting='unsafe')
+        result *= scale
+        result += offset
+        if weighted and 'DAT_WTS' in data.names:
+            result *= data['DAT_WTS'].reshape(n_row, 1, 1, nchan)
+        return out
+
+    def read_data_row(self, index, weighted=False):
+        """Read a single row, ordered as samples.
+
+        See `~scintillometry.io.psrfits.SearchSubintHDU.read_data_rows`.
+        """
+        return self.read_data_rows(index, index + 1, weighted=weighted)
+
+    def close(self):
+        super().close()
+        self.primary_hdu.close()
+
+
 HDU_map = {'PRIMARY': PSRFITSPrimaryHDU,
            'SUBINT': SubintHDU}
 
-subint_map = {'PSR': PSRSubintHDU}
+subint_map = {'PSR': PSRSubintHDU,
+              'SEARCH': SearchSubintHDU}
 
 # TODO: add search HDU
 hdu_list_template = {'PSR': {'primary': PSRFITSPrimaryHDU,
@@ -12,15 +12,30 @@ entries or descriptions of those cards, and then those lines
 interpreted as actual `~astropy.io.fits.Card` instances, and combined
 into headers, columns, and `~astropy.io.fits.PrimaryHDU` and
 `~astropy.io.fits.BinTableHDU` instances.
+
+Since parsing is relatively slow, the resulting cards are cached in the
+user's cache directory, and only parsed again if the definition file
+changes.
 """
+import hashlib
+import json
+import os
+import warnings
+from collections.abc import Mapping
 from html.parser import HTMLParser
 
+from astropy.config import get_cache_dir
 from astropy.io import fits
 from astropy.units import Unit
 
 from scintillometry.data import PSRFITS_DOCUMENTATION
 
 
+# Version of the parser and cache format.  It is included in the hash
+# stored in the cache, so increase it whenever the parsing changes.
+CACHE_VERSION = 1
+
+
 class MyHTMLParser(HTMLParser):
     """Parser for the PSR FITS definition.
 
@@ -84,12 +99,19 @@ class PSRFITSCard(fits.Card):
         return out + '\n# ' + self.description if self.description else out
 
 
-def ext2hdu(extension):
-    """Turn extension information from htm file into a FITS HDU.
+def _set_unit(card):
+    """Store a unit given in the comments of a card, if present."""
+    if card.comment.startswith('['):
+        m = card.comment[1:].split(']')[0]
+        if m not in ('v/c', 'MJD'):
+            # TODO: support v/c as a special unit.
+            card.unit = Unit(m)
 
-    The extension will have a header and columns set as appropriate.
-    The original cards, including possible descriptions are stored
-    as hdu.header_cards and hdu.column_cards, respectively.
+
+def ext2cards(extension):
+    """Turn extension information from htm file into FITS cards.
+
+    Possible descriptions are stored on the cards.
     """
     cards = []
     # parse extension lines
@@ -134,13 +156,8 @@ def ext2hdu(extension):
 
         # Create a FITS Card using our description handling subclass.
         card = PSRFITSCard.fromstring(line)
-
-        if card.comment.startswith('['):
-            # Unit in the comments: store it for possible use.
-            m = card.comment[1:].split(']')[0]
-            if m not in ('v/c', 'MJD'):
-                # TODO: support v/c as a special unit.
-                card.unit = Unit(m)
+        # Unit in the comments: store it for possible use.
+        _set_unit(card)
 
         if card.keyword.startswith('TUNIT'):
             # Some units are in upper case, which won't get parsed correctly.
@@ -153,7 +170,16 @@ def ext2hdu(extension):
         if not is_col or line.startswith('TTYPE'):
             card_for_description = card
 
+    return cards
+
+
+def cards2hdu(cards):
+    """Turn FITS cards into a FITS HDU.
+
+    The HDU will have a header and columns set as appropriate.
+    """
     header = fits.Header(cards)
+    icol = sum(card.keyword.startswith('TTYPE') for card in cards)
 
     if 'SIMPLE' in header:
         assert icol == 0, 'non-table extension with columns!'
@@ -168,20 +194,146 @@ def ext2hdu(extension):
     return hdu
 
 
-parser = MyHTMLParser()
-with open(PSRFITS_DOCUMENTATION)as f:
-    parser.feed(f.read())
+def ext2hdu(extension):
+    """Turn extension information from htm file into a FITS HDU.
+
+    The extension will have a header and columns set as appropriate.
+    """
+    return cards2hdu(ext2cards(extension))
+
+
+def parse_cards(filename=PSRFITS_DOCUMENTATION):
+    """Parse the PSRFITS definition file into cards for each extension."""
+    parser = MyHTMLParser()
+    # The extensions are stored on the class, so reset them.
+    parser.extensions = {}
+    with open(filename) as f:
+        parser.feed(f.read())
+
+    return dict((k or "PRIMARY", ext2cards(v))
+                for k, v in parser.extensions.items())
+
+
+def _default_cache_file():
+    return os.path.join(get_cache_dir('scintillometry'),
+                        'psrfits_templates.json')
+
+
+def _load_cached_cards(cache_file, file_hash):
+    """Load cards from the cache, returning `None` if it is out of date."""
+    with open(cache_file) as f:
+        cached = json.load(f)
+    if cached['hash'] != file_hash:
+        return None
+    cards = {}
+    for name, images in cached['cards'].items():
+        cards[name] = []
+        for image, description in images:
+            card = PSRFITSCard.fromstring(image)
+            card.description = description
+            _set_unit(card)
+            cards[name].append(card)
+    return cards
+
+
+def _save_cached_cards(cache_file, file_hash, cards):
+    """Store cards in the cache, together with the definition file hash."""
+    cached = {'hash': file_hash,
+              'cards': {name: [(card.image, card.description)
+                               for card in ext_cards]
+                        for name, ext_cards in cards.items()}}
+    # Write to a temporary file first, to ensure other processes
+    # never see a partially written cache.
+    tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+    with open(tmp_file, 'w') as f:
+        json.dump(cached, f)
+    os.replace(tmp_file, cache_file)
+
+
+def get_template_cards(filename=PSRFITS_DOCUMENTATION, cache_file=None):
+    """Get cards for the PSRFITS extensions, cached if possible.
+
+    Parsing the PSRFITS definition file is relatively slow, so the resulting
+    cards are stored in a cache file, together with a hash of the
+    definition file and the parser version (``CACHE_VERSION``).  If the
+    hash matches, the cards are loaded from the cache; otherwise, the
+    definition file is parsed and the cache updated.
+    If the cache cannot be read or written, a warning is emitted and the
+    definition file is parsed.
+
+    Parameters
+    ----------
+    filename : str, optional
+        PSRFITS definition file.  Default: the one in `scintillometry.data`.
+    cache_file : str, optional
+        File to use for the cache.  By default, a file in the
+        scintillometry cache directory (by default, ``~/.scintillometry``),
+        which is created if necessary.
+
+    Returns
+    -------
+    cards : dict of list of `~astropy.io.fits.Card`
+        Keyed by extension name.
+    """
+    digest = hashlib.sha256('version {}\n'.format(CACHE_VERSION).encode())
+    with open(filename, 'rb') as f:
+        digest.update(f.read())
+    file_hash = digest.hexdigest()
+
+    try:
+        if cache_file is None:
+            cache_file = _default_cache_file()
+        cards = _load_cached_cards(cache_file, file_hash)
+    except FileNotFoundError:
+        cards = None
+    except (OSError, ValueError, KeyError) as exc:
+        warnings.warn("could not read PSRFITS template cache {}: {}"
+                      .format(cache_file, exc))
+        cards = None
+
+    if cards is not None:
+        return cards
+
+    cards = parse_cards(filename)
+    if cache_file is not None:
+        try:
+            _save_cached_cards(cache_file, file_hash, cards)
+        except OSError as exc:
+            warnings.warn("could not write PSRFITS template cache {}: {}"
+                          .format(cache_file, exc))
+
+    return cards
+
+
+class _TemplateHDUs(Mapping):
+    """Mapping of extension names to template HDUs, created on first use.
+
+    This ensures that the cache is only accessed (and the cache directory
+    only created) when the templates are actually needed.
+    """
+    _hdus = None
 
+    def _get_hdus(self):
+        if self._hdus is None:
+            self._hdus = dict((k, cards2hdu(v))
+                              for k, v in get_template_cards().items())
+        return self._hdus
 
-HDU_TEMPLATES = dict((k or "PRIMARY", ext2hdu(v))
-                     for k, v in parser.extensions.items())
+    def __getitem__(self, item):
+        return self._get_hdus()[item]
+
+    def __iter__(self):
+        return iter(self._get_hdus())
+
+    def __len__(self):
+        return len(self._get_hdus())
+
+
+HDU_TEMPLATES = _TemplateHDUs()
 """PSRFITS template HDUs.
 
 With headers and column information as appropriate.
-The cards used to make the HDU are available via the
-``.header_cards`` and ``.column_cards`` attributes.
+Parsing the definition file is avoided if possible, by caching the
+resulting cards (see `get_template_cards`).  The templates are only
+created when first accessed.
 """
-
-
-# Free memory used by parsed file contents.
-del parser
@@ -0,0 +1,108 @@
+# Licensed under the GPLv3 - see LICENSE
+"""Tests of the parsing and caching of the PSRFITS definition file."""
+import json
+import shutil
+
+import pytest
+
+from .. import psrfits_htm_parser
+from ..psrfits_htm_parser import (HDU_TEMPLATES, get_template_cards,
+                                  parse_cards, cards2hdu)
+from ....data import PSRFITS_DOCUMENTATION
+
+
+class TestTemplateCache:
+    def setup(self):
+        self.parsed = parse_cards()
+
+    def check_cards(self, cards):
+        assert cards.keys() == self.parsed.keys()
+        for name, ext_cards in cards.items():
+            expected = self.parsed[name]
+            assert ([card.image for card in ext_cards]
+                    == [card.image for card in expected])
+            assert ([card.description for card in ext_cards]
+                    == [card.description for card in expected])
+            assert ([getattr(card, 'unit', None) for card in ext_cards]
+                    == [getattr(card, 'unit', None) for card in expected])
+
+    def test_templates(self):
+        assert {'PRIMARY', 'SUBINT'} <= HDU_TEMPLATES.keys()
+        for name, hdu in HDU_TEMPLATES.items():
+            assert hdu.header == cards2hdu(self.parsed[name]).header
+
+    def test_cache(self, tmpdir):
+        cache_file = str(tmpdir.join('cache.json'))
+        cards = get_template_cards(cache_file=cache_file)
+        self.check_cards(cards)
+        with open(cache_file) as f:
+            cached = json.load(f)
+        # Check that the cache is used, by changing a description.
+        cached['cards']['SUBINT'][0][1] = 'Changed'
+        with open(cache_file, 'w') as f:
+            json.dump(cached, f)
+        cards = get_template_cards(cache_file=cache_file)
+        assert cards['SUBINT'][0].description == 'Changed'
+
+    def test_cache_invalidation(self, tmpdir):
+        cache_file = str(tmpdir.join('cache.json'))
+        filename = str(tmpdir.join('psrfits.html'))
+        shutil.copy(PSRFITS_DOCUMENTATION, filename)
+        get_template_cards(filename, cache_file=cache_file)
+        with open(filename) as f:
+            text = f.read()
+        with open(filename, 'w') as f:
+            f.write(text.replace('The number of bins in the fold-mode',
+                                 'The number of phase bins in the fold-mode'))
+        cards = get_template_cards(filename, cache_file=cache_file)
+        nbin = [card for card in cards['SUBINT'] if card.keyword == 'NBIN']
+        assert 'phase bins' in nbin[0].description
+
+    def test_cache_invalidation_by_version(self, tmpdir, monkeypatch):
+        cache_file = str(tmpdir.join('cache.json'))
+        get_template_cards(cache_file=cache_file)
+        with open(cache_file) as f:
+            cached = json.load(f)
+        cached['cards']['SUBINT'][0][1] = 'Changed'
+        with open(cache_file, 'w') as f:
+            json.dump(cached, f)
+        # With a new parser version, the stale cache should not be used.
+        monkeypatch.setattr(psrfits_htm_parser, 'CACHE_VERSION',
+                            psrfits_htm_parser.CACHE_VERSION + 1)
+        cards = get_template_cards(cache_file=cache_file)
+        assert cards['SUBINT'][0].description != 'Changed'
+        self.check_cards(cards)
+
+    def test_templates_created_lazily(self, monkeypatch):
+        calls = []
+
+        def get_cards():
+            calls.append(1)
+            return {'PRIMARY': self.parsed['PRIMARY']}
+
+        monkeypatch.setattr(psrfits_htm_parser, 'get_template_cards',
+                            get_cards)
+        templates = psrfits_htm_parser._TemplateHDUs()
+        assert calls == []
+        assert list(templates.keys()) == ['PRIMARY']
+        assert templates['PRIMARY'].header == HDU_TEMPLATES['PRIMARY'].header
+        assert calls == [1]
+
+    @pytest.mark.parametrize('content', ('{not json', '{"cards": {}}'))
+    def test_corrupt_cache(self, tmpdir, content):
+        cache_file = str(tmpdir.join('cache.json'))
+        with open(cache_file, 'w') as f:
+            f.write(content)
+        with pytest.warns(UserWarning, match='could not read'):
+            cards = get_template_cards(cache_file=cache_file)
+        self.check_cards(cards)
+        # The cache should have been repaired.
+        with open(cache_file) as f:
+            json.load(f)
+        self.check_cards(get_template_cards(cache_file=cache_file))
+
+    def test_unwritable_cache(self, tmpdir):
+        cache_file = str(tmpdir.join('nonexistent', 'cache.json'))
+        with pytest.warns(UserWarning, match='could not write'):
+            cards = get_template_cards(cache_file=cache_file)
+        self.check_cards(cards)
@@ -1,15 +1,21 @@
 # Licensed under the GPLv3 - see LICENSE
 """Full-package tests of psrfits reading routines."""
 
+import io
 import os
+import pathlib
 
 import pytest
 import numpy as np
 import astropy.units as u
 from astropy.coordinates import Longitude, Latitude, EarthLocation
 from astropy.time import Time
+from astropy.io import fits
+from astropy import log
 
 from ... import psrfits
+from ....generators import StreamGenerator
+from ..hdu import PSRFITSPrimaryHDU
 
 test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
@@ -113,6 +119,17 @@ class TestFoldRead(TestRead):
         with pytest.raises(EOFError):
             self.reader.read(1)
 
+    def test_path_and_file_input(self):
+        expected = self.reader.read()
+        with psrfits.open(pathlib.Path(self.fold_data),
+                          weighted=False) as fh:
+            assert isinstance(fh, psrfits.PSRFITSReader)
+            assert np.all(fh.read() == expected)
+        with io.open(self.fold_data, 'rb') as f:
+            with psrfits.open(f, weighted=False) as fh:
+                assert isinstance(fh, psrfits.PSRFITSReader)
+                assert np.all(fh.read() == expected)
+
     def test_weighted_read(self):
         self.reader.seek(0)
         unweighted = self.reader.read(1)
@@ -120,3 +137,271 @@ class TestFoldRead(TestRead):
             weighted = reader.read(1)
             weights = self.reader.ih.hdu.data['DAT_WTS']
         assert np.all(weighted == unweighted * weights.reshape(-1, 1))
+
+    @pytest.mark.parametrize('weighted', (False, True))
+    def test_read_data_rows(self, weighted):
+        hdu = self.reader.ih
+        expected = hdu.read_data_row(0, weighted=weighted).T
+        rows = hdu.read_data_rows(0, 1, weighted=weighted)
+        assert rows.shape == (1,) + hdu.sample_shape
+        assert rows.dtype == hdu.dtype
+        assert np.all(rows[0] == expected)
+        out = np.zeros_like(rows)
+        result = hdu.read_data_rows(0, 1, weighted=weighted, out=out)
+        assert result is out
+        assert np.all(out == rows)
+        with pytest.raises(EOFError):
+            hdu.read_data_rows(0, 2)
+
+
+class TestSearchRead:
+    def setup(self):
+        self.nrow, self.nsblk, self.nchan, self.npol = 5, 16, 8, 2
+        self.start_time = Time('2019-02-03T04:05:06', scale='utc')
+        self.tbin = 64e-6
+
+    def make_file(self, filename, nbits, signed=False):
+        rng = np.random.RandomState(42)
+        nrow, nsblk, nchan, npol = self.nrow, self.nsblk, self.nchan, self.npol
+        if signed:
+            self.zero_off = 0
+            self.samples = rng.randint(-128, 128,
+                                       size=(nrow, nsblk, npol, nchan))
+            packed = self.samples.reshape(nrow, -1).astype('i1').view('u1')
+        else:
+            self.zero_off = 0.5 * 2**nbits
+            self.samples = rng.randint(0, 2**nbits,
+                                       size=(nrow, nsblk, npol, nchan))
+            shifts = np.arange(8 - nbits, -1, -nbits)
+            packed = (self.samples.reshape(nrow, -1, 8 // nbits)
+                      << shifts).sum(-1).astype('u1')
+        self.scl = rng.uniform(0.5, 2., size=(nrow, npol * nchan))
+        self.offs = rng.uniform(-1., 1., size=(nrow, npol * nchan))
+        self.wts = rng.uniform(0., 1., size=(nrow, nchan))
+        self.freq = 400. + np.arange(nchan) * 0.5
+        tsubint = nsblk * self.tbin
+        columns = [
+            fits.Column('TSUBINT', 'D', unit='s',
+                        array=np.full(nrow, tsubint)),
+            fits.Column('OFFS_SUB', 'D', unit='s',
+                        array=(np.arange(nrow) + 0.5) * tsubint),
+            fits.Column('DAT_FREQ', '{}D'.format(nchan),
+                        array=np.tile(self.freq, (nrow, 1))),
+            fits.Column('DAT_WTS', '{}E'.format(nchan), array=self.wts),
+            fits.Column('DAT_OFFS', '{}E'.format(nchan * npol),
+                        array=self.offs),
+            fits.Column('DAT_SCL', '{}E'.format(nchan * npol),
+                        array=self.scl),
+            fits.Column('DATA', '{}B'.format(packed.shape[1]),
+                        array=packed)]
+        subint = fits.BinTableHDU.from_columns(columns, name='SUBINT')
+        subint.header.update(NBITS=nbits, NSBLK=nsblk, NCHAN=nchan,
+                             NPOL=npol, NBIN=1, TBIN=self.tbin, CHAN_BW=0.5,
+                             POL_TYPE='AABB', ZERO_OFF=self.zero_off,
+                             SIGNINT=int(signed))
+        primary = psrfits.PSRFITSPrimaryHDU()
+        primary.obs_mode = 'SEARCH'
+        primary.start_time = self.start_time
+        fits.HDUList([primary.hdu, subint]).writeto(filename)
+
+    def expected(self, weighted=False):
+        shape = (self.nrow, 1, self.npol, self.nchan)
+        data = ((self.samples - self.zero_off) * self.scl.reshape(shape)
+                + self.offs.reshape(shape))
+        if weighted:
+            data *= self.wts.reshape(self.nrow, 1, 1, self.nchan)
+        return data.transpose(0, 1, 3, 2).reshape(
+            -1, self.nchan, self.npol)
+
+    @pytest.mark.parametrize('nbits', (1, 2, 4, 8))
+    @pytest.mark.parametrize('weighted', (False, True))
+    def test_read(self, tmpdir, nbits, weighted):
+        filename = str(tmpdir.join('search.fits'))
+        self.make_file(filename, nbits)
+        expected = self.expected(weighted)
+        with psrfits.open(filename, weighted=weighted) as fh:
+            assert isinstance(fh.ih, psrfits.SearchSubintHDU)
+            assert fh.ih.mode == 'SEARCH'
+            assert fh.samples_per_frame == self.nsblk
+            assert fh.shape == (self.nrow * self.nsblk,
+                                self.nchan, self.npol)
+            assert fh.dtype == np.float32
+            assert u.isclose(fh.sample_rate, 1. / (self.tbin * u.s))
+            assert abs(fh.start_time - self.start_time) < 1. * u.ns
+            assert np.all(fh.frequency == self.freq.reshape(-1, 1) * u.MHz)
+            assert np.all(fh.polarization == ['AA', 'BB'])
+            data = fh.read()
+            assert data.shape == fh.shape
+            assert np.allclose(data, expected, rtol=1e-6, atol=1e-6)
+            # Read across a row boundary.
+            fh.seek(self.nsblk - 3)
+            part = fh.read(7)
+            assert np.all(part == data[self.nsblk - 3:self.nsblk + 4])
+            # All rows at once directly from the HDU.
+            rows = fh.ih.read_data_rows(1, 4, weighted=weighted)
+            assert np.all(rows == data[self.nsblk:4 * self.nsblk])
+            with pytest.raises(EOFError):
+                fh.ih.read_data_rows(4, 6)
+
+    def test_signed(self, tmpdir):
+        filename = str(tmpdir.join('search.fits'))
+        self.make_file(filename, 8, signed=True)
+        assert self.samples.min() < 0
+        with psrfits.open(filename, weighted=False) as fh:
+            assert fh.ih.signed
+            data = fh.read()
+        assert np.allclose(data, self.expected(), rtol=1e-6, atol=1e-6)
+
+    @pytest.mark.parametrize('nbits, signed, match', (
+        (16, 0, 'Unsupported'), (32, 0, 'Unsupported'), (4, 1, 'Signed')))
+    def test_unsupported(self, tmpdir, nbits, signed, match):
+        filename = str(tmpdir.join('search.fits'))
+        self.make_file(filename, 8)
+        with fits.open(filename, mode='update') as hdul:
+            hdul[1].header['NBITS'] = nbits
+            hdul[1].header['SIGNINT'] = signed
+        with pytest.raises(AssertionError, match=match):
+            psrfits.open(filename)
+
+    def test_multi_row_frames(self, tmpdir):
+        filename = str(tmpdir.join('search.fits'))
+        self.make_file(filename, 4)
+        expected = self.expected()
+        with psrfits.open(filename, weighted=False,
+                          samples_per_frame=2 * self.nsblk) as fh:
+            assert fh.samples_per_frame == 2 * self.nsblk
+            # The last, incomplete frame is not accessible.
+            assert fh.shape[0] == 4 * self.nsblk
+            data = fh.read()
+            assert np.allclose(data, expected[:4 * self.nsblk],
+                               rtol=1e-6, atol=1e-6)
+            fh.seek(3 * self.nsblk + 1)
+            assert np.all(fh.read(2) == data[3 * self.nsblk + 1:
+                                             3 * self.nsblk + 3])
+
+        with pytest.raises(ValueError):
+            psrfits.open(filename, samples_per_frame=self.nsblk + 1)
+
+
+class TestSequentialRead:
+    def setup(self):
+        self.shape = (10, 16, 2, 1)
+        self.data = np.random.RandomState(2).normal(
+            size=self.shape).astype('f4')
+        self.start_time = Time('2019-02-03T04:05:06')
+        self.sample_rate = 0.1 * u.Hz
+
+    def make_files(self, tmpdir, splits=(0, 3, 7, 10)):
+        filenames = []
+        for i, (start, stop) in enumerate(zip(splits[:-1], splits[1:])):
+            data = self.data[start:stop]
+            gen = StreamGenerator(
+                lambda sh, data=data: data[sh.tell():sh.tell()+1],
+                shape=data.shape,
+                start_time=self.start_time + start / self.sample_rate,
+                sample_rate=self.sample_rate, frequency=[[400.], [401.]]*u.MHz,
+                sideband=1, dtype='f4')
+            filename = str(tmpdir.join('fold{}.fits'.format(i)))
+            with psrfits.open(filename, 'w', ih=gen) as fw:
+                fw.write()
+            filenames.append(filename)
+        # Expected data, after quantization.
+        expected = []
+        for filename in filenames:
+            with psrfits.open(filename) as fh:
+                expected.append(fh.read())
+        self.expected = np.concatenate(expected)
+        return filenames
+
+    def test_read(self, tmpdir):
+        filenames = self.make_files(tmpdir)
+        # Order of the files should not matter.
+        with psrfits.open(filenames[::-1], max_open_files=2) as fh:
+            assert isinstance(fh, psrfits.SequentialPSRFITSReader)
+            assert fh.shape == self.shape
+            assert abs(fh.start_time - self.start_time) < 1. * u.ns
+            assert u.isclose(fh.sample_rate, self.sample_rate)
+            assert np.all(fh.frequency == [[400.], [401.]] * u.MHz)
+            assert np.all(fh.polarization == ['INTEN'])
+            data = fh.read()
+            assert np.all(data == self.expected)
+            assert len(fh._files) == 2
+            # Seek and read across a file boundary.
+            fh.seek(2)
+            assert np.all(fh.read(3) == self.expected[2:5])
+            fh.seek(-1, 2)
+            assert np.all(fh.read() == self.expected[-1:])
+        assert len(fh._files) == 0
+
+    def test_glob(self, tmpdir):
+        self.make_files(tmpdir)
+        with psrfits.open(str(tmpdir.join('fold*.fits'))) as fh:
+            assert fh.shape == self.shape
+            assert np.all(fh.read() == self.expected)
+        with pytest.raises(FileNotFoundError, match='no files match'):
+            psrfits.open(str(tmpdir.join('none*.fits')))
+
+    def test_path_list(self, tmpdir):
+        filenames = self.make_files(tmpdir)
+        with psrfits.open(tuple(pathlib.Path(f) for f in filenames)) as fh:
+            assert isinstance(fh, psrfits.SequentialPSRFITSReader)
+            assert np.all(fh.read() == self.expected)
+
+    def test_reader_options(self, tmpdir):
+        filenames = self.make_files(tmpdir, splits=(0, 4, 8, 10))
+        frequency = [[500.], [501.]] * u.MHz
+        with psrfits.open(filenames, samples_per_frame=2, weighted=False,
+                          frequency=frequency, sideband=-1,
+                          polarization=['AA'], dtype='f8') as fh:
+            assert isinstance(fh, psrfits.SequentialPSRFITSReader)
+            assert fh.samples_per_frame == 2
+            assert fh.shape == self.shape
+            assert np.all(fh.frequency == frequency)
+            assert np.all(fh.sideband == -1)
+            assert np.all(fh.polarization == ['AA'])
+            assert fh.dtype == 'f8'
+            data = fh.read()
+            assert data.dtype == 'f8'
+            assert np.all(data == self.expected)
+            fh.seek(3)
+            assert np.all(fh.read(3) == self.expected[3:6])
+
+        # Frames cannot straddle HDUs.
+        filenames = self.make_files(tmpdir, splits=(0, 3, 10))
+        with pytest.raises(ValueError, match='straddle'):
+            psrfits.open(filenames, samples_per_frame=2)
+
+    def test_multiple_subint(self, tmpdir):
+        filenames = self.make_files(tmpdir)
+        hdus = [fits.open(filename) for filename in filenames]
+        # Store the SUBINT HDUs out of order, under the primary header of
+        # the first file, adjusting their offsets to keep the start times.
+        subints = []
+        for hdul in hdus[::-1]:
+            subint = hdul[1]
+            subint.data['OFFS_SUB'] += (
+                (PSRFITSPrimaryHDU(hdul[0]).start_time
+                 - PSRFITSPrimaryHDU(hdus[0][0]).start_time).to_value(u.s))
+            subints.append(subint)
+        combined = str(tmpdir.join('combined.fits'))
+        fits.HDUList([hdus[0][0]] + subints).writeto(combined)
+        for hdul in hdus:
+            hdul.close()
+        with log.log_to_list() as log_list:
+            fh = psrfits.open(combined)
+        with fh:
+            assert isinstance(fh, psrfits.SequentialPSRFITSReader)
+            assert [segment['index'] for segment in fh._segments] == [3, 2, 1]
+            assert abs(fh.start_time - self.start_time) < 1. * u.ns
+            assert np.all(fh.read() == self.expected)
+        assert len(log_list) == 0
+
+    def test_gap(self, tmpdir):
+        filenames = self.make_files(tmpdir, splits=(0, 3, 10))
+        with fits.open(filenames[1], mode='update') as hdul:
+            hdul[1].data['OFFS_SUB'] += 5.
+        with log.log_to_list() as log_list:
+            fh = psrfits.open(filenames)
+        fh.close()
+        assert len(log_list) == 1
+        assert 'offset' in log_list[0].getMessage()
@@ -7,8 +7,11 @@ import pytest
 import numpy as np
 from astropy.coordinates import Latitude, Longitude
 from astropy import units as u
+from astropy.io import fits
+from astropy.time import Time
 
 from ... import psrfits
+from ....generators import StreamGenerator
 from ..hdu import PSRFITSPrimaryHDU, SubintHDU, PSRSubintHDU
 
 test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
@@ -164,3 +167,110 @@ class TestPSRHDUWriter(TestWriter):
             # And read from it, checking the output is the same as well.
             new_data = column_reader.read(1)
         assert np.array_equal(test_data, new_data)
+
+
+class TestPSRFITSWriter:
+    def setup(self):
+        self.fold_data = os.path.join(test_data,
+                                      "B1855+09.430.PUPPI.11y.x.sum.sm")
+        self.shape = (6, 32, 4, 2)
+        self.data = np.random.RandomState(1).normal(
+            size=self.shape).astype('f4')
+        self.gen = StreamGenerator(
+            lambda sh: self.data[sh.tell():sh.tell()+sh.samples_per_frame],
+            shape=self.shape, start_time=Time('2019-02-03T04:05:06'),
+            sample_rate=0.1 * u.Hz, samples_per_frame=2,
+            frequency=[[400.], [401.], [402.], [403.]] * u.MHz,
+            sideband=1, polarization=['AA', 'BB'], dtype='f4')
+
+    def check_file(self, filename, count=None):
+        data = self.data[:count]
+        with psrfits.open(filename, weighted=False) as fh:
+            assert fh.shape == data.shape
+            assert abs(fh.start_time - self.gen.start_time) < 1 * u.ns
+            assert u.isclose(fh.sample_rate, self.gen.sample_rate)
+            assert np.all(fh.frequency == self.gen.frequency)
+            assert np.all(fh.polarization == self.gen.polarization)
+            result = fh.read()
+        # Quantization errors should be about half a step.
+        step = data.ptp(axis=1, keepdims=True) / (2 * 32767)
+        assert np.all(abs(result - data) <= step)
+
+    def test_write(self, tmpdir):
+        filename = str(tmpdir.join('fold.fits'))
+        with psrfits.open(filename, 'w', ih=self.gen) as fw:
+            fw.write()
+        self.check_file(filename)
+        with fits.open(filename) as hdul:
+            assert len(hdul) == 2
+            assert hdul[0].header['OBS_MODE'] == 'PSR'
+            assert hdul[1].header['NAXIS2'] == self.shape[0]
+
+    def test_partial_write(self, tmpdir):
+        filename = str(tmpdir.join('fold.fits'))
+        with psrfits.PSRFITSWriter(filename, self.gen) as fw:
+            fw.write(1)
+            fw.write(2)
+            assert fw.offset == 3
+        self.check_file(filename, count=3)
+
+    def test_round_trip(self, tmpdir):
+        filename = str(tmpdir.join('fold.fits'))
+        with psrfits.open(self.fold_data, weighted=False) as fh:
+            with psrfits.open(filename, 'w', ih=fh,
+                              primary_hdu=fh.ih.primary_hdu) as fw:
+                fw.write()
+            fh.seek(0)
+            expected = fh.read(1)
+            with psrfits.open(filename, weighted=False) as fh2:
+                assert fh2.ih.primary_hdu.telescope == 'Arecibo'
+                assert fh2.shape == fh.shape
+                assert u.isclose(fh2.frequency, fh.frequency)
+                assert abs(fh2.start_time - fh.start_time) < 1 * u.ns
+                data = fh2.read()
+        step = expected.ptp(axis=1, keepdims=True) / (2 * 32767)
+        assert np.all(abs(data - expected) <= step)
+
+    def test_empty_bins(self, tmpdir):
+        # Averaged folds have NaN for empty phase bins.
+        self.data[0, 5, 1, 0] = np.nan
+        self.data[1, :, 2, 1] = np.nan
+        filename = str(tmpdir.join('fold.fits'))
+        with psrfits.open(filename, 'w', ih=self.gen) as fw:
+            fw.write()
+        with psrfits.open(filename, weighted=False) as fh:
+            result = fh.read()
+        assert not np.any(np.isnan(result))
+        nan = np.isnan(self.data)
+        good = ~nan.all(1, keepdims=True)
+        d_min = np.nanmin(self.data, axis=1, keepdims=True, where=good,
+                          initial=np.inf)
+        d_max = np.nanmax(self.data, axis=1, keepdims=True, where=good,
+                          initial=-np.inf)
+        step = np.where(good, (d_max - d_min) / (2 * 32767), 0.)
+        assert np.all((abs(result - self.data) <= step)[~nan])
+        # A NaN sample is written at the middle of the range of the others.
+        middle = (d_max[0, 0, 1, 0] + d_min[0, 0, 1, 0]) / 2
+        assert abs(result[0, 5, 1, 0] - middle) <= step[0, 0, 1, 0]
+        # A profile with only NaN is written as zeros.
+        assert np.all(result[1, :, 2, 1] == 0.)
+
+    def test_invalid(self, tmpdir):
+        filename = str(tmpdir.join('fold.fits'))
+        gen = StreamGenerator(lambda sh: None, shape=(4, 2, 2, 2, 2),
+                              start_time=self.gen.start_time,
+                              sample_rate=1. * u.Hz, dtype='f4')
+        with pytest.raises(ValueError):
+            psrfits.PSRFITSWriter(filename, gen)
+        gen = StreamGenerator(lambda sh: None, shape=(4, 2),
+                              start_time=self.gen.start_time,
+                              sample_rate=1. * u.Hz, dtype='c8')
+        with pytest.raises(ValueError):
+            psrfits.PSRFITSWriter(filename, gen)
+        # Structured data, as from Fold with average=False.
+        gen = StreamGenerator(lambda sh: None, shape=(4, 2),
+                              start_time=self.gen.start_time,
+                              sample_rate=1. * u.Hz,
+                              dtype=[('data', 'f4'), ('count', 'i8')])
+        with pytest.raises(ValueError, match='average=True'):
+            psrfits.PSRFITSWriter(filename, gen)
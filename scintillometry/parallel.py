@@ -0,0 +1,187 @@
+# Licensed under the GPLv3 - see LICENSE
+"""Tasks that read or process data concurrently."""
+import operator
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .base import BaseTaskBase
+
+
+__all__ = ['Prefetch', 'ParallelReader']
+
+
+class Prefetch(BaseTaskBase):
+    """Read ahead frames of the underlying stream in a background thread.
+
+    While a frame is being used, the next ``n_frames`` frames are read
+    from the underlying stream in a worker thread.  This allows, e.g.,
+    file I/O to overlap with processing in later tasks, and any computation
+    upstream that releases the GIL (such as most numpy and FFTW operations)
+    to happen concurrently.
+
+    Frames are read ahead assuming the stream is read sequentially.  If
+    another part of the stream is accessed, e.g., after a ``seek``, pending
+    reads that are no longer needed are cancelled.
+
+    Parameters
+    ----------
+    ih : task or `baseband` stream reader
+        Input data stream.
+    n_frames : int, optional
+        Number of frames to read ahead.  Default: 2.
+    samples_per_frame : int, optional
+        Number of samples to read in one go.  Default: taken from
+        the underlying stream.
+
+    Notes
+    -----
+    All access to the underlying stream is done in the worker thread,
+    so it should not be read directly while the prefetching task is open.
+    """
+
+    def __init__(self, ih, n_frames=2, *, samples_per_frame=None):
+        n_frames = operator.index(n_frames)
+        if n_frames < 1:
+            raise ValueError("must prefetch at least one frame.")
+        super().__init__(ih, samples_per_frame=samples_per_frame)
+        self.n_frames = n_frames
+        self._executor = self._get_executor()
+        self._futures = OrderedDict()
+
+    def _get_executor(self):
+        return ThreadPoolExecutor(max_workers=1)
+
+    def _fetch(self, frame_index):
+        # Executed in the worker thread.  Use read, not read_view, since
+        # the underlying stream may reuse its frame buffers.
+        self.ih.seek(frame_index * self.samples_per_frame)
+        return self.ih.read(self.samples_per_frame)
+
+    def _submit(self, frame_index):
+        return self._executor.submit(self._fetch, frame_index)
+
+    def _prefetch(self, frame_index):
+        """Ensure frames from ``frame_index`` onwards are being read.
+
+        Pending reads of frames outside of the prefetch range are cancelled.
+        """
+        n_total = self.shape[0] // self.samples_per_frame
+        wanted = range(frame_index,
+                       min(frame_index + self.n_frames + 1, n_total))
+        for index in list(self._futures):
+            if index not in wanted:
+                self._futures.pop(index).cancel()
+        for index in wanted:
+            if index not in self._futures:
+                self._futures[index] = self._submit(index)
+
+    def seek(self, offset, whence=0):
+        offset = super().seek(offset, whence)
+        if self._futures and 0 <= offset < self.shape[0]:
+            self._prefetch(offset // self.samples_per_frame)
+        return offset
+
+    def _read_frame(self, frame_index):
+        self._prefetch(frame_index)
+        return self._futures.pop(frame_index).result()
+
+    def close(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=True)
+        super().close()
+
+
+# Pipeline used by a worker process of ParallelReader.
+_worker_pipeline = None
+
+
+def _init_worker(pipeline):
+    global _worker_pipeline
+    _worker_pipeline = pipeline()
+
+
+def _read_in_worker(offset, count):
+    _worker_pipeline.seek(offset)
+    return _worker_pipeline.read(count)
+
+
+class ParallelReader(Prefetch):
+    """Evaluate frames of a pipeline in parallel in a pool of processes.
+
+    Each worker process constructs its own copy of the pipeline, and is
+    given disjoint frames to evaluate.  The results are passed back and
+    returned in order, reading ahead such that all workers are kept busy
+    as long as the stream is read sequentially.
+
+    This is mostly useful for expensive pipelines in which each frame is
+    calculated independently, such as those involving
+    `~scintillometry.dispersion.Dedisperse` or
+    `~scintillometry.channelize.Channelize`.  Since the data have to be
+    passed back to the main process, it is best to reduce the data volume
+    as much as possible inside the pipeline (e.g., by including squaring
+    or integration steps).
+
+    Parameters
+    ----------
+    pipeline : callable
+        Function that creates the pipeline, i.e., opens the file and sets up
+        the tasks, when called without arguments.  It should be picklable,
+        e.g., a function defined at module level or a `functools.partial`
+        of one.  It will also be called once in the main process to
+        determine the properties of the stream.
+    n_workers : int, optional
+        Number of worker processes.  Default: the number of CPUs.
+    n_frames : int, optional
+        Number of frames to read ahead.  Default: ``n_workers``.
+    samples_per_frame : int, optional
+        Number of samples evaluated by a worker in one go.  Default: taken
+        from the pipeline.
+    **kwargs
+        Further arguments for `~concurrent.futures.ProcessPoolExecutor`,
+        such as ``mp_context``.
+
+    Examples
+    --------
+    To dedisperse a file using 16 processes::
+
+        >>> import functools
+        >>> from baseband import vdif
+        >>> from scintillometry.dispersion import Dedisperse
+        >>> from scintillometry.dm import DispersionMeasure
+        >>> from scintillometry.parallel import ParallelReader
+        >>> def dedispersed(filename, dm):
+        ...     return Dedisperse(vdif.open(filename), dm)
+        >>> pipeline = functools.partial(dedispersed, 'file.vdif',
+        ...                              DispersionMeasure(29.5))
+        >>> ph = ParallelReader(pipeline, 16)  # doctest: +SKIP
+        >>> data = ph.read()  # doctest: +SKIP
+    """
+
+    def __init__(self, pipeline, n_workers=None, *, n_frames=None,
+                 samples_per_frame=None, **kwargs):
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = operator.index(n_workers)
+        if n_workers < 1:
+            raise ValueError("need at least one worker.")
+        if n_frames is None:
+            n_frames = n_workers
+        self._pipeline = pipeline
+        self.n_workers = n_workers
+        self._executor_kwargs = kwargs
+        super().__init__(pipeline(), n_frames,
+                         samples_per_frame=samples_per_frame)
+
+    def _get_executor(self):
+        return ProcessPoolExecutor(max_workers=self.n_workers,
+                                   initializer=_init_worker,
+                                   initargs=(self._pipeline,),
+                                   **self._executor_kwargs)
+
+    def _submit(self, frame_index):
+        return self._executor.submit(
+            _read_in_worker, frame_index * self.samples_per_frame,
+            self.samples_per_frame)
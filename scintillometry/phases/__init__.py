@@ -1,3 +1,4 @@
-from .core import PintPhase, PolycoPhase  # noqa
+from .core import (PintPhase, PolycoPhase, PintPolycoPhase,  # noqa
+                   InterpolatedPhase)
 from .phase import Phase, FractionalPhase  # noqa
 from .predictor import Polyco  # noqa
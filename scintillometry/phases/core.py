@@ -3,6 +3,9 @@
 pulse phase at a given time can be computed by PINT or polycos.
 """
 
+from collections import OrderedDict
+
+import numpy as np
 from astropy import units as u
 
 from .phase import Phase
@@ -10,7 +13,7 @@ from .predictor import Polyco
 from .pint_toas import PintToas
 
 
-__all__ = ['PintPhase', 'PolycoPhase']
+__all__ = ['PintPhase', 'PolycoPhase', 'PintPolycoPhase', 'InterpolatedPhase']
 
 
 class PintPhase:
@@ -87,8 +90,8 @@ class PolycoPhase:
 
     Parameters
     ----------
-    polyco_file : str
-        Tempo style polyco file.
+    polyco_file : str or `~scintillometry.phases.Polyco`
+        Tempo style polyco file, or polyco table.
     """
 
     def __init__(self, polyco_file):
@@ -126,3 +129,207 @@ class PolycoPhase:
         """
         f0 = self.polyco(t, deriv=1)
         return f0.to(u.Hz, equivalencies=[(u.cy / u.s, u.Hz)])
+
+
+class PintPolycoPhase(PolycoPhase):
+    """Helper class for computing pulsar phases using polycos made with PINT.
+
+    For a given time range, polycos are generated with
+    `~scintillometry.phases.Polyco.from_phase`, using phases calculated
+    with `~scintillometry.phases.PintPhase`.  This combines the precision of
+    PINT with the speed of polycos.
+
+    Parameters
+    ----------
+    par_file : str
+        TEMPO/TEMPO2 style parameter file.
+    observatory : str
+        Observatory name or observatory code.
+    frequency : `~astropy.units.Quantity`.
+        Observing frequency.  Should be a scalar.
+    start, stop : `~astropy.time.Time`
+        Time range for which polycos should be generated.
+    span : `~astropy.units.Quantity`, optional
+        Initial span of each polyco.  Default: 60 minutes.
+    ncoeff : int, optional
+        Number of coefficients for each polyco.  Default: 12.
+    tolerance : `~astropy.units.Quantity`, optional
+        Maximum allowed difference with phases calculated with PINT, as
+        verified for ``n_check`` random times.  Default: 1e-6 cycle.
+    n_check : int, optional
+        Number of random times used to verify the polycos.  Default: 100.
+    **kwargs
+        Additional key words arguments for making TOAs.  Please see the
+        documentation of `~scintillometry.phases.pint_toas.PintToas`.
+
+    Notes
+    -----
+    The polycos are stored in the ``polyco`` attribute, and can be written to
+    file using its `~scintillometry.phases.Polyco.to_polyco` method.
+    """
+
+    def __init__(self, par_file, observatory, frequency, start, stop, *,
+                 span=60*u.min, ncoeff=12, tolerance=1e-6*u.cycle,
+                 n_check=100, **kwargs):
+        self.pint_phase = PintPhase(par_file, observatory, frequency,
+                                    **kwargs)
+        model = self.pint_phase.model
+        dm = getattr(model, 'DM', None)
+        dm = 0 * u.pc / u.cm**3 if dm is None else dm.quantity
+        polyco = Polyco.from_phase(
+            self.pint_phase, start, stop, span=span, ncoeff=ncoeff,
+            tolerance=tolerance, n_check=n_check, psr=model.PSR.value,
+            obs=str(observatory), freq=u.Quantity(frequency, u.MHz), dm=dm)
+        super().__init__(polyco)
+
+
+class InterpolatedPhase:
+    """Phase calculated by interpolating another phase callable.
+
+    The phase callable is evaluated on a regular grid of times, and phases
+    in between are calculated using cubic interpolation.  Phases on the grid
+    are cached, so that repeated calls for times in the same range do not
+    require new evaluations.  This can speed up folding and integration in
+    phase enormously, in particular if the phase callable is expensive, as
+    is the case for `~scintillometry.phases.PintPhase`.
+
+    The interpolation error is estimated from the fourth difference of the
+    phases on the grid.  If it exceeds the tolerance, the grid spacing is
+    halved and the phases are recalculated, down to ``min_step``.
+
+    Parameters
+    ----------
+    phase : callable
+        Should return pulse phases for given input time(s), passed in as an
+        `~astropy.time.Time` object.  The output can be a
+        `~scintillometry.phases.Phase`, an `~astropy.units.Quantity` with
+        angular units, or a regular array of float (in which case units of
+        cycles are assumed).
+    step : `~astropy.units.Quantity`, optional
+        Initial spacing of the grid on which ``phase`` is evaluated.
+        Default: 1 s.
+    tolerance : `~astropy.units.Quantity`, optional
+        Maximum allowed interpolation error.  Default: 1e-6 cycle.
+    min_step : `~astropy.units.Quantity`, optional
+        Smallest grid spacing to try.  If the tolerance cannot be reached
+        even at this spacing (e.g., because ``phase`` returns wrapped or
+        noisy phases), a `ValueError` is raised.  Default: 1 ms.
+    max_cache : int, optional
+        Maximum number of grid phases to keep.  Default: 100000.
+
+    Notes
+    -----
+    Since four grid points are needed for interpolation, and five for the
+    error estimate, ``phase`` will be evaluated at times up to ``3 * step``
+    beyond the range of the times for which phases are requested.
+    """
+
+    def __init__(self, phase, step=1.*u.s, tolerance=1e-6*u.cycle,
+                 min_step=1.*u.ms, max_cache=100000):
+        self.phase = phase
+        self.step = step.to(u.s)
+        self.tolerance = tolerance.to(u.cycle)
+        self.min_step = min_step.to(u.s)
+        self.max_cache = max_cache
+        self._reference = None
+        self._cache = OrderedDict()
+
+    def _grid_phases(self, nodes):
+        """Phases at the given grid nodes, using the cache where possible.
+
+        Returns integer and fractional phases for each node.
+        """
+        unique, inverse = np.unique(nodes, return_inverse=True)
+        missing = np.array([node for node in unique
+                            if node not in self._cache], dtype=int)
+        if missing.size:
+            phase = Phase(self.phase(self._reference + missing * self.step))
+            for node, count, fraction in zip(missing, phase.int.value,
+                                             phase.frac.value):
+                self._cache[node] = (count, fraction)
+        values = []
+        for node in unique:
+            self._cache.move_to_end(node)
+            values.append(self._cache[node])
+        while len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+        values = np.array(values)[inverse].reshape(nodes.shape + (2,))
+        return values[..., 0], values[..., 1]
+
+    def _interpolation_setup(self, t):
+        """Get phases on the grid and positions within grid cells.
+
+        Returns the integer and fractional phase at the start of the grid
+        cell each time falls in, the phase differences relative to that
+        start of the grid points used for interpolation, and the fractional
+        position within the cell.
+        """
+        t = t.ravel()
+        if self._reference is None:
+            self._reference = t.min()
+        while True:
+            x = ((t - self._reference) / self.step).to_value(u.one)
+            cell = np.floor(x).astype(int)
+            nodes = cell[:, np.newaxis] + np.arange(-1, 4)
+            count, fraction = self._grid_phases(nodes)
+            diff = (count - count[:, 1:2]) + (fraction - fraction[:, 1:2])
+            # Estimate the maximum interpolation error, using that for
+            # a cubic through points at -1, 0, 1, 2, the error is given by
+            # the fourth derivative times (x+1)x(x-1)(x-2)/24, and that the
+            # polynomial has a maximum of 9/16 in the [0, 1] interval.
+            d4 = (diff[:, 0] - 4 * diff[:, 1] + 6 * diff[:, 2]
+                  - 4 * diff[:, 3] + diff[:, 4])
+            error = 9. / 16. / 24. * np.abs(d4).max()
+            if error <= self.tolerance.value:
+                break
+            if self.step / 2 < self.min_step:
+                raise ValueError("cannot interpolate phases to within {} "
+                                 "with a grid spacing of at least {}; the "
+                                 "estimated error is {} cycle."
+                                 .format(self.tolerance, self.min_step,
+                                         error))
+            self.step /= 2
+            self._cache.clear()
+
+        return count[:, 1], fraction[:, 1], diff[:, :4], x - cell
+
+    def __call__(self, t):
+        """Compute the interpolated phase at one or more times.
+
+        Parameters
+        ----------
+        t : `~astropy.time.Time`
+            The input time stamps.
+
+        Returns
+        -------
+        phase : `~scintillometry.phases.Phase`
+            The interpolated pulse phase at time ``t``.
+        """
+        count, fraction, diff, f = self._interpolation_setup(t)
+        # Lagrange weights for points at -1, 1, and 2; the point at 0 is
+        # not needed, since all differences are relative to it.
+        delta = (-f * (f-1) * (f-2) / 6 * diff[:, 0]
+                 - (f+1) * f * (f-2) / 2 * diff[:, 2]
+                 + (f+1) * f * (f-1) / 6 * diff[:, 3])
+        return Phase(count, fraction + delta).reshape(t.shape)
+
+    def apparent_spin_freq(self, t):
+        """Compute the apparent spin frequency at one or more times.
+
+        Parameters
+        ----------
+        t : `~astropy.time.Time`
+            The input time stamps.
+
+        Returns
+        -------
+        f0 : `~astropy.units.Quantity`
+            The apparent spin frequency at time ``t``, calculated from the
+            derivative of the interpolating polynomial.
+        """
+        _, _, diff, f = self._interpolation_setup(t)
+        derivative = (-(3 * f**2 - 6 * f + 2) / 6 * diff[:, 0]
+                      - (3 * f**2 - 2 * f - 2) / 2 * diff[:, 2]
+                      + (3 * f**2 - 1) / 6 * diff[:, 3])
+        return (derivative / self.step).to(u.Hz).reshape(t.shape)
@@ -4,10 +4,160 @@
 See https://github.com/nanograv/PINT
 """
 
+import hashlib
+import operator
+from collections import OrderedDict
+
 import numpy as np
+from astropy.utils.state import ScienceState
+
+
+__all__ = ['PintToas', 'ToaCache', 'toa_cache']
+
+
+class ToaCache:
+    """Least-recently-used cache of PINT TOAs.
+
+    Used by `~scintillometry.phases.pint_toas.PintToas` to avoid recreating
+    TOAs for the same times and settings.  Counts are kept of how often
+    TOAs were found in the cache (``hits``) and how often they had to be
+    created (``misses``).
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of `~pint.toa.TOAs` instances to keep.  Default: 8.
+    max_toas : int or None, optional
+        Maximum total number of individual TOAs in the instances kept.
+        Since each TOA carries clock corrections and solar system positions,
+        this limits the memory used.  Default: 2**17.  Instances with more
+        TOAs than this are not kept.
+
+    Notes
+    -----
+    TOAs are kept in the cache also after the phase objects that created
+    them are gone.  To release the memory, use `discard` to remove a single
+    entry or `clear` to remove all.
+    """
+
+    def __init__(self, max_entries=8, max_toas=2**17):
+        max_entries = operator.index(max_entries)
+        if max_entries < 0:
+            raise ValueError("number of entries cannot be negative.")
+        if max_toas is not None:
+            max_toas = operator.index(max_toas)
+        self.max_entries = max_entries
+        self.max_toas = max_toas
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def ntoas(self):
+        """Total number of TOAs in the cache."""
+        return sum(toas.ntoas for toas in self._entries.values())
+
+    def get(self, key):
+        """Get the TOAs with the given key, or `None` if not present."""
+        toas = self._entries.get(key)
+        if toas is None:
+            self.misses += 1
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return toas
+
+    def add(self, key, toas):
+        """Add TOAs with the given key to the cache.
+
+        Less recently used TOAs are removed if needed to stay within the
+        limits on the number of entries and the total number of TOAs.
+        """
+        self._entries[key] = toas
+        self._entries.move_to_end(key)
+        while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_toas is not None
+                    and self.ntoas > self.max_toas)):
+            self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Remove the TOAs with the given key, if present."""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all TOAs (but keep the counts)."""
+        self._entries.clear()
 
+    def __repr__(self):
+        return ("<{s.__class__.__name__} max_entries={s.max_entries},"
+                " max_toas={s.max_toas}\n"
+                "    entries={n}, ntoas={s.ntoas},"
+                " hits={s.hits}, misses={s.misses}>"
+                .format(s=self, n=len(self)))
 
-__all__ = ['PintToas']
+
+class toa_cache(ScienceState):
+    """Process-wide cache of PINT TOAs.
+
+    Use ``toa_cache.get()`` to get the
+    `~scintillometry.phases.pint_toas.ToaCache` currently in use.
+
+    Notes
+    -----
+    By default, up to 8 sets of TOAs with up to 2**17 TOAs in total are
+    kept.  These remain in memory after the phase objects that created them
+    are gone.  To release the memory, use ``toa_cache.get().clear()``.
+    The `toa_cache.set` method can be used to change the limits, or to
+    disable caching altogether.
+
+    Examples
+    --------
+    To temporarily disable caching::
+
+      >>> from scintillometry.phases.pint_toas import toa_cache
+      >>> with toa_cache.set(max_entries=0):
+      ...     toa_cache.get().max_entries
+      0
+    """
+
+    _value = ToaCache()
+
+    @classmethod
+    def validate(cls, value):
+        if not isinstance(value, ToaCache):
+            raise TypeError("can only set the TOA cache to a "
+                            "ToaCache instance.")
+        return value
+
+    @classmethod
+    def set(cls, cache=None, **kwargs):
+        """Set the cache used for new `PintToas` instances.
+
+        This method can be used to set the cache only temporarily, by
+        using it as a context in a ``with`` statement.
+
+        Parameters
+        ----------
+        cache : `~scintillometry.phases.pint_toas.ToaCache`, optional
+            Cache to use.  If not given, a new one is created.
+        **kwargs
+            Arguments to create a new
+            `~scintillometry.phases.pint_toas.ToaCache`, i.e.,
+            ``max_entries`` and ``max_toas``.  Only allowed if ``cache`` is
+            not given.
+        """
+        if cache is None:
+            cache = ToaCache(**kwargs)
+        elif kwargs:
+            raise TypeError("cannot pass in both a cache and arguments.")
+        return super().set(cache)
 
 
 class PintToas:
@@ -50,6 +200,14 @@ class PintToas:
     A TOA (time of arrival) represents the pulse time of arrival.
     Combined with metadata, it can be considered a timestamp
     (e.g., observatory, observing frequency, etc.)
+
+    Creating TOAs is expensive, as it involves clock corrections and the
+    evaluation of solar system ephemerides.  Hence, the most recently created
+    TOAs are kept in the `~scintillometry.phases.pint_toas.toa_cache` active
+    when the instance was created, keyed by the times, observatory,
+    frequencies, and control parameters.  This way, one can, e.g., fold the
+    same observation with updated pulsar parameters without recalculating
+    the TOAs.
     """
 
     def __init__(self, observatory, frequency, *,
@@ -66,6 +224,7 @@ class PintToas:
                                'planets': planets,
                                'tdb_method': tdb_method}
         self.control_params.update(kwargs)
+        self._cache = toa_cache.get()
 
     def __call__(self, time):
         """Create list of TOAs for one or more times.
@@ -89,13 +248,38 @@ class PintToas:
 
         freq, _ = np.broadcast_arrays(self.frequency, time.jd1, subok=True)
         time = time._apply(np.broadcast_to, freq.shape)
-        toa_list = []
-        for t, f in zip(time.ravel(), freq.ravel()):
-            # This format converting should be done by PINT in the future.
-            toa_entry = toa.TOA(t, obs=self.observatory, freq=f,
-                                **self.control_params)
-            toa_list.append(toa_entry)
-
-        toas = toa.get_TOAs_list(toa_list, **self.control_params)
+
+        key = self._cache_key(time, freq)
+        toas = self._cache.get(key)
+        if toas is not None:
+            return toas
+
+        get_TOAs_array = getattr(toa, 'get_TOAs_array', None)
+        if get_TOAs_array is not None:
+            # Create all TOAs in one go from arrays.
+            toas = get_TOAs_array(time.ravel(), self.observatory,
+                                  freqs=freq.ravel(), **self.control_params)
+        else:  # pragma: no cover
+            # Older PINT: create TOA instances one by one.
+            toa_list = []
+            for t, f in zip(time.ravel(), freq.ravel()):
+                toa_entry = toa.TOA(t, obs=self.observatory, freq=f,
+                                    **self.control_params)
+                toa_list.append(toa_entry)
+
+            toas = toa.get_TOAs_list(toa_list, **self.control_params)
+
         toas.shape = time.shape
+        self._cache.add(key, toas)
+
         return toas
+
+    def _cache_key(self, time, freq):
+        """Key for the TOA cache based on times, frequencies and settings."""
+        digest = hashlib.sha1()
+        for array in (time.jd1, time.jd2, freq.value):
+            digest.update(np.ascontiguousarray(array, dtype=float).data)
+        return (digest.hexdigest(), time.shape, time.scale, str(freq.unit),
+                self.observatory,
+                tuple(sorted((k, repr(v))
+                             for k, v in self.control_params.items())))
@@ -90,6 +90,122 @@ class Polyco(QTable):
             data = polyco2table(data)
 
         super().__init__(data, *args, **kwargs)
+        self._coefficients = {}
+
+    @classmethod
+    def from_phase(cls, phase, start, stop, *, span=60*u.min, ncoeff=12,
+                   tolerance=1e-6*u.cycle, n_check=100, psr='unknown',
+                   obs='-', freq=0*u.MHz, dm=0*u.pc/u.cm**3):
+        """Create polycos by fitting the phases given by a phase callable.
+
+        The time range is divided in segments of length ``span``, and for
+        each segment a polynomial is fitted to phases calculated at Chebyshev
+        nodes.  All phases are calculated in a single call, so this is
+        efficient even for expensive callables such as
+        `~scintillometry.phases.PintPhase`.  The result is verified against
+        phases calculated at random times, and if the tolerance is not met,
+        the fit is redone with half the span.
+
+        Parameters
+        ----------
+        phase : callable
+            Should return pulse phases, including cycle count, for given
+            input time(s), passed in as an `~astropy.time.Time` object.
+            The output is best a `~scintillometry.phases.Phase` instance,
+            to ensure precision is preserved.
+        start, stop : `~astropy.time.Time`
+            Time range to be covered.
+        span : `~astropy.units.Quantity`, optional
+            Initial span of each polyco.  Will be rounded to whole minutes.
+            Default: 60 minutes.
+        ncoeff : int, optional
+            Number of coefficients for each polyco.  Default: 12.
+        tolerance : `~astropy.units.Quantity`, optional
+            Maximum allowed difference with the phases from ``phase``.
+            Default: 1e-6 cycle.
+        n_check : int, optional
+            Number of random times for which the polycos are verified.
+            Default: 100.
+        psr, obs : str, optional
+            Pulsar name and observatory code, used only when writing the
+            polycos to file.  Default: 'unknown' and '-'.
+        freq : `~astropy.units.Quantity`, optional
+            Observing frequency, also used only for writing.
+        dm : `~astropy.units.Quantity`, optional
+            Dispersion measure, also used only for writing.
+
+        Returns
+        -------
+        polyco : `~scintillometry.phases.Polyco`
+            With values rounded such that writing them to file with
+            `~scintillometry.phases.Polyco.to_polyco` preserves precision.
+        """
+        start = Time(start).utc
+        stop = Time(stop).utc
+        span = np.round(span.to(u.min))
+        duration = (stop - start).to(u.min)
+        rng = np.random.default_rng(0)
+        check_times = start + rng.uniform(size=n_check) * duration
+        check_phases = Phase(phase(check_times))
+
+        while True:
+            if span < 1. * u.min:
+                raise ValueError('could not reach the required tolerance '
+                                 'with {} coefficients.'.format(ncoeff))
+            # Segments cover the time range, with a small margin.
+            n_segment = int(np.ceil(((duration + 1. * u.s) / span)
+                                    .to_value(u.one)))
+            mid = (start + duration / 2
+                   + (np.arange(n_segment) - (n_segment - 1) / 2) * span)
+            # Round the middle times such that they can be written to file.
+            day = np.floor(mid.mjd)
+            frac = np.round((mid.jd1 - 2400000.5 - day) + mid.jd2, 11)
+            mjd_mid = Time(day, frac, format='mjd', scale='utc')
+            # Calculate phases at the middle and at Chebyshev nodes.
+            half_span = span.to_value(u.min) / 2
+            nodes = np.polynomial.chebyshev.chebpts1(2 * ncoeff) * half_span
+            times = (mjd_mid[:, np.newaxis]
+                     + np.hstack([0., nodes]) * u.min)
+            phases = Phase(phase(times))
+            # Round the reference phase such that it can be written to file.
+            rphase = Phase(phases[:, 0].int,
+                           np.round(phases[:, 0].frac.to_value(u.cycle), 6))
+            y = (phases[:, 1:] - rphase[:, np.newaxis]).to_value(u.cycle)
+            coeff = np.zeros((n_segment, ncoeff))
+            lgrms = np.zeros(n_segment)
+            window = [-half_span, half_span]
+            for i in range(n_segment):
+                fit = np.polynomial.Chebyshev.fit(nodes, y[i], ncoeff - 1,
+                                                  domain=window)
+                rms = np.sqrt(np.mean((fit(nodes) - y[i]) ** 2))
+                lgrms[i] = np.log10(max(rms, 1e-30))
+                power_series = fit.convert(kind=Polynomial, domain=window,
+                                           window=window)
+                coeff[i, :len(power_series.coef)] = power_series.coef
+            # Move linear term to f0, rounded for writing to file.
+            f0 = np.round(coeff[:, 1] / 60., 12)
+            coeff[:, 1] -= f0 * 60.
+
+            polyco = cls({'psr': np.full(n_segment, psr),
+                          'mjd_mid': mjd_mid,
+                          'dm': DispersionMeasure(np.full(n_segment,
+                                                          dm.value),
+                                                  dm.unit),
+                          'vbyc_earth': np.zeros(n_segment) << u.Unit(1e-4),
+                          'lgrms': lgrms,
+                          'rphase': rphase,
+                          'f0': f0 << u.cycle / u.s,
+                          'obs': np.full(n_segment, obs),
+                          'span': np.full(n_segment, span.value) << u.min,
+                          'ncoeff': np.full(n_segment, ncoeff),
+                          'freq': np.full(n_segment,
+                                          freq.to_value(u.MHz)) << u.MHz,
+                          'coeff': coeff})
+            error = abs(polyco(check_times) - check_phases).max()
+            if error <= tolerance:
+                return polyco
+
+            span = np.round(span / 2)
 
     def to_polyco(self, name='polyco.dat', style='tempo2'):
         """Write the polyco table to a polyco file.
@@ -172,7 +288,13 @@ class Polyco(QTable):
             index = self.searchclosest(time)
 
         # Convert offsets to minutes for later use in polynomial evaluation.
-        dt = (time - self['mjd_mid'][index]).to(u.min)
+        # Following tempo, these are simple differences in MJD (in the scale
+        # of the polyco, i.e., UTC), which also avoids expensive conversions
+        # to TAI for large arrays of times.
+        mjd_mid = self['mjd_mid']
+        time = getattr(time, mjd_mid.scale)
+        dt = ((time.jd1 - mjd_mid.jd1[index])
+              + (time.jd2 - mjd_mid.jd2[index])) * u.day.to(u.min) << u.min
         if np.any(dt > self['span'][index]/2):
             raise ValueError('(some) MJD outside of polyco range')
 
@@ -182,13 +304,14 @@ class Polyco(QTable):
             # If so, do not add it inside the polynomials.
             rphase = 'ignore'
 
-        if time.isscalar:
-            result = self.polynomial(index, rphase, deriv)(dt.value)
-        else:
-            result = np.zeros(time.shape)
-            for j in set(index):
-                sel = index == j
-                result[sel] = self.polynomial(j, rphase, deriv)(dt[sel].value)
+        # Evaluate the polynomials for all times in one go, using Horner's
+        # method with the coefficients for each time looked up by index.
+        coeff = self.coefficients(rphase, deriv)
+        dt = dt.value
+        result = np.zeros(dt.shape)
+        for k in range(coeff.shape[1] - 1, -1, -1):
+            result *= dt
+            result += coeff[index, k]
 
         # Apply units from the polynomials.
         result = result << u.cycle/u.min**deriv
@@ -197,6 +320,73 @@ class Polyco(QTable):
         # Add reference phase to it if needed.
         return result + self['rphase'][index] if do_phase else result
 
+    def coefficients(self, rphase=None, deriv=0):
+        """Polynomial coefficients for all entries in the table.
+
+        The coefficients are for times in minutes relative to the middle
+        of the span of each entry, and include the reference frequency.
+        They are padded with zeros to the maximum number of coefficients.
+        The stacked coefficients are calculated only once for each ``deriv``
+        and cached, so the table should not be modified in-place after
+        the polyco has been evaluated.
+
+        Parameters
+        ----------
+        rphase : None or 'fraction' or 'ignore' or float
+            Phase zero point; if None, use the one stored in polyco.
+            (Those are typically large, so one looses some precision.)
+            Can also set 'fraction' to use the stored one modulo 1, which is
+            fine for folding, but breaks cycle count continuity between sets,
+            'ignore' for just keeping the value stored in the coefficients,
+            or a value that should replace the zero point.
+        deriv : int
+            derivative of phase to take (1=frequency, 2=fdot, etc.); default 0
+
+        Returns
+        -------
+        coeff : `~numpy.ndarray`
+            With shape ``(len(self), ncoeff - deriv)``, where ``ncoeff`` is
+            the maximum number of coefficients, with units of cycles/min**deriv
+            implied.  Unless a reference phase is added, the array is the
+            cached one and is read-only.
+        """
+        coeff = self._coefficients.get(deriv)
+        if coeff is None:
+            coeff = self._coefficients[deriv] = self._stack_coefficients(deriv)
+
+        if deriv == 0 and rphase != 'ignore':
+            coeff = coeff.copy()
+            if rphase is None:
+                coeff[:, 0] += self['rphase'].value
+            elif rphase == 'fraction':
+                coeff[:, 0] += self['rphase']['frac'].value % 1
+            else:
+                coeff[:, 0] = rphase
+
+        return coeff
+
+    def _stack_coefficients(self, deriv):
+        """Stack coefficients of all rows, for the given derivative.
+
+        The result excludes the reference phase and is made read-only,
+        since it is cached by `coefficients`.
+        """
+        ncoeff = max(2, max(len(coeff) for coeff in self['coeff']))
+        coeff = np.zeros((len(self), ncoeff))
+        for i, row_coeff in enumerate(self['coeff']):
+            coeff[i, :len(row_coeff)] = row_coeff
+        coeff[:, 1] += self['f0'].to_value(u.cycle/u.minute)
+
+        if deriv > 0:
+            power = np.arange(ncoeff)
+            factor = np.ones(ncoeff)
+            for i in range(deriv):
+                factor *= power - i
+            coeff = (coeff * factor)[:, deriv:]
+
+        coeff.flags.writeable = False
+        return coeff
+
     def polynomial(self, index, rphase=None, deriv=0,
                    t0=None, time_unit=u.min, out_unit=None,
                    convert=False):
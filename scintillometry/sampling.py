@@ -5,7 +5,7 @@ import numpy as np
 from astropy import units as u
 from astropy.utils import lazyproperty
 
-from .base import PaddedTaskBase
+from .base import PaddedTaskBase, chirp_cache
 from .fourier import fft_maker
 
 __all__ = ['Resample', 'float_offset']
@@ -123,6 +123,7 @@ class Resample(PaddedTaskBase):
                               + ih.sample_shape, sample_rate=ih.sample_rate,
                               dtype=ih.dtype)
         self._ifft = self._fft.inverse()
+        self._chirp_cache = chirp_cache.get()
 
         self._fraction = fraction
         self._start_time += fraction / ih.sample_rate
@@ -132,12 +133,29 @@ class Resample(PaddedTaskBase):
 
     @lazyproperty
     def phase_factor(self):
-        """Phase offsets of the Fourier-transformed frame."""
+        """Phase offsets of the Fourier-transformed frame.
+
+        Shared between tasks with the same settings via the
+        `~scintillometry.base.chirp_cache` active when the task was created.
+        Hence, it remains in memory after the task is closed; see
+        `~scintillometry.base.chirp_cache` for how to release it.
+        """
+        key = self._chirp_cache.key(
+            type(self).__name__, self._fraction, self.sample_rate,
+            self._fft.time_shape, self._fft.time_dtype,
+            self._fft.frequency_dtype)
+        phase_factor = self._chirp_cache.get(key)
+        if phase_factor is None:
+            phase_factor = self._chirp_cache.add(
+                key, self._fourier_factor(self._fft))
+        return phase_factor
+
+    def _fourier_factor(self, fft):
+        """Phase offsets for a frame Fourier-transformed with ``fft``."""
         phase_delay = (self._fraction / self.sample_rate * u.cycle
-                       * self._fft.frequency)
+                       * fft.frequency)
         phase_factor = np.exp(phase_delay.to_value(u.rad) * 1j)
-        phase_factor = phase_factor.astype(self._fft.frequency_dtype,
-                                           copy=False)
+        phase_factor = phase_factor.astype(fft.frequency_dtype, copy=False)
         return phase_factor
 
     def task(self, data):
@@ -9,7 +9,7 @@ import astropy.units as u
 import pytest
 
 from ..base import (BaseTaskBase, SetAttribute, TaskBase, PaddedTaskBase,
-                    Task)
+                    Task, FrameCache, frame_cache, ChirpCache, chirp_cache)
 from .common import UseVDIFSample
 
 
@@ -106,6 +106,9 @@ class TestSetAttribute(UseVDIFSample):
         sa.seek(10)
         data2 = sa.read(10)
         assert np.all(data2 == expected[10:20])
+        # Pointer should have moved on.
+        assert sa.tell() == 20
+        assert np.all(sa.read(10) == expected[20:30])
         sa.seek(10/sa.sample_rate)
         data3 = sa.read(10)
         assert np.all(data3 == expected[10:20])
@@ -393,6 +396,224 @@ class TestTasks(UseVDIFSample):
             Task(self.fh, trial3)
 
 
+class TestReadView(UseVDIFSample):
+    def test_read_view(self):
+        fh = self.fh
+        expected = fh.read() * 2.
+        mh = Multiply(fh, 2.)
+        mh.seek(3)
+        data = mh.read_view(10)
+        assert mh.tell() == 13
+        assert np.all(data == expected[3:13])
+        assert not data.flags.writeable
+        assert np.may_share_memory(data, mh._frame)
+        # Reading across frames gives a copy.
+        mh.seek(mh.samples_per_frame - 5)
+        data2 = mh.read_view(10)
+        assert mh.tell() == mh.samples_per_frame + 5
+        assert np.all(data2 == expected[mh.samples_per_frame-5:
+                                        mh.samples_per_frame+5])
+        assert data2.flags.writeable
+        # As does reading everything.
+        mh.seek(0)
+        data3 = mh.read_view()
+        assert np.all(data3 == expected)
+        assert mh.read_view().shape == (0,) + mh.sample_shape
+        mh.seek(-2, 'end')
+        with pytest.raises(EOFError):
+            mh.read_view(10)
+        mh.close()
+        with pytest.raises(ValueError):
+            mh.read_view(1)
+
+    def test_tasks_use_views(self):
+        fh = self.fh
+        expected = fh.read() * 2.
+        mh = Multiply(fh, 2.)
+        rt = ReshapeTime(mh, 250, samples_per_frame=4)
+        data = rt.read()
+        assert np.all(data == expected.reshape((-1, 250) + fh.sample_shape))
+        # The reshaped frame should not be a view of the underlying one.
+        assert not np.may_share_memory(rt._frame, mh._frame)
+        sh = SquareHat(mh, 3)
+        data2 = sh.read(10)
+        assert np.all(data2 == (expected[:10] + expected[1:11]
+                                + expected[2:12]))
+
+    def test_task_gets_writeable_data(self):
+        fh = self.fh
+        expected = zero_every_8th_sample(fh.read() * 2.)
+        mh = Multiply(fh, 2.)
+        ft = Task(mh, zero_every_8th_sample, samples_per_frame=1000)
+        data = ft.read()
+        assert np.all(data == expected)
+        # Underlying frame should not have been changed.
+        assert np.all(mh._frame != 0.)
+
+
+class TestFrameCache(UseVDIFSample):
+    def test_cache_basics(self):
+        cache = FrameCache(max_frames=2)
+        assert len(cache) == 0
+        assert cache.get(0) is None
+        assert cache.misses == 1
+        frame0 = np.zeros(10)
+        assert cache.add(0, frame0) is frame0
+        assert cache.get(0) is frame0
+        assert cache.hits == 1
+        cache.add(1, np.ones(10))
+        cache.add(2, np.ones(10))
+        assert len(cache) == 2
+        assert 0 not in cache
+        assert cache.nbytes == 160
+        # Frames that do not own their data are copied.
+        base = np.arange(20.)
+        frame3 = cache.add(3, base[:10])
+        assert frame3 is not base[:10]
+        assert not np.may_share_memory(frame3, base)
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_cache_max_bytes(self):
+        cache = FrameCache(max_frames=10, max_bytes=200)
+        for i in range(4):
+            cache.add(i, np.zeros(10))
+        assert len(cache) == 2
+        assert 2 in cache and 3 in cache
+        # Most recent frame is kept even if too large.
+        cache.add(4, np.zeros(100))
+        assert len(cache) == 1
+        assert 4 in cache
+
+    def test_cache_invalid(self):
+        with pytest.raises(ValueError):
+            FrameCache(max_frames=0)
+        with pytest.raises(ValueError):
+            frame_cache.set(max_frames=0)
+        assert frame_cache().max_frames == 1
+
+    def test_frame_cache_state(self):
+        assert frame_cache().max_frames == 1
+        with frame_cache.set(max_frames=3, max_bytes=2**20):
+            cache = frame_cache()
+            assert cache.max_frames == 3
+            assert cache.max_bytes == 2**20
+            mh = Multiply(self.fh, 2.)
+        assert frame_cache().max_frames == 1
+        assert frame_cache().max_bytes is None
+        assert mh.cache.max_frames == 3
+
+    def test_task_cache(self):
+        fh = self.fh
+        expected = fh.read() * 2.
+        mh = Multiply(fh, 2.)
+        rt = ReshapeTime(mh, 250, samples_per_frame=4)
+        rt.cache = FrameCache(max_frames=8)
+        data = rt.read()
+        assert np.all(data == expected.reshape((-1, 250) + fh.shape[1:]))
+        n_frames = rt.shape[0] // rt.samples_per_frame
+        assert rt.cache.misses == n_frames
+        assert mh.cache.misses == 2
+        # Reading the last frames backwards should not require new reads.
+        for offset in range(rt.shape[0] - 1, rt.shape[0] - 8 * 4 - 1, -1):
+            rt.seek(offset)
+            assert np.all(rt.read(1) == data[offset])
+        assert rt.cache.misses == n_frames
+        # But going beyond what is cached should.
+        rt.seek(0)
+        rt.read()
+        assert rt.cache.misses > n_frames
+        rt.close()
+        assert len(rt.cache) == 0
+
+
+class TestChirpCache:
+    def test_key(self):
+        key = ChirpCache.key('Disperse', 1. * u.MHz, np.arange(3.), (4, 2))
+        assert key == ChirpCache.key('Disperse', 1. * u.MHz, np.arange(3.),
+                                     (4, 2))
+        assert key != ChirpCache.key('Disperse', 1. * u.kHz, np.arange(3.),
+                                     (4, 2))
+        assert key != ChirpCache.key('Disperse', 1. * u.MHz,
+                                     np.arange(3.).astype('f4'), (4, 2))
+        assert key != ChirpCache.key('Resample', 1. * u.MHz, np.arange(3.),
+                                     (4, 2))
+
+    def test_cache_basics(self):
+        cache = ChirpCache(max_entries=2)
+        assert len(cache) == 0
+        assert cache.get('a') is None
+        assert cache.misses == 1
+        array = np.zeros(10, 'c8')
+        stored = cache.add('a', array)
+        assert stored is array
+        assert not stored.flags.writeable
+        assert cache.get('a') is array
+        assert cache.hits == 1
+        cache.add('b', np.ones(10, 'c8'))
+        cache.add('c', np.ones(10, 'c8'))
+        assert len(cache) == 2
+        assert 'a' not in cache
+        assert cache.nbytes == 160
+        cache.discard('b')
+        assert 'b' not in cache and 'c' in cache
+        cache.discard('b')
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_cache_max_bytes(self):
+        cache = ChirpCache(max_bytes=200)
+        for key in 'abcd':
+            cache.add(key, np.zeros(10))
+        assert len(cache) == 2
+        assert 'c' in cache and 'd' in cache
+        # Arrays that are too large are not kept.
+        cache.add('e', np.zeros(100))
+        assert len(cache) == 0
+
+    def test_cache_directory(self, tmpdir):
+        directory = str(tmpdir.join('chirps'))
+        cache = ChirpCache(directory=directory)
+        array = np.arange(10.) * 1j
+        stored = cache.add('a', array)
+        assert isinstance(stored, np.memmap)
+        assert not stored.flags.writeable
+        assert np.all(stored == array)
+        assert cache.nbytes == 0
+        # A new cache, e.g., in another process, finds the stored array.
+        cache2 = ChirpCache(directory=directory)
+        assert 'a' not in cache2
+        stored2 = cache2.get('a')
+        assert isinstance(stored2, np.memmap)
+        assert np.all(stored2 == array)
+        assert cache2.hits == 1 and cache2.misses == 0
+        assert 'a' in cache2
+        assert cache2.get('b') is None
+
+    def test_cache_invalid(self):
+        with pytest.raises(ValueError):
+            ChirpCache(max_entries=-1)
+        with pytest.raises(TypeError):
+            chirp_cache.set(ChirpCache(), max_entries=1)
+        with pytest.raises(TypeError):
+            chirp_cache.set('cache')
+
+    def test_chirp_cache_state(self):
+        default = chirp_cache.get()
+        assert chirp_cache.get() is default
+        with chirp_cache.set(max_entries=3, max_bytes=2**20):
+            cache = chirp_cache.get()
+            assert cache is not default
+            assert cache.max_entries == 3
+            assert cache.max_bytes == 2**20
+        assert chirp_cache.get() is default
+        cache = ChirpCache()
+        with chirp_cache.set(cache):
+            assert chirp_cache.get() is cache
+
+
 class TestPaddedTaskBase(UseVDIFSample):
     def test_basics(self):
         fh = self.fh
@@ -409,6 +630,42 @@ class TestPaddedTaskBase(UseVDIFSample):
         sh.close()
         assert sh.closed
 
+    def test_no_padding(self):
+        sh = SquareHat(self.fh, 1)
+        assert sh.samples_per_frame == self.fh.samples_per_frame
+        assert sh.start_time == self.fh.start_time
+        expected = self.fh.read(10)
+        assert np.all(sh.read(10) == expected)
+
+    def test_reuse_padding(self):
+        fh = self.fh
+        ih = SetAttribute(fh)
+        requested = []
+
+        def read(count=None, out=None):
+            requested.append(count if out is None else len(out))
+            return SetAttribute.read(ih, count, out=out)
+
+        ih.read = ih.read_view = read
+        sh = SquareHat(ih, 9, samples_per_frame=32)
+        raw = fh.read()
+        expected = sum(raw[i:sh.shape[0]+i] for i in range(9))
+        data = sh.read()
+        assert np.all(data == expected)
+        # Only the first frame should have needed its padding read.
+        n_frames = sh.shape[0] // sh.samples_per_frame
+        assert len(requested) == n_frames
+        assert sum(requested) == n_frames * sh.samples_per_frame + 8
+        # Non-sequential access should give identical results.
+        requested.clear()
+        sh.seek(24 * 5)
+        assert np.all(sh.read(10) == expected[24 * 5:24 * 5 + 10])
+        assert requested == [32]
+        sh.seek(24 * 2 + 3)
+        assert np.all(sh.read(30) == expected[24 * 2 + 3:24 * 2 + 33])
+        assert requested == [32, 32, 24]
+        sh.close()
+
     def test_invalid(self):
         with pytest.raises(ValueError):
             SquareHat(self.fh, -1)
@@ -3,8 +3,11 @@
 import pytest
 import numpy as np
 from numpy.testing import assert_array_equal
+from astropy import units as u
+from baseband import vdif
+from baseband.data import SAMPLE_VDIF
 
-from ..base import SetAttribute
+from ..base import SetAttribute, frame_cache
 from ..shaping import GetItem, Reshape
 from ..combining import Concatenate, Stack, CombineStreams
 
@@ -55,6 +58,40 @@ class TestConcatenate(UseVDIFSampleWithAttrs):
         assert_array_equal(data, expected_data)
         ch.close()
 
+    def test_frame_cache(self):
+        fh = self.fh
+        expected_data = fh.read()
+        fhs = [GetItem(fh, item) for item in (slice(None, 4), slice(4, None))]
+        with frame_cache.set(max_frames=4):
+            ch = Concatenate(fhs, samples_per_frame=1000)
+        # Read frames in reverse, and check they are not overwritten.
+        frames = []
+        for offset in range(3000, -1, -1000):
+            ch.seek(offset)
+            frames.append(ch.read_view(1000))
+        for frame, offset in zip(frames, range(3000, -1, -1000)):
+            assert_array_equal(frame, expected_data[offset:offset+1000])
+        ch.close()
+
+    def test_threads(self):
+        expected_data = self.fh.read()
+        # Reading in threads requires independent streams.
+        raw = [vdif.open(SAMPLE_VDIF) for i in range(3)]
+        fhs = [GetItem(fh, item) for fh, item in zip(
+            raw, (slice(None, 3), slice(3, 5), slice(5, None)))]
+        ch = Concatenate(fhs, samples_per_frame=5000, n_threads=3)
+        assert ch.read_time.shape == (3,)
+        assert np.all(ch.read_time == 0. * u.s)
+        data = ch.read()
+        assert_array_equal(data, expected_data)
+        assert np.all(ch.read_time > 0. * u.s)
+        ch.seek(12345)
+        data = ch.read(10)
+        assert_array_equal(data, expected_data[12345:12355])
+        ch.close()
+        for fh in raw:
+            fh.close()
+
     def test_wrong_axis(self):
         with pytest.raises(ValueError):
             Concatenate((self.fh, self.fh), axis=0)
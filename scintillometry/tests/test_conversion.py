@@ -45,6 +45,34 @@ def test_real_to_complex_delta():
     assert real2complex.sideband == 1
 
 
+def test_real_to_complex_noise():
+    """Compare with a direct Hilbert transform, shift and decimation."""
+    noise = np.random.default_rng(1234).normal(size=(2048, 2))
+
+    def real_noise(handle):
+        return noise[handle.offset:handle.offset + handle.samples_per_frame]
+
+    noise_fh = StreamGenerator(real_noise,
+                               samples_per_frame=512,
+                               start_time=Time('2010-11-12T13:14:15'),
+                               sample_rate=1. * u.kHz,
+                               shape=(2048, 2),
+                               dtype='f8')
+    real2complex = Real2Complex(noise_fh)
+    complex_signal = real2complex.read()
+    assert complex_signal.shape == (1024, 2)
+
+    expected = []
+    for frame in noise.reshape(4, 512, 2):
+        h = np.zeros(512)
+        h[0] = h[256] = 1
+        h[1:256] = 2
+        z = np.fft.ifft(np.fft.fft(frame, axis=0) * h[:, np.newaxis], axis=0)
+        z *= np.exp(-1j * np.pi / 2 * np.arange(512))[:, np.newaxis]
+        expected.append(z[::2])
+    assert_allclose(complex_signal, np.concatenate(expected), atol=1e-8)
+
+
 def test_expected_failures():
     with pytest.raises(ValueError):
         Real2Complex(
@@ -84,3 +84,10 @@ class TestConvolveNoise:
     def test_wrong_response(self, convolve_task):
         with pytest.raises(ValueError):
             convolve_task(self.nh, np.ones((3, 3)))
+        with pytest.raises(ValueError):
+            convolve_task(self.nh, np.ones(3) * 1j)
+
+    def test_real_transform(self):
+        ct = Convolve(self.nh, self.response, samples_per_frame=844)
+        ct.read(10)
+        assert ct._ft_response.shape == (844 // 2 + 1, 1)
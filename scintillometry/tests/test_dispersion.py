@@ -1,12 +1,16 @@
 # Licensed under the GPLv3 - see LICENSE
+import tracemalloc
+
 import pytest
 import numpy as np
 import astropy.units as u
 from astropy.time import Time
 from astropy.tests.helper import assert_quantity_allclose
 
+from ..base import ChirpCache, chirp_cache
 from ..fourier import fft_maker
-from ..dispersion import Disperse, Dedisperse, DispersionMeasure
+from ..dispersion import (Disperse, Dedisperse, DedisperseMany,
+                          IncoherentDedisperse, DispersionMeasure)
 from ..generators import StreamGenerator
 
 
@@ -178,15 +182,82 @@ class TestDispersion:
         assert np.all(p[9:11].sum() > 0.99)
         assert np.all(p[9:11] > 0.047)
 
+    def test_phase_factor_size(self):
+        # For real data, should use real-input transforms, which need
+        # phase factors only for non-negative frequencies.
+        disperse = Disperse(self.gp, self.dm)
+        n = disperse._padded_samples_per_frame
+        if self.gp.complex_data:
+            expected = n
+        else:
+            expected = n // 2 + 1
+        assert disperse.phase_factor.shape[0] == expected
+        assert disperse.phase_factor.dtype == np.complex64
+        assert disperse.read(10).dtype == self.gp.dtype
+
+    def test_phase_factor_blocks(self):
+        disperse = Disperse(self.gp, self.dm)
+        fft = disperse._fft
+        frequency = disperse.frequency + fft.frequency * disperse.sideband
+        phase_delay = disperse.dm.phase_delay(frequency,
+                                              disperse.reference_frequency)
+        phase_delay *= disperse.sideband
+        phase_delay += (disperse._sample_offset / disperse.sample_rate
+                        * u.cycle * fft.frequency)
+        expected = np.exp(1j * phase_delay.to_value(u.rad))
+        # Calculate in many blocks, checking peak memory use.
+        disperse._block_size = 1000
+        nbytes, peak = disperse.phase_factor_memory()
+        tracemalloc.start()
+        try:
+            phase_factor = disperse._fourier_factor(fft)
+            _, traced_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert phase_factor.dtype == fft.frequency_dtype
+        assert phase_factor.nbytes == nbytes
+        assert nbytes < traced_peak <= peak
+        assert peak < 2 * nbytes
+        assert np.allclose(phase_factor, expected, atol=1e-6, rtol=0)
+
+    def test_chirp_cache(self):
+        with chirp_cache.set(ChirpCache()):
+            disperse1 = Disperse(self.gp, self.dm)
+            disperse2 = Disperse(self.gp, self.dm)
+            disperse3 = Disperse(self.gp, self.dm * 1.1)
+            dedisperse = Dedisperse(self.gp, -self.dm)
+        assert disperse1.phase_factor is disperse2.phase_factor
+        assert disperse3.phase_factor is not disperse1.phase_factor
+        assert dedisperse.phase_factor is not disperse1.phase_factor
+        assert np.all(dedisperse.phase_factor == disperse1.phase_factor)
+        assert disperse1._chirp_cache.hits == 1
+        assert disperse1._chirp_cache.misses == 3
+        with chirp_cache.set(max_entries=0):
+            disperse4 = Disperse(self.gp, self.dm)
+        assert disperse4.phase_factor is not disperse1.phase_factor
+        assert np.all(disperse4.phase_factor == disperse1.phase_factor)
+
     def test_disperse_closing(self):
         # This tests implementation, so can be removed if the implementation
         # changes. It is meant to ensure memory is released upon closing.
-        disperse = Disperse(self.gp, -self.dm)
+        cache = ChirpCache()
+        with chirp_cache.set(cache):
+            disperse = Disperse(self.gp, -self.dm)
         assert 'phase_factor' not in disperse.__dict__
         disperse.read(1)
         assert 'phase_factor' in disperse.__dict__
         disperse.close()
         assert 'phase_factor' not in disperse.__dict__
+        # The chirp is kept in the cache until it is cleared.
+        assert len(cache) == 1
+        cache.clear()
+        assert cache.nbytes == 0
+        # Without caching, nothing is retained.
+        with chirp_cache.set(max_entries=0):
+            disperse = Disperse(self.gp, -self.dm)
+        disperse.read(1)
+        disperse.close()
+        assert len(disperse._chirp_cache) == 0
 
 
 class TestDispersionReal(TestDispersion):
@@ -287,3 +358,167 @@ class TestDispersionRealDisjoint(TestDispersion):
         # Lower sideband [1] is dedispersed to earlier.
         assert p[10, 0] > 0.99 and p[9, 0] < 0.006
         assert p[9, 1] > 0.99 and p[10, 1] < 0.006
+
+
+class TestDedisperseMany:
+
+    dtype = np.complex64
+
+    def setup(self):
+        self.start_time = Time('2010-11-12T13:14:15')
+        self.sample_rate = 128. * u.kHz
+        self.shape = (64000, 2)
+        self.fh = StreamGenerator(self.tones,
+                                  shape=self.shape, start_time=self.start_time,
+                                  sample_rate=self.sample_rate,
+                                  samples_per_frame=1000, dtype=self.dtype,
+                                  frequency=300*u.MHz,
+                                  sideband=np.array((1, -1)))
+        # Time delays up to 0.01 s over 128 kHz band.
+        self.dm = DispersionMeasure([0., 1., 5., 10.]) * 1000. / 39.342251
+
+    def tones(self, sh):
+        # Tones that are periodic for any frame size that is a multiple
+        # of 32, so that the result does not depend on the frame size.
+        t = sh.offset + np.arange(sh.samples_per_frame)
+        phi1 = (2. * np.pi / 32. * t)[:, np.newaxis]
+        phi2 = (-2. * np.pi * 3. / 16. * t)[:, np.newaxis]
+        if sh.dtype.kind == 'f':
+            data = np.sin(phi1) + 0.5 * np.cos(phi2 + np.array([0., 1.]))
+        else:
+            data = np.exp(1j * phi1) + 0.5 * np.exp(1j * (phi2 + [0., 1.]))
+        return data.astype(sh.dtype)
+
+    @pytest.mark.parametrize('reference_frequency',
+                             (None, 300.064 * u.MHz, 300.128 * u.MHz))
+    def test_against_dedisperse(self, reference_frequency):
+        ddm = DedisperseMany(self.fh, self.dm,
+                             reference_frequency=reference_frequency)
+        assert ddm.sample_shape == (4, 2)
+        assert ddm.dtype == self.dtype
+        assert np.all(ddm.frequency == self.fh.frequency)
+        if reference_frequency is None:
+            # Padding and offset set by the largest DM.
+            dd_max = Dedisperse(self.fh, self.dm[-1])
+            assert ddm.samples_per_frame == dd_max.samples_per_frame
+            assert ddm.start_time == dd_max.start_time
+        data = ddm.read()
+        for i, dm in enumerate(self.dm):
+            dd = Dedisperse(self.fh, dm,
+                            reference_frequency=reference_frequency)
+            offset = int(((ddm.start_time - dd.start_time)
+                          * self.sample_rate).to(u.one).round())
+            dd.seek(offset)
+            n = min(data.shape[0], dd.shape[0] - offset)
+            assert n > 0.8 * data.shape[0]
+            expected = dd.read(n)
+            assert np.allclose(data[:n, i], expected, atol=1e-4, rtol=0)
+
+    def test_single_dm(self):
+        dd = Dedisperse(self.fh, self.dm[2])
+        ddm = DedisperseMany(self.fh, self.dm[2:3])
+        assert ddm.shape == dd.shape[:1] + (1,) + dd.sample_shape
+        assert ddm.start_time == dd.start_time
+        assert np.allclose(ddm.read()[:, 0], dd.read(), atol=1e-5, rtol=0)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            DedisperseMany(self.fh, self.dm[0])
+        with pytest.raises(ValueError):
+            DedisperseMany(self.fh, self.dm.reshape(2, 2))
+
+    def test_closing(self):
+        ddm = DedisperseMany(self.fh, self.dm)
+        ddm.read(1)
+        assert 'phase_factor' in ddm.__dict__
+        assert ddm.phase_factor.shape[1:] == (4, 2)
+        ddm.close()
+        assert 'phase_factor' not in ddm.__dict__
+
+
+class TestDedisperseManyReal(TestDedisperseMany):
+
+    dtype = np.float32
+
+
+class TestIncoherentDedisperse:
+
+    def setup(self):
+        self.start_time = Time('2010-11-12T13:14:15')
+        self.sample_rate = 1. * u.kHz
+        self.nchan = 16
+        self.frequency = 400. * u.MHz + np.arange(self.nchan) * u.MHz
+        self.dm = DispersionMeasure(20.)
+        self.t0 = 3000
+        # Pulse dispersed to arrive at t0 at the top of the band.
+        self.delays = np.around((self.dm.time_delay(
+            self.frequency, self.frequency[-1] + 0.5 * u.MHz)
+            * self.sample_rate).to_value(u.one)).astype(int)
+        self.data = np.zeros((10000, self.nchan), 'f4')
+        self.data[self.t0 + self.delays, np.arange(self.nchan)] = 1.
+        self.fh = self.power_stream(self.data, self.frequency)
+
+    def power_stream(self, data, frequency):
+        def from_data(handle):
+            return data[handle.offset:handle.offset+handle.samples_per_frame]
+
+        return StreamGenerator(from_data, shape=data.shape,
+                               start_time=self.start_time,
+                               sample_rate=self.sample_rate,
+                               samples_per_frame=100, dtype=data.dtype,
+                               frequency=frequency, sideband=1)
+
+    def test_pulse(self):
+        idd = IncoherentDedisperse(self.fh, 2 * self.dm)
+        assert idd.start_time == self.start_time
+        assert idd.sample_rate == self.sample_rate
+        assert idd.dtype == np.float32
+        assert idd.dm[0] == 0
+        # One sample delay difference across the band between DMs.
+        time_delay = idd.dm[1].time_delay(399.5 * u.MHz, 415.5 * u.MHz)
+        assert_quantity_allclose(time_delay * self.sample_rate, 1.)
+        n_dm = len(idd.dm)
+        assert idd.dm[-1] >= 2 * self.dm > idd.dm[-2]
+        assert idd.sample_shape == (n_dm,)
+        assert idd._pad_end == n_dm - 1
+        data = idd.read()
+        assert data.shape == idd.shape
+        assert idd.shape[0] <= self.data.shape[0] - n_dm + 1
+        # All power should be recovered at the right DM and time.
+        index = np.argmin(np.abs(idd.dm - self.dm))
+        assert data[self.t0, index] == self.nchan
+        assert data.max() == self.nchan
+        # And very little of it without dedispersion.
+        assert data[:, 0].max() == 1.
+        assert data.sum(0)[0] == self.nchan
+
+    def test_frame_independence(self):
+        idd1 = IncoherentDedisperse(self.fh, self.dm)
+        data1 = idd1.read()
+        idd2 = IncoherentDedisperse(self.fh, self.dm, samples_per_frame=256)
+        data2 = idd2.read()
+        n = min(len(data1), len(data2))
+        assert np.all(data1[:n] == data2[:n])
+        # Reading non-sequentially should give the same result too.
+        idd2.seek(1000)
+        assert np.all(idd2.read(300) == data1[1000:1300])
+
+    def test_channel_order_and_extra_axis(self):
+        idd = IncoherentDedisperse(self.fh, self.dm)
+        expected = idd.read()
+        data = np.stack([self.data[:, ::-1], 2. * self.data[:, ::-1]],
+                        axis=-1)
+        fh = self.power_stream(data, self.frequency[::-1, np.newaxis])
+        idd2 = IncoherentDedisperse(fh, self.dm)
+        assert idd2.sample_shape == expected.shape[1:] + (2,)
+        data2 = idd2.read()
+        assert np.all(data2[..., 0] == expected)
+        assert np.all(data2[..., 1] == 2. * expected)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            IncoherentDedisperse(self.power_stream(
+                self.data.astype('c8'), self.frequency), self.dm)
+        with pytest.raises(ValueError):
+            IncoherentDedisperse(self.power_stream(
+                self.data[:, :1], self.frequency[:1]), self.dm)
@@ -0,0 +1,113 @@
+# Licensed under the GPLv3 - see LICENSE
+import pytest
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+from ..fusion import Fuse
+from ..dispersion import Dedisperse, DispersionMeasure
+from ..sampling import Resample
+from ..convolution import Convolve
+from ..functions import Square
+from ..generators import StreamGenerator
+
+
+class TestFuse:
+
+    dtype = np.complex64
+
+    def setup(self):
+        self.start_time = Time('2010-11-12T13:14:15')
+        self.sample_rate = 128. * u.kHz
+        self.shape = (32000, 2)
+        self.fh = StreamGenerator(self.tones,
+                                  shape=self.shape, start_time=self.start_time,
+                                  sample_rate=self.sample_rate,
+                                  samples_per_frame=1000, dtype=self.dtype,
+                                  frequency=300*u.MHz,
+                                  sideband=np.array((1, -1)))
+        self.dm = DispersionMeasure(1000.*0.005/0.039342251)
+
+    def tones(self, sh):
+        # Tones that are periodic for any frame size that is a multiple
+        # of 32, so that the results do not depend on the frame size.
+        t = sh.offset + np.arange(sh.samples_per_frame)
+        phi1 = (2. * np.pi / 32. * t)[:, np.newaxis]
+        phi2 = (-2. * np.pi * 3. / 16. * t)[:, np.newaxis]
+        if sh.dtype.kind == 'f':
+            data = np.sin(phi1) + 0.5 * np.cos(phi2 + np.array([0., 1.]))
+        else:
+            data = np.exp(1j * phi1) + 0.5 * np.exp(1j * (phi2 + [0., 1.]))
+        return data.astype(sh.dtype)
+
+    def check(self, expected, fused):
+        assert fused.start_time == expected.start_time
+        assert fused.sample_rate == expected.sample_rate
+        assert fused.sample_shape == expected.sample_shape
+        assert fused.dtype == expected.dtype
+        assert np.all(fused.frequency == expected.frequency)
+        assert np.all(fused.sideband == expected.sideband)
+        assert fused.tell() == expected.tell()
+        n = min(fused.shape[0], expected.shape[0])
+        assert n > 0.9 * expected.shape[0]
+        fused.seek(0)
+        expected.seek(0)
+        data = fused.read(n)
+        expected_data = expected.read(n)
+        assert np.allclose(data, expected_data, atol=1e-4, rtol=0)
+
+    @pytest.mark.parametrize('offset', (1000.25, 2500.7))
+    def test_dedisperse_resample(self, offset):
+        dd = Dedisperse(self.fh, self.dm)
+        rh = Resample(dd, offset, samples_per_frame=4096)
+        fused = Fuse(rh)
+        assert fused.ih is self.fh
+        assert fused._pad_start == dd._pad_start + rh._pad_start
+        assert fused._pad_end == dd._pad_end + rh._pad_end
+        self.check(rh, fused)
+
+    def test_dedisperse_convolve(self):
+        response = np.array([0.25, 0.5, 0.25, 0.125])
+        dd = Dedisperse(self.fh, self.dm, reference_frequency=300*u.MHz)
+        ch = Convolve(dd, response, offset=1, samples_per_frame=4096)
+        fused = Fuse(ch)
+        assert fused.ih is self.fh
+        self.check(ch, fused)
+
+    def test_single(self):
+        dd = Dedisperse(self.fh, self.dm)
+        fused = Fuse(dd, samples_per_frame=8192)
+        assert fused.samples_per_frame == 8192 - dd._pad_start - dd._pad_end
+        self.check(dd, fused)
+        # With the same frame size, the results should be identical.
+        fused = Fuse(dd, samples_per_frame=dd._padded_samples_per_frame)
+        assert fused.samples_per_frame == dd.samples_per_frame
+        self.check(dd, fused)
+
+    def test_stops_at_other_task(self):
+        dd = Dedisperse(self.fh, self.dm)
+        sq = Square(dd)
+        rh = Resample(sq, 1000.5)
+        fused = Fuse(rh)
+        assert fused.ih is sq
+
+    def test_not_fourier(self):
+        with pytest.raises(ValueError):
+            Fuse(self.fh)
+        with pytest.raises(ValueError):
+            Fuse(Square(self.fh))
+
+    def test_close(self):
+        dd = Dedisperse(self.fh, self.dm)
+        fused = Fuse(Resample(dd, 1000.5))
+        fused.read(10)
+        fused.close()
+        assert 'fourier_factor' not in fused.__dict__
+        assert not hasattr(fused, '_fft')
+        assert fused.closed
+        assert not hasattr(fused, 'ih')
+
+
+class TestFuseReal(TestFuse):
+
+    dtype = np.float32
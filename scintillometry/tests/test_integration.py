@@ -8,7 +8,7 @@ from astropy.time import Time
 
 from ..base import Task
 from ..generators import EmptyStreamGenerator
-from ..integration import Integrate, Fold, Stack
+from ..integration import Integrate, Fold, Stack, Checkpoint
 from ..functions import Square
 from ..phases import Phase
 
@@ -368,6 +368,23 @@ class TestFold(TestFakePulsarBase):
         assert np.all(average[:, 0] == expected), \
             "On-gate power is incorrect."
 
+    @pytest.mark.parametrize('samples_per_frame', (1, 3))
+    def test_complex_multidimensional(self, samples_per_frame):
+        # Folding should work independently for every sample element,
+        # for real and imaginary parts.
+        factor = np.array([1., 1j, 2.-1j])
+        ch = Task(self.sh, lambda data: data[..., np.newaxis] * factor,
+                  shape=self.shape + (3,), dtype=complex)
+        step = 100 * u.ms
+        fh = Fold(ch, self.n_phase, self.phase, step,
+                  samples_per_frame=samples_per_frame, average=False)
+        fr = fh.read()
+        ref = Fold(self.sh, self.n_phase, self.phase, step,
+                   samples_per_frame=samples_per_frame, average=False).read()
+        assert fr.shape == ref.shape + (3,)
+        assert np.all(fr['count'] == ref['count'][..., np.newaxis])
+        assert np.all(fr['data'] == ref['data'][..., np.newaxis] * factor)
+
     def test_times_wrong(self):
         with pytest.raises(ValueError):
             Fold(self.sh, 8, self.phase, start=self.start_time - 1. * u.s)
@@ -456,3 +473,105 @@ class TestStack(TestFakePulsarBase):
         # But not everything works, like asking for the time...
         with pytest.raises(Exception):
             ih.time
+
+
+class TestCheckpoint(TestFakePulsarBase):
+    def setup(self):
+        super().setup()
+        self.calls = 0
+
+    def counting_phase(self, t):
+        self.calls += 1
+        return self.phase(t)
+
+    def test_fold_resume(self, tmpdir):
+        filename = str(tmpdir.join('fold.npy'))
+        expected = Fold(self.sh, self.n_phase, self.phase,
+                        step=100*u.ms).read()
+        fh = Fold(self.sh, self.n_phase, self.counting_phase, step=100*u.ms,
+                  checkpoint=filename, checkpoint_interval=0*u.s)
+        assert isinstance(fh.checkpoint, Checkpoint)
+        assert np.all(fh.read(6) == expected[:6])
+        assert fh.checkpoint.n_done == 6
+        # Pretend the run was interrupted, by not closing, and resume.
+        fh2 = Fold(self.sh, self.n_phase, self.counting_phase,
+                   step=100*u.ms, checkpoint=filename)
+        assert fh2.checkpoint.n_done == 6
+        self.calls = 0
+        assert np.all(fh2.read(6) == expected[:6])
+        assert self.calls == 0
+        assert np.all(fh2.read() == expected[6:])
+        assert self.calls > 0
+        fh2.close()
+        with Fold(self.sh, self.n_phase, self.phase, step=100*u.ms,
+                  checkpoint=filename) as fh3:
+            assert fh3.checkpoint.n_done == len(expected)
+            assert np.all(fh3.read() == expected)
+
+    def test_different_settings(self, tmpdir):
+        filename = str(tmpdir.join('fold.npy'))
+        fh = Fold(self.sh, self.n_phase, self.phase, step=100*u.ms,
+                  checkpoint=filename)
+        fh.read(1)
+        fh.close()
+        for args, kwargs in (((self.n_phase, self.phase, 50*u.ms), {}),
+                             ((self.n_phase // 2, self.phase, 100*u.ms), {}),
+                             ((self.n_phase, self.phase, 100*u.ms),
+                              {'start': 10})):
+            fh = Fold(self.sh, *args, checkpoint=filename, **kwargs)
+            with pytest.raises(ValueError):
+                fh.read(1)
+
+    def test_updated_phase(self, tmpdir):
+        filename = str(tmpdir.join('fold.npy'))
+        with Fold(self.sh, self.n_phase, self.phase, step=100*u.ms,
+                  checkpoint=filename) as fh:
+            fh.read(1)
+
+        # Folding with an updated ephemeris should not reuse the profiles.
+        def updated_phase(t):
+            return self.phase(t) * (1. + 1e-6)
+
+        fh = Fold(self.sh, self.n_phase, updated_phase, step=100*u.ms,
+                  checkpoint=filename)
+        with pytest.raises(ValueError, match='different settings'):
+            fh.read(1)
+
+    def test_different_input(self, tmpdir):
+        filename = str(tmpdir.join('integrate.npy'))
+        with Integrate(self.sh, 100, checkpoint=filename) as ih:
+            ih.read(1)
+
+        eh = EmptyStreamGenerator(shape=self.shape,
+                                  start_time=self.start_time + 1. * u.s,
+                                  sample_rate=self.sample_rate,
+                                  samples_per_frame=200, dtype=np.float)
+        sh = Task(eh, self.pulse_simulate)
+        ih = Integrate(sh, 100, checkpoint=filename)
+        with pytest.raises(ValueError, match='different settings'):
+            ih.read(1)
+
+    def test_save_interval(self, tmpdir):
+        filename = str(tmpdir.join('integrate.npy'))
+        expected = Integrate(self.sh, 100).read()
+        ih = Integrate(self.sh, 100, checkpoint=filename)
+        assert np.all(ih.read() == expected)
+        # Nothing saved yet, given the default interval.
+        assert ih.checkpoint.n_done == 0
+        ih.close()
+        with Integrate(self.sh, 100, checkpoint=filename) as ih2:
+            assert ih2.checkpoint.n_done == len(expected)
+            assert np.all(ih2.read() == expected)
+
+    def test_stack_resume(self, tmpdir):
+        filename = str(tmpdir.join('stack.npy'))
+        expected = Stack(self.sh, 25, self.phase).read()
+        fh = Stack(self.sh, 25, self.phase, checkpoint=filename)
+        assert np.all(fh.read(10) == expected[:10])
+        fh.close()
+        fh2 = Stack(self.sh, 25, self.counting_phase, checkpoint=filename)
+        self.calls = 0
+        assert np.all(fh2.read(10) == expected[:10])
+        assert self.calls == 0
+        assert np.all(fh2.read() == expected[10:])
+        fh2.close()
@@ -0,0 +1,105 @@
+# Licensed under the GPLv3 - see LICENSE
+import numpy as np
+import pytest
+from baseband import vdif
+from baseband.data import SAMPLE_VDIF
+
+from ..base import Task
+from ..functions import Square
+from ..parallel import Prefetch, ParallelReader
+from .common import UseVDIFSample
+
+
+class TestPrefetch(UseVDIFSample):
+    def test_basics(self):
+        fh = self.fh
+        expected = fh.read()
+        ph = Prefetch(fh)
+        assert ph.shape == fh.shape
+        assert ph.samples_per_frame == fh.samples_per_frame
+        assert ph.start_time == fh.start_time
+        data = ph.read(100)
+        assert np.all(data == expected[:100])
+        # Next frame should be getting read in the background.
+        assert set(ph._futures) == {1}
+        data = ph.read()
+        assert np.all(data == expected[100:])
+        ph.close()
+        assert ph.closed
+        assert not ph._futures
+
+    def test_seek(self):
+        fh = self.fh
+        expected = fh.read()
+        ph = Prefetch(fh, n_frames=1, samples_per_frame=1000)
+        assert ph.samples_per_frame == 1000
+        ph.seek(2500)
+        assert np.all(ph.read(1000) == expected[2500:3500])
+        assert set(ph._futures) == {4}
+        # Stale prefetches should be cancelled on seek.
+        ph.seek(20000)
+        assert set(ph._futures) == {20, 21}
+        assert np.all(ph.read(10) == expected[20000:20010])
+        # Reading backwards should work too.
+        for offset in (39995, 12345, 8):
+            ph.seek(offset)
+            assert np.all(ph.read(5) == expected[offset:offset+5])
+        ph.seek(0)
+        assert np.all(ph.read() == expected)
+        ph.close()
+
+    def test_last_frames(self):
+        fh = self.fh
+        expected = fh.read()
+        ph = Prefetch(fh, n_frames=3, samples_per_frame=15000)
+        assert ph.shape == (30000,) + fh.sample_shape
+        ph.seek(14000)
+        assert set(ph._futures) == set()
+        assert np.all(ph.read() == expected[14000:30000])
+        assert not ph._futures
+        ph.close()
+
+    def test_exception(self):
+        def fail(data):
+            raise RuntimeError('fail')
+
+        ph = Prefetch(Task(self.fh, fail))
+        with pytest.raises(RuntimeError):
+            ph.read(10)
+        ph.close()
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Prefetch(self.fh, n_frames=0)
+
+
+def squared_vdif_sample():
+    return Square(vdif.open(SAMPLE_VDIF))
+
+
+class TestParallelReader:
+    def setup(self):
+        with vdif.open(SAMPLE_VDIF) as fh:
+            self.expected = fh.read() ** 2
+
+    def test_basics(self):
+        ph = ParallelReader(squared_vdif_sample, 2, samples_per_frame=1000)
+        assert ph.n_workers == 2
+        assert ph.n_frames == 2
+        assert ph.samples_per_frame == 1000
+        assert ph.shape == self.expected.shape
+        data = ph.read(2500)
+        assert np.all(data == self.expected[:2500])
+        assert set(ph._futures) == {3, 4}
+        ph.seek(-500, 2)
+        data = ph.read()
+        assert np.all(data == self.expected[-500:])
+        ph.seek(0)
+        data = ph.read()
+        assert np.all(data == self.expected)
+        ph.close()
+        assert not ph._futures
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            ParallelReader(squared_vdif_sample, 0)
@@ -7,7 +7,8 @@ import os
 import astropy.units as u
 from astropy.time import Time
 
-from ..phases import PolycoPhase, PintPhase, Phase
+from ..phases import (PolycoPhase, PintPhase, PintPolycoPhase, Phase,
+                      InterpolatedPhase)
 
 try:
     import pint  # noqa
@@ -78,6 +79,58 @@ class TestPolycoPhase(PhaseTest, PolycoBase):
     pass
 
 
+class TestInterpolatedPhase(PolycoBase):
+    def setup(self):
+        super().setup()
+        self.calls = []
+
+        def phase(t):
+            self.calls.append(t.size)
+            return self.polyco_pu(t)
+
+        self.ip = InterpolatedPhase(phase)
+
+    def test_basics(self):
+        t = self.start_time + np.linspace(0., 2., 10001) * u.min
+        ph = self.ip(t)
+        assert isinstance(ph, Phase)
+        assert ph.shape == t.shape
+        expected = self.polyco_pu(t)
+        assert np.all(abs(ph - expected) < 1e-8 * u.cycle)
+        assert len(self.calls) == 1
+        # Phases on the grid should be cached.
+        ph2 = self.ip(t[1000:2000].reshape(10, 100))
+        assert ph2.shape == (10, 100)
+        assert np.all(ph2 == ph[1000:2000].reshape(10, 100))
+        assert len(self.calls) == 1
+        # Extending the range requires only the new part.
+        self.ip(t + 1. * u.s)
+        assert self.calls == [124, 1]
+
+    def test_apparent_spin_freq(self):
+        t = self.times[:4]
+        f0 = self.ip.apparent_spin_freq(t)
+        expected = self.polyco_pu.apparent_spin_freq(t)
+        assert np.all(abs(f0 - expected) < 1e-7 * u.Hz)
+
+    def test_refinement(self):
+        ip = InterpolatedPhase(self.polyco_pu, step=10. * u.min,
+                               tolerance=1e-9 * u.cycle)
+        ph = ip(self.times)
+        assert ip.step < 10. * u.min
+        assert np.all(abs(ph - self.polyco_pu(self.times)) < 1e-8 * u.cycle)
+
+    def test_tolerance_not_reached(self):
+        # Wrapped phases can never be interpolated to within tolerance.
+        def wrapped(t):
+            return self.polyco_pu(t).frac
+
+        ip = InterpolatedPhase(wrapped, min_step=0.1 * u.s)
+        with pytest.raises(ValueError, match='cannot interpolate'):
+            ip(self.times)
+        assert ip.step >= 0.1 * u.s
+
+
 @pytest.mark.skipif(not HAS_PINT,
                     reason="pint phase tests require PINT to be installed.")
 class TestPhaseComparison(PintBase, PolycoBase):
@@ -101,6 +154,24 @@ class TestPhaseComparison(PintBase, PolycoBase):
             "The apparent spin frequencyies do now match."
 
 
+@pytest.mark.skipif(not HAS_PINT,
+                    reason="pint phase tests require PINT to be installed.")
+class TestPintPolycoPhase(PintBase):
+    def test_against_pint(self):
+        pu = PintPolycoPhase(self.par_file, self.obs, self.obs_freq,
+                             self.times[0], self.times[-1],
+                             tolerance=1e-7 * u.cycle)
+        assert isinstance(pu, PolycoPhase)
+        assert pu.polyco['psr'][0] == 'B1937+21'
+        phase = pu(self.times)
+        assert isinstance(phase, Phase)
+        assert np.all(abs(phase - self.pint_pu(self.times))
+                      < 1e-7 * u.cycle)
+        f0 = pu.apparent_spin_freq(self.times)
+        pint_f0 = self.pint_pu.apparent_spin_freq(self.times)
+        assert np.all(abs(f0 - pint_f0) < 1e-9 * u.Hz)
+
+
 @pytest.mark.skipif(not HAS_PINT,
                     reason="pint phase tests require PINT to be installed.")
 class TestPintFrequencyBroadcasting(Base):
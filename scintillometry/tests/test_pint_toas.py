@@ -1,5 +1,8 @@
 # Licensed under the GPLv3 - see LICENSE
 """Full-package tests of pint_toas sources."""
+import sys
+import types
+
 import pytest
 import numpy as np
 import os
@@ -7,9 +10,14 @@ import astropy.units as u
 from astropy.time import Time
 
 from ..phases import pint_toas
+from ..phases.pint_toas import ToaCache, toa_cache
 
+try:
+    import pint  # noqa
+    HAS_PINT = True
+except ImportError:
+    HAS_PINT = False
 
-pint = pytest.importorskip('pint')
 # PINT gives AstropyDeprecationWarnings that we cannot do anything about
 # (in particular, "The truth value of a Quantity is ambiguous." and
 # "stropy.extern.six will be removed in 4.0").  It also has warnings itself
@@ -21,6 +29,88 @@ pytestmark = [pytest.mark.filterwarnings("ignore:::astropy"),
 test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
 
+class FakeTOAs:
+    def __init__(self, ntoas):
+        self.ntoas = ntoas
+
+
+class TestToaCache:
+    def test_cache_basics(self):
+        cache = ToaCache(max_entries=2)
+        assert len(cache) == 0
+        assert cache.get('a') is None
+        assert cache.misses == 1
+        toas = FakeTOAs(10)
+        cache.add('a', toas)
+        assert cache.get('a') is toas
+        assert cache.hits == 1
+        cache.add('b', FakeTOAs(10))
+        cache.add('c', FakeTOAs(10))
+        assert len(cache) == 2
+        assert 'a' not in cache
+        assert cache.ntoas == 20
+        cache.discard('b')
+        assert 'b' not in cache and 'c' in cache
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.hits == 1 and cache.misses == 1
+
+    def test_cache_max_toas(self):
+        cache = ToaCache(max_toas=25)
+        for key in 'abcd':
+            cache.add(key, FakeTOAs(10))
+        assert len(cache) == 2
+        assert 'c' in cache and 'd' in cache
+        # Sets of TOAs that are too large are not kept.
+        cache.add('e', FakeTOAs(30))
+        assert len(cache) == 0
+
+    def test_cache_invalid(self):
+        with pytest.raises(ValueError):
+            ToaCache(max_entries=-1)
+        with pytest.raises(TypeError):
+            toa_cache.set(ToaCache(), max_entries=1)
+        with pytest.raises(TypeError):
+            toa_cache.set('cache')
+
+    def test_toa_cache_state(self):
+        default = toa_cache.get()
+        with toa_cache.set(max_entries=3, max_toas=100):
+            cache = toa_cache.get()
+            assert cache is not default
+            assert cache.max_entries == 3 and cache.max_toas == 100
+        assert toa_cache.get() is default
+
+    def test_pint_toas_use_cache(self, monkeypatch):
+        # Use a fake PINT, so that this can be tested without PINT.
+        calls = []
+
+        def get_TOAs_array(time, obs, freqs, **kwargs):
+            calls.append(time.shape)
+            return FakeTOAs(time.size)
+
+        fake_pint = types.ModuleType('pint')
+        fake_pint.toa = types.SimpleNamespace(get_TOAs_array=get_TOAs_array)
+        monkeypatch.setitem(sys.modules, 'pint', fake_pint)
+        times = Time('2018-05-06T23:00:00', scale='tt') + np.arange(5) * u.s
+        with toa_cache.set(ToaCache()):
+            pt = pint_toas.PintToas('AO', 1.4 * u.GHz)
+        toas = pt(times)
+        assert toas.shape == (5,)
+        assert pt(times) is toas
+        assert pt(times + 1. * u.s) is not toas
+        assert calls == [(5,), (5,)]
+        assert pt._cache.hits == 1 and pt._cache.misses == 2
+        pt._cache.clear()
+        assert pt(times) is not toas
+        with toa_cache.set(max_entries=0):
+            pt2 = pint_toas.PintToas('AO', 1.4 * u.GHz)
+        pt2(times)
+        assert len(pt2._cache) == 0
+
+
+@pytest.mark.skipif(not HAS_PINT,
+                    reason="pint toas tests require PINT to be installed.")
 class TestPintUtils:
     """Test the utilities of PINT"""
 
@@ -75,3 +165,21 @@ class TestPintUtils:
                                  include_bipm=False, include_gps=False)
         toas2 = pt2(self.times[:, np.newaxis])
         assert toas2.shape == (30, 2)
+
+    def test_cache(self):
+        pt = pint_toas.PintToas(self.obs, self.freq, ephem='builtin',
+                                include_bipm=False, include_gps=False)
+        toas = pt(self.times)
+        assert pt(self.times) is toas
+        # A new instance with the same settings should use the cache too.
+        pt2 = pint_toas.PintToas(self.obs, self.freq, ephem='builtin',
+                                 include_bipm=False, include_gps=False)
+        assert pt2(self.times) is toas
+        # But not for different times, frequency, or settings.
+        assert pt2(self.times + 1. * u.s) is not toas
+        pt3 = pint_toas.PintToas(self.obs, 1.5 * u.GHz, ephem='builtin',
+                                 include_bipm=False, include_gps=False)
+        assert pt3(self.times) is not toas
+        pt4 = pint_toas.PintToas(self.obs, self.freq, ephem='builtin',
+                                 include_bipm=False, include_gps=True)
+        assert pt4(self.times) is not toas
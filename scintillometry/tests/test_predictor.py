@@ -6,7 +6,7 @@ import os
 import astropy.units as u
 from astropy.time import Time
 
-from ..phases import Polyco
+from ..phases import Polyco, Phase
 
 
 test_data = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
@@ -82,7 +82,94 @@ class TestPredictor:
         assert len(pa2) == len(time)
         assert u.allclose(pa2, pa)
 
+    @pytest.mark.parametrize('rphase', (None, 'fraction', 'ignore', 0.25))
+    @pytest.mark.parametrize('deriv', (0, 1, 2))
+    def test_polyco_against_polynomial(self, rphase, deriv):
+        # Times covering multiple polyco entries.
+        time = self.start_time + np.linspace(0, 150, 101) * u.min
+        index = self.polyco.searchclosest(time)
+        assert len(set(index)) > 1
+        result = self.polyco(time, rphase=rphase, deriv=deriv,
+                             time_unit=u.min)
+        assert result.shape == time.shape
+        dt = (time - self.polyco['mjd_mid'][index]).to_value(u.min)
+        expected = np.array([self.polyco.polynomial(i, rphase, deriv)(t)
+                             for i, t in zip(index, dt)])
+        if deriv == 0 and rphase is None:
+            assert isinstance(result, Phase)
+            # Polynomial loses precision; compare with the phase without
+            # reference phase instead.
+            result = result - self.polyco['rphase'][index]
+            expected = np.array([
+                self.polyco.polynomial(i, 'ignore')(t)
+                for i, t in zip(index, dt)])
+        # Time differences are calculated slightly differently, hence
+        # allow for differences of order 1e-11 s.
+        unit = u.cycle / u.min**deriv
+        atol = (1e-8 if deriv == 0 else 0.) * unit
+        assert u.allclose(result, expected * unit, rtol=1e-12, atol=atol)
+
+    def test_coefficients_cached(self):
+        coeff = self.polyco.coefficients('ignore', deriv=1)
+        assert coeff.shape == (len(self.polyco), self.polyco['ncoeff'].max()-1)
+        assert not coeff.flags.writeable
+        assert self.polyco.coefficients('ignore', deriv=1) is coeff
+        # Reference phases are added to a copy.
+        coeff0 = self.polyco.coefficients('ignore')
+        coeffr = self.polyco.coefficients()
+        assert coeffr is not coeff0
+        assert coeffr.flags.writeable
+        assert np.all(coeffr[:, 1:] == coeff0[:, 1:])
+        assert self.polyco.coefficients('ignore') is coeff0
+
     def test_over_range(self):
         time = self.start_time + 10 * u.day
         with pytest.raises(ValueError):
             self.polyco(time)
+
+
+class TestPolycoFromPhase:
+    def setup(self):
+        self.start_time = Time('2018-05-06T23:00:00', format='isot',
+                               scale='utc')
+        self.times = self.start_time + np.linspace(0., 3., 1001) * u.hr
+        self.calls = []
+
+    def phase(self, t):
+        # Fake pulsar in a wide orbit.
+        self.calls.append(t.shape)
+        dt = (t - self.start_time).to(u.s)
+        orbital_phase = (dt / (6 * u.hr)).to_value(u.one) * 2 * np.pi
+        return (Phase(1e11, 641.9 * u.cycle / u.s * dt)
+                + 10. * u.cycle * np.sin(orbital_phase))
+
+    def test_basics(self, tmpdir):
+        polyco = Polyco.from_phase(self.phase, self.times[0], self.times[-1],
+                                   tolerance=1e-8*u.cycle, psr='J0000+00',
+                                   obs='ao', freq=1.4*u.GHz)
+        assert len(self.calls) == 2
+        assert np.all(polyco['span'] == 60 * u.min)
+        assert np.all(polyco['ncoeff'] == 12)
+        assert polyco['coeff'].shape == (len(polyco), 12)
+        assert np.all(polyco['freq'] == 1400. * u.MHz)
+        phase = polyco(self.times)
+        assert isinstance(phase, Phase)
+        assert np.all(abs(phase - self.phase(self.times)) < 1e-8 * u.cycle)
+        # Check that writing preserves precision.
+        name = str(tmpdir.join('polyco.dat'))
+        polyco.to_polyco(name)
+        polyco2 = Polyco(name)
+        assert np.all(polyco2['psr'] == 'J0000+00')
+        assert np.all(abs(polyco2(self.times) - phase) < 1e-11 * u.cycle)
+
+    def test_span_reduction(self):
+        polyco = Polyco.from_phase(self.phase, self.times[0], self.times[-1],
+                                   ncoeff=5, tolerance=1e-8*u.cycle)
+        assert np.all(polyco['span'] < 60 * u.min)
+        assert np.all(abs(polyco(self.times) - self.phase(self.times))
+                      < 1e-8 * u.cycle)
+
+    def test_tolerance_not_reached(self):
+        with pytest.raises(ValueError):
+            Polyco.from_phase(self.phase, self.times[0], self.times[-1],
+                              ncoeff=2, tolerance=1e-8*u.cycle)
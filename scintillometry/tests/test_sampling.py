@@ -8,6 +8,7 @@ from numpy.testing import assert_allclose
 import astropy.units as u
 from astropy.time import Time
 
+from ..base import ChirpCache, chirp_cache
 from ..sampling import Resample, float_offset
 from ..generators import StreamGenerator
 
@@ -86,6 +87,23 @@ class TestResampleReal:
         expected = self.full_fh.read()[int(fraction*4):-(4-int(fraction*4)):4]
         assert_allclose(data, expected, atol=self.atol, rtol=0)
 
+    def test_phase_factor_size(self):
+        ih = Resample(self.part_fh, 0.25, samples_per_frame=512)
+        if self.part_fh.complex_data:
+            expected = 512
+        else:
+            expected = 257
+        assert ih.phase_factor.shape[0] == expected
+        assert ih.read(10).dtype == self.part_fh.dtype
+
+    def test_chirp_cache(self):
+        with chirp_cache.set(ChirpCache()):
+            ih1 = Resample(self.part_fh, 0.25, samples_per_frame=512)
+            ih2 = Resample(self.part_fh, 10.25, samples_per_frame=512)
+            ih3 = Resample(self.part_fh, 0.5, samples_per_frame=512)
+        assert ih1.phase_factor is ih2.phase_factor
+        assert ih3.phase_factor is not ih1.phase_factor
+
 
 class TestResampleComplex(TestResampleReal):
 